@@ -1,8 +1,21 @@
+import time
+
+_STARTED_AT = time.perf_counter()
+
+import os
+
 from flask import Flask
+from config import Config
+from controllers import http_cache
 from controllers.ont_controller import ont_bp
+from services import registry
+from services.log_pipeline import configurar_logging
 
 APP_VERSION = "2.2"  # 👈 aquí defines tu versión
 
+HOST = "0.0.0.0"
+PORT = 5002
+
 def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'your-secret-key-here'
@@ -10,9 +23,20 @@ def create_app():
 
     # Registrar blueprints
     app.register_blueprint(ont_bp)
+    http_cache.init_app(app)
+
+    # En modo no diferido los servicios se crean antes de aceptar peticiones
+    if not Config.LAZY_STARTUP:
+        registry.init_services()
 
     return app
 
 if __name__ == "__main__":
+    configurar_logging()
     app = create_app()
-    app.run(host="0.0.0.0", port=5002, debug=True)
\ No newline at end of file
+
+    # Con el reloader de Flask solo el proceso hijo (WERKZEUG_RUN_MAIN) atiende peticiones
+    if Config.PREWARM_SSH and (not Config.DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        registry.start_ssh_prewarm(HOST, PORT, started_at=_STARTED_AT)
+
+    app.run(host=HOST, port=PORT, debug=Config.DEBUG)
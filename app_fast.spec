@@ -0,0 +1,73 @@
+# -*- mode: python ; coding: utf-8 -*-
+#
+# Perfil de build orientado a rendimiento:
+#   pyinstaller app_fast.spec  ->  dist/app_fast/app_fast(.exe)
+#
+# - onedir: sin autoextracción a un directorio temporal en cada arranque
+# - sin UPX: los binarios no se descomprimen al cargarse
+# - bytecode precompilado con optimize=2 (sin asserts ni docstrings)
+# - excluye stdlib y dependencias opcionales que la aplicación no usa
+#
+# Los drivers de plataforma de netmiko no se pueden excluir: netmiko/__init__
+# importa ssh_dispatcher, que a su vez importa todos los drivers.
+#
+# Comparar contra app.spec con:
+#   python scripts/benchmark_startup.py --exe dist/app --exe dist/app_fast/app_fast
+
+
+a = Analysis(
+    ['app.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('templates', 'templates'), ('static', 'static')],
+    # Servicios importados bajo demanda desde services.registry
+    hiddenimports=[
+        'services.connection_service',
+        'services.ont_service',
+        'services.board_service',
+        'services.excel_service',
+    ],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[
+        # Herramientas de empaquetado (y su runtime hook pyi_rth_setuptools)
+        'setuptools', 'pkg_resources', '_distutils_hack', 'distutils', 'pip', 'ensurepip', 'venv',
+        # stdlib interactiva / de desarrollo
+        'tkinter', '_tkinter', 'turtledemo', 'idlelib', 'lib2to3', '_pyrepl', 'curses',
+        'pydoc_data', 'doctest', 'unittest', 'test', 'xmlrpc',
+        # Integraciones opcionales de netmiko y openpyxl
+        'ttp', 'genie', 'pyats', 'numpy', 'pandas', 'PIL', 'matplotlib', 'IPython',
+    ],
+    noarchive=False,
+    optimize=2,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='app_fast',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='app_fast',
+)
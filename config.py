@@ -1,3 +1,8 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
 class Config:
     """Configuración base"""
     SECRET_KEY = 'your-secret-key-here'
@@ -12,4 +17,144 @@ class Config:
     
     # Configuración de timeouts y delays
     COMMAND_TIMEOUT = 20
-    COMMAND_DELAY = 1
\ No newline at end of file
+    COMMAND_DELAY = 1
+    
+    # Arranque de la aplicación
+    DEBUG = os.environ.get('OLT_DEBUG', '1') == '1'
+    LAZY_STARTUP = os.environ.get('OLT_LAZY_STARTUP', '1') == '1'  # Crear servicios en el primer uso
+    PREWARM_SSH = os.environ.get('OLT_PREWARM_SSH', '1') == '1'    # Abrir SSH en segundo plano al arrancar
+    PREWARM_WAIT_TIMEOUT = 30
+    
+    # Logging (services/log_pipeline.py): un hilo aparte escribe los registros encolados
+    LOG_LEVEL = os.environ.get('OLT_LOG_LEVEL', 'INFO')
+    LOG_FILE = os.environ.get('OLT_LOG_FILE')          # ej. log/olt-{pid}.log; None = solo consola
+    LOG_FORMAT = os.environ.get('OLT_LOG_FORMAT', 'text')  # formato del archivo: 'text' o 'json'
+    LOG_MAX_BYTES = 10 * 1024 * 1024  # tamaño del archivo antes de rotarlo
+    LOG_BACKUP_COUNT = 5              # archivos rotados que se conservan
+    LOG_QUEUE_SIZE = 10000            # registros pendientes; con la cola llena se descartan
+    # Salidas CLI crudas para diagnóstico (muestreadas y recortadas)
+    LOG_RAW_CAPTURE = os.environ.get('OLT_LOG_RAW', '0') == '1'
+    LOG_RAW_FILE = os.environ.get('OLT_LOG_RAW_FILE')  # None = junto con el resto de los registros
+    LOG_RAW_SAMPLE_RATE = float(os.environ.get('OLT_LOG_RAW_SAMPLE', '0.1'))  # fracción de salidas capturadas
+    LOG_RAW_MAX_BYTES = 4096          # caracteres por salida capturada
+    
+    # Presupuesto de tiempo de arranque (segundos hasta aceptar conexiones HTTP)
+    STARTUP_BUDGET_SOURCE = 2.0
+    STARTUP_BUDGET_FROZEN = 5.0
+    
+    # Autofind watcher (sondeo en segundo plano de ONTs no autorizadas)
+    AUTOFIND_WATCHER_ENABLED = True
+    AUTOFIND_POLL_INTERVAL = 60       # segundos entre consultas al OLT
+    AUTOFIND_STREAM_TIMEOUT = 15      # segundos de espera por petición antes de enviar un heartbeat
+    
+    # Sesiones SSH simultáneas al OLT (la primera es la de consultas interactivas)
+    SSH_POOL_SIZE = 2
+    
+    # Limitador de comandos al plano de gestión del OLT (token bucket por dispositivo)
+    SCHEDULER_RATE = 5                # comandos por segundo sostenidos (0 = sin límite)
+    SCHEDULER_BURST = 10              # comandos que se pueden enviar de golpe
+    SCHEDULER_MAX_QUEUE = {1: 20, 2: 5}      # BULK / BACKGROUND: se rechazan con la cola en este tamaño
+    SCHEDULER_MAX_WAIT = {1: 120, 2: 300}    # segundos máximos de espera en cola por prioridad
+    
+    # Circuit breaker y reconexión por dispositivo
+    CIRCUIT_FAILURE_THRESHOLD = 2     # fallos de conexión consecutivos para abrir el circuito
+    CIRCUIT_BASE_BACKOFF = 5          # segundos hasta el primer sondeo; se duplica en cada fallo
+    CIRCUIT_MAX_BACKOFF = 300
+    LIVENESS_CHECK_INTERVAL = 30      # segundos sin comprobar is_alive() tras una operación exitosa
+    LAST_GOOD_TTL = 3600              # segundos que se conserva la última respuesta buena (datos stale)
+    
+    # Keepalive de sesiones SSH
+    KEEPALIVE_INTERVAL = 60           # segundos entre revisiones (0 = deshabilitado)
+    KEEPALIVE_IDLE_AFTER = 120        # enviar no-op a sesiones sin tráfico durante este tiempo
+    SESSION_MAX_IDLE = 1800           # cerrar sesiones adicionales sin uso durante este tiempo (0 = nunca)
+    
+    # Captura y reproducción de sesiones CLI (services/transcript.py, scripts/benchmark_replay.py)
+    CAPTURE_FILE = os.environ.get('OLT_CAPTURE_FILE')   # ej. captures/olt-{pid}.jsonl.gz
+    REPLAY_FILE = os.environ.get('OLT_REPLAY_FILE')     # reemplaza SSH por el transcript indicado
+    REPLAY_LATENCY_FACTOR = float(os.environ.get('OLT_REPLAY_LATENCY_FACTOR', '0'))  # 0 = sin latencia, 1 = tiempo real
+    
+    # Fuente de datos de ONTs y puertos por OLT: 'cli' (scraping SSH) o 'snmp' (GETBULK)
+    # El autofind, el detalle de una ONT y el aprovisionamiento siempre usan el CLI
+    OLT_DATA_SOURCE = {}              # ip -> 'cli' / 'snmp'
+    DATA_SOURCE_DEFAULT = os.environ.get('OLT_DATA_SOURCE', 'cli')
+    SNMP_CONFIG = {
+        'community': os.environ.get('OLT_SNMP_COMMUNITY', 'public'),
+        'port': int(os.environ.get('OLT_SNMP_PORT', '161')),
+        'timeout': 2.0,
+        'retries': 1,
+        'max_repetitions': 50,        # filas por GETBULK
+    }
+    
+    # Broker local de sesiones SSH compartido entre procesos (python -m services.session_broker)
+    SESSION_BROKER_ENABLED = os.environ.get('OLT_SESSION_BROKER', '0') == '1'
+    SESSION_BROKER_AUTOSTART = True   # lanzar el broker si no está corriendo
+    SESSION_BROKER_ADDRESS = ('127.0.0.1', 6002)
+    # Sin OLT_BROKER_AUTHKEY se genera una clave aleatoria en el archivo (permisos 0600)
+    SESSION_BROKER_AUTHKEY = os.environ.get('OLT_BROKER_AUTHKEY')
+    SESSION_BROKER_AUTHKEY_FILE = os.environ.get('OLT_BROKER_AUTHKEY_FILE', os.path.join(BASE_DIR, '.broker_authkey'))
+    
+    # Servidor de producción (gunicorn.conf.py / serve.py); con varios workers se usa el broker
+    WSGI_BIND = os.environ.get('OLT_BIND', '0.0.0.0:5002')
+    WSGI_WORKERS = int(os.environ.get('OLT_WORKERS', '4'))
+    WSGI_THREADS = int(os.environ.get('OLT_THREADS', '8'))  # cada stream SSE ocupa un hilo
+    WSGI_TIMEOUT = 120                # segundos antes de reiniciar un worker bloqueado
+    
+    # Respuestas HTTP: compresión (gzip; brotli si está instalado) y ETag en las APIs JSON
+    API_COMPRESSION = True
+    API_COMPRESS_MIN_SIZE = 1024      # bytes; las respuestas más chicas se envían sin comprimir
+    API_GZIP_LEVEL = 6
+    API_BROTLI_QUALITY = 5
+    
+    # Detalle de una sola ONT (/api/ont/<tarjeta>/<puerto>/<ont_id>)
+    ONT_DETAIL_TTL = 15               # segundos que se sirve el detalle desde caché
+    
+    # Inventario de ONTs de todo el chasis (/api/onts)
+    INVENTORY_POLL_ENABLED = True
+    INVENTORY_POLL_INTERVAL = 900     # segundos entre recorridos completos de los puertos
+    
+    # Eventos del OLT por syslog / traps SNMPv2c (/api/events): actualizan ONTs y puertos al instante
+    EVENTS_ENABLED = os.environ.get('OLT_EVENTS', '0') == '1'
+    EVENTS_BIND = '0.0.0.0'
+    EVENTS_SYSLOG_PORT = int(os.environ.get('OLT_SYSLOG_PORT', '5514'))   # 0 = deshabilitado
+    EVENTS_TRAP_PORT = int(os.environ.get('OLT_TRAP_PORT', '1162'))       # 0 = deshabilitado
+    EVENTS_SOURCES = None             # IPs aceptadas; None = solo DEVICE_CONFIG['ip']
+    EVENTS_TRAP_OIDS = {}             # OID del trap -> (estado, causa) para traps sin run status
+    EVENTS_REFRESH_DELAY = 15         # segundos entre el primer evento de un puerto y su consulta
+    EVENTS_REFRESH_MIN_INTERVAL = 120 # segundos mínimos entre consultas del mismo puerto
+    EVENTS_POLL_INTERVAL = 3600       # con eventos el recorrido completo del inventario es solo un respaldo
+    EVENTS_CACHE_TTL = 300            # con eventos, segundos que se sirven tarjetas y chasis desde caché
+    
+    # Exportaciones en segundo plano (/api/jobs)
+    EXPORTS_DIR = os.environ.get('OLT_EXPORTS_DIR', os.path.join(BASE_DIR, 'exports'))
+    EXPORT_WORKERS = 2                # exportaciones simultáneas
+    EXPORT_RETENTION = 86400          # segundos que se conservan los archivos generados
+    
+    # Reporte óptico diario de todo el chasis (/api/reports)
+    REPORTS_DIR = os.environ.get('OLT_REPORTS_DIR', os.path.join(BASE_DIR, 'reports'))
+    OPTICAL_REPORT_ENABLED = True
+    OPTICAL_REPORT_TIME = "02:00"     # hora local de generación
+    OPTICAL_REPORT_WORKERS = 2        # tarjetas consultadas en paralelo (cada una con su sesión)
+    OPTICAL_REPORT_TARJETAS = None    # lista de tarjetas; None = todas las del chasis
+    
+    # Autorización de ONTs desde autofind
+    PROVISIONING = {
+        'line_profile_id': 10,
+        'srv_profile_id': 10,
+        'vlan': 100,
+        'user_vlan': 100,
+        'gemport': 1,
+    }
+    # Plantillas de comandos: reciben PROVISIONING + frame, board, port, sn, sn_hex, desc y ont_id
+    PROVISIONING_TEMPLATES = {
+        'ont_add': 'ont add {port} sn-auth {sn_hex} omci ont-lineprofile-id {line_profile_id} '
+                   'ont-srvprofile-id {srv_profile_id} desc "{desc}"',
+        'service_ports': [
+            'service-port vlan {vlan} gpon {frame}/{board}/{port} ont {ont_id} gemport {gemport} '
+            'multi-service user-vlan {user_vlan} tag-transform translate',
+        ],
+        'service_port_delete': 'undo service-port port {frame}/{board}/{port} ont {ont_id}',
+        'ont_delete': 'ont delete {port} {ont_id}',
+    }
+    
+    # Vista del chasis completo (todas las tarjetas de servicio)
+    CHASSIS_CACHE_TTL = 30            # segundos que se sirve el resultado desde caché
@@ -0,0 +1,108 @@
+"""
+Respuestas JSON condicionales (ETag / Last-Modified -> 304 Not Modified) y compresión
+gzip/brotli de las respuestas. El ETag se calcula sobre los datos parseados (sin los
+campos que cambian en cada consulta), así una consulta al OLT que no cambió nada
+produce el mismo ETag y el navegador no vuelve a descargar ni a dibujar la página.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable
+
+from flask import Flask, Response, jsonify, request
+
+from config import Config
+
+try:
+    import brotli  # opcional: sin él solo se usa gzip
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Instante en que cada ruta empezó a servir su ETag actual (para Last-Modified)
+_MAX_RECURSOS = 512
+_modificados: "OrderedDict[str, tuple]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def etag_de(data, volatiles: Iterable[str] = ()) -> str:
+    """Hash del contenido (los campos `volatiles` de primer nivel no cuentan)"""
+    volatiles = set(volatiles)
+    if isinstance(data, dict) and volatiles:
+        data = {k: v for k, v in data.items() if k not in volatiles}
+    contenido = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(contenido.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _ultima_modificacion(recurso: str, etag: str) -> datetime:
+    """Momento desde el que este proceso sirve `etag` para el recurso"""
+    with _lock:
+        anterior = _modificados.get(recurso)
+        if anterior is not None and anterior[0] == etag:
+            _modificados.move_to_end(recurso)
+            return anterior[1]
+        # Resolución de segundos, como la cabecera HTTP
+        ahora = datetime.now(timezone.utc).replace(microsecond=0)
+        _modificados[recurso] = (etag, ahora)
+        if len(_modificados) > _MAX_RECURSOS:
+            _modificados.popitem(last=False)
+        return ahora
+
+
+def json_condicional(data: dict, volatiles: Iterable[str] = (), max_age: int = 0) -> Response:
+    """
+    jsonify(data) con ETag, Last-Modified y Cache-Control; responde 304 sin cuerpo si el
+    cliente ya tiene esa versión (If-None-Match / If-Modified-Since).
+    Args:
+        volatiles: campos de primer nivel que no forman parte del ETag (marcas de tiempo, mensajes)
+        max_age: segundos que el navegador puede reutilizar la respuesta sin revalidar
+    """
+    etag = etag_de(data, volatiles)
+    response = jsonify(data)
+    # Débil: la misma versión sirve comprimida o sin comprimir
+    response.set_etag(etag, weak=True)
+    response.last_modified = _ultima_modificacion(request.full_path, etag)
+    response.headers['Cache-Control'] = f"private, max-age={max_age}, must-revalidate" if max_age \
+        else "private, no-cache"
+    return response.make_conditional(request)
+
+
+def _codificacion() -> str:
+    """Mejor codificación aceptada por el cliente ('br', 'gzip' o '')"""
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    return 'gzip' if aceptadas['gzip'] else ''
+
+
+def comprimir(response: Response) -> Response:
+    """after_request: comprime las respuestas JSON/HTML si el cliente lo acepta"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'text/html')):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    codificacion = _codificacion() if len(data) >= Config.API_COMPRESS_MIN_SIZE else ''
+    if not codificacion:
+        return response
+
+    if codificacion == 'br':
+        comprimido = brotli.compress(data, quality=Config.API_BROTLI_QUALITY)
+    else:
+        comprimido = gzip.compress(data, compresslevel=Config.API_GZIP_LEVEL)
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificacion
+    return response
+
+
+def init_app(app: Flask):
+    """Registra la compresión de respuestas en la aplicación"""
+    if Config.API_COMPRESSION:
+        app.after_request(comprimir)
@@ -1,47 +1,32 @@
 import io
-from flask import Blueprint, request, render_template, send_file, flash, redirect, url_for, session, jsonify
-import logging
-import sys
+import json
 import os
+from datetime import date, datetime
+from flask import (Blueprint, Response, request, render_template, send_file, flash, redirect,
+                   url_for, session, jsonify, stream_with_context)
+import logging
 import re
 import traceback
 
-# Agregar el directorio raíz al path si es necesario
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-try:
-    from config import Config
-    from services.connection_service import ConnectionService
-    from services.ont_service import ONTService
-    from services.excel_service import ExcelService
-    from models.ont_model import ONT, ONTCollection
-except ImportError as e:
-    print(f"Error de importación básica: {e}")
-    print("Verificar que todos los archivos básicos estén en su lugar correcto")
-    sys.exit(1)
-
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from config import Config
+from controllers.http_cache import json_condicional
+from models.ont_model import ONT, ONTCollection
+from services import log_pipeline, registry
+from services.command_scheduler import BULK, DeviceSaturatedError, prioridad
+from services.device_health import DeviceUnavailableError
+from services.ont_service import ONTNoEncontradaError
+
 logger = logging.getLogger(__name__)
 
 # Crear blueprint
 ont_bp = Blueprint('ont', __name__)
 
-# Inicializar servicios básicos
-connection_service = ConnectionService(Config.DEVICE_CONFIG)
-ont_service = ONTService(connection_service)
-excel_service = ExcelService()
-
-# Intentar importar BoardService
-board_service = None
-try:
-    from services.board_service import BoardService
-    board_service = BoardService(connection_service)
-    logger.info("BoardService inicializado correctamente")
-except ImportError as e:
-    logger.error(f"Error importando BoardService: {e}")
-except Exception as e:
-    logger.error(f"Error inicializando BoardService: {e}")
+# Valores que terminan dentro de comandos CLI (fullmatch: sin saltos de línea al final)
+TARJETA_RE = re.compile(r'1[0-7]|[1-9]')
+PUERTO_RE = re.compile(r'1[0-5]|[0-9]')
+ONT_ID_RE = re.compile(r'25[0-5]|2[0-4][0-9]|1[0-9]{2}|[1-9]?[0-9]')
+
+# Los servicios (y netmiko/openpyxl) se crean bajo demanda a través de services.registry
 
 @ont_bp.route("/")
 def home():
@@ -64,17 +49,19 @@ def ont_page():
             flash("Por favor ingrese tarjeta y puerto válidos", "error")
         else:
             try:
-                ont_collection = ont_service.obtener_onts(tarjeta, puerto)
+                ont_collection = registry.get_ont_service().obtener_onts(tarjeta, puerto)
                 summary = ont_collection.get_summary()
                 session['last_onts'] = ont_collection.to_dict_list()
                 session['last_query'] = f"Tarjeta_{tarjeta}_Puerto_{puerto}"
                 flash(f"Se encontraron {ont_collection.get_total_count()} ONTs", "success")
+                if ont_collection.stale:
+                    flash(f"El OLT no responde: se muestran datos de hace {ont_collection.stale_age_s}s", "warning")
             except Exception as e:
                 flash(f"Error al consultar ONTs: {str(e)}", "error")
 
     return render_template(
         "ont.html",
-        onts=ont_collection.to_dict_list(),
+        datos=ont_collection.to_columnar(),
         tarjeta=tarjeta,
         puerto=puerto,
         summary=summary
@@ -82,50 +69,162 @@ def ont_page():
 
 @ont_bp.route("/download_tarjeta/<tarjeta>")
 def download_tarjeta(tarjeta):
-    """Consulta todos los puertos (0-15) de una tarjeta y descarga el Excel"""
+    """Encola la exportación de todos los puertos (0-15) de una tarjeta (ver /api/jobs)"""
     try:
-        if not tarjeta:
-            flash("Por favor ingrese una tarjeta válida", "error")
-            return redirect(url_for("ont.index"))
+        job = _encolar_exportacion(tarjeta)
+        flash(f"Exportación de la tarjeta {tarjeta} en curso (trabajo {job['id']}). "
+              f"Descárguela desde /api/jobs/{job['id']}/download al terminar.", "info")
+    except DeviceSaturatedError:
+        flash("El OLT está saturado en este momento. Intente la exportación más tarde.", "warning")
+    except ValueError as e:
+        flash(str(e), "error")
+    except Exception as e:
+        logger.error(f"Error encolando exportación de tarjeta {tarjeta}: {e}")
+        flash(f"Error al generar Excel: {str(e)}", "error")
+    return redirect(url_for("ont.home"))
 
-        all_onts = ONTCollection()
-        for p in range(16):  # puertos 0-15
-            try:
-                partial = ont_service.obtener_onts(tarjeta, str(p))
-                all_onts.extend(partial)  # ⚠️ tu ONTCollection debe soportar extend
-            except Exception as e:
-                # No detiene todo si un puerto falla, solo avisa
-                logger.warning(f"Error en puerto {p}: {e}")
-                continue
+def _encolar_exportacion(tarjetas) -> dict:
+    """Valida las tarjetas y encola (o reutiliza) el trabajo de exportación"""
+    from services.export_service import ExportService
+    tarjetas = ExportService.normalizar_tarjetas(tarjetas)
+    scheduler = registry.get_scheduler()
+    if scheduler is not None and scheduler.saturado(BULK):
+        raise DeviceSaturatedError(Config.DEVICE_CONFIG['ip'], BULK, 0)
+    return registry.get_job_manager().submit('export_tarjetas', {'tarjetas': tarjetas})
 
-        if all_onts.get_total_count() == 0:
-            flash("No se encontraron ONTs en la tarjeta.", "warning")
-            return redirect(url_for("ont.index"))
+@ont_bp.route("/api/jobs/export", methods=["POST"])
+def api_export_job():
+    """
+    Encola la exportación a Excel de una o varias tarjetas completas
+    Body JSON: {"tarjetas": ["4", "5"]}; si ya hay una igual en curso se retorna esa
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        job = _encolar_exportacion(data.get("tarjetas") or request.args.get("tarjetas", ""))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(job), 200 if job['deduplicado'] else 202
 
-        # Generar archivo Excel
-        file_stream = excel_service.generar_reporte(all_onts)
+@ont_bp.route("/api/jobs")
+def api_jobs():
+    """Trabajos en segundo plano conservados (sin el detalle por paso)"""
+    jobs = registry.get_job_manager().list()
+    return jsonify({"data": jobs, "count": len(jobs)})
 
-        filename = f"Reporte_Tarjeta_{tarjeta}_Puertos_0_15.xlsx"
+@ont_bp.route("/api/jobs/<job_id>")
+def api_job(job_id):
+    """Estado y progreso por puerto de un trabajo"""
+    job = registry.get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Trabajo {job_id} no encontrado"}), 404
+    return jsonify(job)
 
-        return send_file(
-            file_stream,
-            as_attachment=True,
-            download_name=filename,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+@ont_bp.route("/api/jobs/<job_id>/stream")
+def stream_job(job_id):
+    """Server-Sent Events con el progreso de un trabajo; se cierra cuando termina"""
+    manager = registry.get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Trabajo {job_id} no encontrado"}), 404
 
-    except Exception as e:
-        logger.error(f"Error generando Excel para tarjeta {tarjeta}: {e}")
-        flash(f"Error al generar Excel: {str(e)}", "error")
-        return redirect(url_for("ont.index"))
+    def generate():
+        nonlocal job
+        yield "retry: 5000\n\n"
+        yield f"id: {job['version']}\ndata: {json.dumps(job)}\n\n"
+        while job['terminado'] is None:
+            actual = manager.wait(job_id, job['version'], timeout=Config.AUTOFIND_STREAM_TIMEOUT)
+            if actual is None:
+                break
+            if actual['version'] != job['version']:
+                job = actual
+                yield f"id: {job['version']}\ndata: {json.dumps(job)}\n\n"
+            else:
+                yield ": heartbeat\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@ont_bp.route("/authorize_ont/<sn>")
+@ont_bp.route("/api/jobs/<job_id>/download")
+def download_job(job_id):
+    """Descarga el archivo generado por un trabajo completado"""
+    job = registry.get_job_manager().get(job_id)
+    ruta = registry.get_job_manager().archivo(job_id) if job else None
+    if ruta is None:
+        return jsonify({"error": f"El trabajo {job_id} no tiene un archivo disponible"}), 404
+    return send_file(
+        ruta,
+        as_attachment=True,
+        download_name=job['archivo'],
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+@ont_bp.route("/api/reports/optical", methods=["POST"])
+def api_optical_report():
+    """
+    Genera ahora el reporte óptico de todo el chasis (o lo reanuda si ya se empezó ese día)
+    Body JSON opcional: {"fecha": "YYYY-MM-DD", "tarjetas": ["4", "5"]}
+    """
+    from services.export_service import ExportService
+    data = request.get_json(silent=True) or {}
+    params = {"fecha": data.get("fecha") or date.today().isoformat()}
+    try:
+        date.fromisoformat(params["fecha"])
+        if data.get("tarjetas"):
+            params["tarjetas"] = ExportService.normalizar_tarjetas(data["tarjetas"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job = registry.get_job_manager().submit('reporte_optico', params)
+    return jsonify(job), 200 if job['deduplicado'] else 202
+
+@ont_bp.route("/api/reports")
+def api_reports():
+    """Reportes ópticos generados en REPORTS_DIR"""
+    reportes = []
+    if os.path.isdir(Config.REPORTS_DIR):
+        for nombre in sorted(os.listdir(Config.REPORTS_DIR), reverse=True):
+            ruta = os.path.join(Config.REPORTS_DIR, nombre)
+            if nombre.endswith('.xlsx') and os.path.isfile(ruta):
+                reportes.append({"nombre": nombre, "bytes": os.path.getsize(ruta),
+                                 "modificado": datetime.fromtimestamp(os.path.getmtime(ruta)).isoformat()})
+    return jsonify({"data": reportes, "count": len(reportes)})
+
+@ont_bp.route("/api/reports/<nombre>")
+def download_report(nombre):
+    """Descarga un reporte óptico generado"""
+    ruta = os.path.join(Config.REPORTS_DIR, os.path.basename(nombre))
+    if not nombre.endswith('.xlsx') or not os.path.isfile(ruta):
+        return jsonify({"error": f"Reporte {nombre} no encontrado"}), 404
+    return send_file(
+        ruta,
+        as_attachment=True,
+        download_name=os.path.basename(nombre),
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+def _buscar_en_autofind(sns):
+    """Resuelve números de serie a sus entradas en el índice de autofind"""
+    entries = {e['sn']: e for e in registry.get_autofind_watcher().snapshot()['data']}
+    encontradas = [entries[sn] for sn in sns if sn in entries]
+    faltantes = [sn for sn in sns if sn not in entries]
+    return encontradas, faltantes
+
+@ont_bp.route("/authorize_ont/<sn>", methods=["POST"])
 def authorize_ont(sn):
-    """Ruta para autorizar una ONT desde autofind"""
+    """Ruta para autorizar una ONT desde autofind (POST: modifica la configuración del OLT)"""
     try:
-        # Aquí iría la lógica para autorizar la ONT
-        # Por ahora solo mostramos un mensaje
-        flash(f"Funcionalidad de autorización para ONT {sn} - En desarrollo", "info")
+        encontradas, _ = _buscar_en_autofind([sn])
+        if not encontradas:
+            flash(f"La ONT {sn} no está en autofind. Actualice la lista e intente nuevamente.", "warning")
+            return redirect(url_for('ont.home'))
+
+        resultado = registry.get_provisioning_service().autorizar(encontradas)['resultados'][0]
+        if resultado['status'] == 'ok':
+            flash(f"ONT {sn} autorizada con ID {resultado['ont_id']} en {resultado['fsp']}", "success")
+        else:
+            flash(f"No se pudo autorizar la ONT {sn}: {resultado['error']}", "error")
         return redirect(url_for('ont.home'))
         
     except Exception as e:
@@ -133,6 +232,41 @@ def authorize_ont(sn):
         flash(f"Error al autorizar ONT: {str(e)}", "error")
         return redirect(url_for('ont.home'))
 
+@ont_bp.route("/api/provision", methods=["POST"])
+def provision_onts():
+    """
+    API endpoint para autorizar ONTs en lote
+    Body JSON: {"onts": [entradas de autofind]} o {"sns": [...]}, y opcionalmente
+    "params" para reemplazar perfiles/vlan de Config.PROVISIONING
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        entries = body.get("onts") or []
+        faltantes = []
+        if not isinstance(entries, list) or not isinstance(body.get("sns") or [], list):
+            return jsonify({"status": "error", "message": "onts y sns deben ser listas"}), 400
+        if body.get("sns"):
+            encontradas, faltantes = _buscar_en_autofind(body["sns"])
+            entries = entries + encontradas
+
+        if not entries:
+            return jsonify({"status": "error", "message": "No se indicaron ONTs para autorizar",
+                            "no_encontradas": faltantes}), 400
+
+        scheduler = registry.get_scheduler()
+        if scheduler is not None and scheduler.saturado(BULK):
+            return jsonify({"status": "error", "message": "OLT saturado, reintente más tarde"}), 429
+
+        with prioridad(BULK):
+            resultado = registry.get_provisioning_service().autorizar(entries, body.get("params"))
+        return jsonify({"status": "success", **resultado, "no_encontradas": faltantes})
+
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en autorización masiva: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @ont_bp.route("/download_excel")
 def download_excel():
     """Controlador para descargar Excel"""
@@ -164,7 +298,7 @@ def download_excel():
             ont_collection.add_ont(ont)
         
         # Generar archivo
-        file_stream = excel_service.generar_reporte(ont_collection)
+        file_stream = registry.get_excel_service().generar_reporte(ont_collection)
         
         # Nombre del archivo con información de la consulta
         query_info = session.get('last_query', 'ONTs')
@@ -193,6 +327,7 @@ def get_board_data(tarjeta):
     try:
         logger.info(f"=== API Request: Tarjeta {tarjeta} ===")
 
+        board_service = registry.get_board_service()
         if board_service is None:
             logger.error("BoardService no está disponible")
             return jsonify({
@@ -200,44 +335,178 @@ def get_board_data(tarjeta):
             }), 500
 
         # Validar formato de tarjeta (ejemplo: "0/2")
-        if not re.match(r'^(1[0-7]|[1-9])$', tarjeta):
+        if not TARJETA_RE.fullmatch(tarjeta):
             logger.warning(f"Formato de tarjeta inválido: {tarjeta}")
             return jsonify({
                 "error": "Formato de tarjeta inválido. Solo se permiten números entre 1 y 15"
             }), 400
 
-        board_data = board_service.obtener_puertos_tarjeta(tarjeta)
+        board_data = board_service.obtener_puertos_tarjeta(tarjeta, force=request.args.get("refresh") == "1")
         logger.info(f"Consulta exitosa para tarjeta {tarjeta}")
-        return jsonify(board_data)
+        # La antigüedad de una copia stale cambia en cada llamada sin que cambien los datos
+        return json_condicional(board_data, volatiles=('stale_age_s',))
+
+    except DeviceUnavailableError as e:
+        return jsonify({"error": str(e), "retry_in_s": round(e.retry_in)}), 503
 
     except Exception as e:
         logger.error(f"Error en API /api/board/{tarjeta}: {e}")
         logger.error(traceback.format_exc())
         return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
 
+@ont_bp.route("/api/chassis")
+def get_chassis_data():
+    """API endpoint con todas las tarjetas de servicio del chasis (desde caché)"""
+    try:
+        board_service = registry.get_board_service()
+        if board_service is None:
+            return jsonify({
+                "error": "Servicio de tarjetas no disponible. Verifique la configuración del servidor."
+            }), 500
+
+        force = request.args.get("refresh") == "1"
+        return json_condicional(board_service.obtener_chasis(force=force), volatiles=('stale_age_s',))
+
+    except DeviceUnavailableError as e:
+        return jsonify({"error": str(e), "retry_in_s": round(e.retry_in)}), 503
+
+    except Exception as e:
+        logger.error(f"Error en API /api/chassis: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
+
+@ont_bp.route("/api/ont/<tarjeta>/<puerto>/<ont_id>")
+def get_ont_detail(tarjeta, puerto, ont_id):
+    """API endpoint con el detalle de una sola ONT (?refresh=1 ignora la caché)"""
+    if not (TARJETA_RE.fullmatch(tarjeta) and PUERTO_RE.fullmatch(puerto) and ONT_ID_RE.fullmatch(ont_id)):
+        return jsonify({"status": "error", "message": "Tarjeta, puerto o ID de ONT inválidos"}), 400
+    try:
+        detalle = registry.get_ont_service().obtener_detalle(
+            tarjeta, puerto, ont_id, force=request.args.get("refresh") == "1"
+        )
+        return jsonify({"status": "success", "data": detalle.to_dict()})
+    except DeviceUnavailableError as e:
+        return jsonify({"status": "error", "message": str(e), "retry_in_s": round(e.retry_in)}), 503
+    except ONTNoEncontradaError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error en API /api/ont/{tarjeta}/{puerto}/{ont_id}: {e}")
+        return jsonify({"status": "error", "message": f"Error interno del servidor: {str(e)}"}), 500
+
+@ont_bp.route("/api/onts/<tarjeta>/columnar")
+def get_onts_columnar(tarjeta):
+    """
+    API endpoint con las ONTs de varios puertos de una tarjeta en formato columnar
+    (ONTCollection.to_columnar). ?puertos=0,1,2 (por defecto los 16 puertos).
+    """
+    puertos = [p.strip() for p in request.args.get("puertos", "").split(",") if p.strip()] \
+        or [str(p) for p in range(16)]
+    if not TARJETA_RE.fullmatch(tarjeta) or not all(PUERTO_RE.fullmatch(p) for p in puertos):
+        return jsonify({"status": "error", "message": "Tarjeta o puertos inválidos"}), 400
+    try:
+        por_puerto = registry.get_ont_service().obtener_onts_tarjeta(tarjeta, puertos)
+    except DeviceUnavailableError as e:
+        return jsonify({"status": "error", "message": str(e), "retry_in_s": round(e.retry_in)}), 503
+    except Exception as e:
+        logger.error(f"Error en API /api/onts/{tarjeta}/columnar: {e}")
+        return jsonify({"status": "error", "message": f"Error interno del servidor: {str(e)}"}), 500
+
+    ont_collection = ONTCollection()
+    for collection in por_puerto.values():
+        ont_collection.extend(collection)
+        if collection.stale:
+            ont_collection.stale = True
+            ont_collection.stale_age_s = max(ont_collection.stale_age_s or 0, collection.stale_age_s or 0)
+    return json_condicional(ont_collection.to_columnar(), volatiles=('stale_age_s',))
+
+@ont_bp.route("/api/onts")
+def get_inventory():
+    """
+    API endpoint del inventario de ONTs de todo el chasis (no consulta el OLT).
+    Filtros: tarjeta, puerto, estado, causa, descripcion, down_within y <campo>_min/<campo>_max;
+    orden: sort=<campo> o sort=-<campo>; paginación: limit y cursor.
+    """
+    filters = {k: v for k, v in request.args.items() if k not in ('sort', 'limit', 'cursor')}
+    try:
+        result = registry.get_ont_inventory().query(
+            filters,
+            sort=request.args.get("sort", "ont"),
+            limit=request.args.get("limit", 100, type=int),
+            cursor=request.args.get("cursor")
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", **result})
+
+@ont_bp.route("/api/search")
+def search_onts():
+    """API endpoint de búsqueda de ONTs por SN, descripción o ubicación en todo el chasis"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"status": "error", "message": "Parámetro q requerido"}), 400
+    try:
+        result = registry.get_search_index().search(
+            query,
+            field=request.args.get("field") or None,
+            limit=request.args.get("limit", 20, type=int)
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", **result})
+
+@ont_bp.route("/api/health")
+def get_health():
+    """API endpoint con el estado del circuit breaker del OLT y de la cola de logs del proceso"""
+    return jsonify({**registry.get_connection_pool().health.to_dict(), 'logging': log_pipeline.estado()})
+
+@ont_bp.route("/api/events")
+def get_events():
+    """API endpoint con los eventos recibidos del OLT (syslog/traps) y las consultas pendientes"""
+    if not Config.EVENTS_ENABLED:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **registry.get_event_processor().snapshot()})
+
+@ont_bp.route("/api/scheduler/metrics")
+def get_scheduler_metrics():
+    """API endpoint con la profundidad de cola y tiempos de espera del scheduler de comandos"""
+    scheduler = registry.get_scheduler()
+    return jsonify(scheduler.metrics() if scheduler is not None else {"enabled": False})
+
 @ont_bp.route("/api/test")
 def test_api():
     """Endpoint de prueba para verificar que la API funciona"""
     return jsonify({
         "status": "ok", 
         "message": "API funcionando correctamente",
-        "board_service_available": board_service is not None
+        "board_service_available": registry.get_board_service() is not None
     })
 
+# Mismo ETag para /api/autofind y /api/autofind/refresh mientras no cambien las ONTs
+AUTOFIND_VOLATILES = ('last_refreshed', 'message')
+
+@ont_bp.route("/api/autofind")
+def get_autofind():
+    """API endpoint con el índice de autofind en memoria (no consulta el OLT)"""
+    snapshot = registry.get_autofind_watcher().snapshot()
+    return json_condicional({
+        "status": "success",
+        **snapshot,
+        "message": f"Se encontraron {snapshot['count']} ONUs detectadas automáticamente"
+    }, volatiles=AUTOFIND_VOLATILES)
+
 @ont_bp.route("/api/autofind/refresh")
 def refresh_autofind():
     """API endpoint para refrescar datos de autofind"""
     try:
         logger.info("Iniciando consulta de autofind ONTs")
-        autofind_list = ont_service.obtener_autofind_onts()
-        logger.info(f"Se obtuvieron {len(autofind_list)} ONTs en autofind")
+        snapshot = registry.get_autofind_watcher().refresh()
+        logger.info(f"Se obtuvieron {snapshot['count']} ONTs en autofind")
         
-        return jsonify({
+        return json_condicional({
             "status": "success",
-            "count": len(autofind_list),
-            "data": autofind_list,
-            "message": f"Se encontraron {len(autofind_list)} ONUs detectadas automáticamente"
-        })
+            **snapshot,
+            "message": f"Se encontraron {snapshot['count']} ONUs detectadas automáticamente"
+        }, volatiles=AUTOFIND_VOLATILES)
     except Exception as e:
         logger.error(f"Error refrescando autofind: {e}")
         return jsonify({
@@ -245,12 +514,47 @@ def refresh_autofind():
             "message": str(e)
         }), 500
 
+@ont_bp.route("/api/autofind/stream")
+def stream_autofind():
+    """Server-Sent Events con las ONTs que aparecen o desaparecen de autofind"""
+    watcher = registry.get_autofind_watcher()
+    # EventSource reenvía el último id recibido al reconectarse
+    seq = request.headers.get("Last-Event-ID", type=int)
+    if seq is None:
+        seq = request.args.get("since", type=int)
+    if seq is None:
+        seq = watcher.snapshot()['seq']
+
+    def generate():
+        nonlocal seq
+        # Indicar al navegador cada cuánto reintentar si se corta la conexión
+        yield "retry: 5000\n\n"
+        while True:
+            result = watcher.events_since(seq, timeout=Config.AUTOFIND_STREAM_TIMEOUT)
+            if result['reset'] or result['events']:
+                seq = result['seq']
+                yield f"id: {seq}\ndata: {json.dumps(result)}\n\n"
+            else:
+                yield ": heartbeat\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @ont_bp.errorhandler(Exception)
 def handle_error(error):
     """Manejo global de errores"""
     logger.error(f"Error no manejado: {error}")
     logger.error(f"Traceback: {traceback.format_exc()}")
     
+    if isinstance(error, DeviceSaturatedError):
+        if request.path.startswith('/api/'):
+            return jsonify({"error": str(error), "retry_in_s": round(error.retry_in)}), 429
+        flash("El OLT está saturado en este momento. Intente nuevamente más tarde.", "warning")
+        return redirect(url_for('ont.home'))
+    
     # Si es una petición AJAX (API), devolver JSON
     if request.path.startswith('/api/'):
         return jsonify({"error": "Error interno del servidor"}), 500
@@ -0,0 +1,32 @@
+"""
+Configuración de gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+
+Con varios workers las sesiones SSH, la caché y el watcher de autofind viven en
+el broker de sesiones (services.session_broker), que se inicia una sola vez desde
+el proceso maestro antes de crear los workers.
+"""
+import os
+
+from config import Config
+
+bind = Config.WSGI_BIND
+workers = Config.WSGI_WORKERS
+threads = Config.WSGI_THREADS
+worker_class = 'gthread'
+timeout = Config.WSGI_TIMEOUT
+graceful_timeout = 30
+
+if workers > 1:
+    # Los workers (fork del maestro) heredan Config y el entorno
+    os.environ['OLT_SESSION_BROKER'] = '1'
+    Config.SESSION_BROKER_ENABLED = True
+
+
+def on_starting(server):
+    """Inicia el broker antes de crear los workers para que no compitan por lanzarlo"""
+    if not Config.SESSION_BROKER_ENABLED:
+        return
+    from services.session_broker import broker_authkey, ensure_broker
+    # La clave se crea aquí (antes del fork) y los workers leen el mismo archivo
+    if not ensure_broker(Config.SESSION_BROKER_ADDRESS, broker_authkey()):
+        server.log.error("No se pudo iniciar el broker de sesiones; cada worker lo intentará al primer uso")
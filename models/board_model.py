@@ -1,33 +1,54 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
 class Puerto:
     """Modelo para representar un puerto PON"""
-    
-    def __init__(self, puerto: str, total_onts: int, online_onts: int, 
+
+    # Porcentaje de ONTs online a partir del cual el puerto está en cada estado
+    UMBRAL_ONLINE = 70
+    UMBRAL_WARNING = 30
+
+    def __init__(self, puerto: str, total_onts: int, online_onts: int,
                  puerto_completo: str = None):
         self.puerto = puerto
         self.puerto_completo = puerto_completo or f"0/X/{puerto}"
+        self._set_conteos(total_onts, online_onts)
+
+    def _set_conteos(self, total_onts: int, online_onts: int):
+        """Asigna los conteos y recalcula los campos derivados"""
         self.total_onts = total_onts
         self.online_onts = online_onts
         self.offline_onts = total_onts - online_onts
         self.percentage = round((online_onts / total_onts) * 100) if total_onts > 0 else 0
         self.status = self._calculate_status()
-    
+
     def _calculate_status(self) -> str:
         """Calcula el estado del puerto basado en el porcentaje de ONTs online"""
-        if self.percentage >= 70:
+        if self.percentage >= self.UMBRAL_ONLINE:
             return 'online'
-        elif self.percentage >= 30:
+        elif self.percentage >= self.UMBRAL_WARNING:
             return 'warning'
         else:
             return 'critical'
-    
+
+    def aporte(self) -> Dict[str, int]:
+        """Contribución del puerto a los contadores de su tarjeta"""
+        return {
+            'total_puertos': 1,
+            f'puertos_{self.status}': 1,
+            'total_onts': self.total_onts,
+            'total_online': self.online_onts
+        }
+
     def is_healthy(self) -> bool:
         """Retorna True si el puerto estÃ¡ en estado saludable"""
         return self.status == 'online'
-    
+
     def needs_attention(self) -> bool:
         """Retorna True si el puerto necesita atenciÃ³n"""
         return self.status in ['warning', 'critical']
-    
+
     def to_dict(self) -> dict:
         """Convierte el objeto a diccionario"""
         return {
@@ -41,51 +62,154 @@ class Puerto:
         }
 
 
-class TarjetaBoard:
-    """Modelo para representar una tarjeta con sus puertos"""
-    
-    def __init__(self, tarjeta: str):
-        self.tarjeta = tarjeta
-        self.puertos = []
-    
-    def add_puerto(self, puerto: Puerto):
-        """Agrega un puerto a la tarjeta"""
-        self.puertos.append(puerto)
-    
+class Rollup:
+    """
+    Contadores agregados de puertos que se mantienen al agregar o cambiar un puerto
+    (sin recorrerlos) y se propagan al nivel superior (tarjeta -> chasis -> ...).
+
+    Los modelos en caché se modifican en el lugar desde los hilos de eventos mientras
+    las peticiones los serializan: los cambios de conteos y to_dict() se hacen bajo
+    `lock`, compartido por todos los niveles (atributo de clase: no se serializa con pickle).
+    """
+
+    CLAVES = ('total_puertos', 'puertos_online', 'puertos_warning', 'puertos_critical',
+              'total_onts', 'total_online')
+    lock = threading.RLock()
+
+    def __init__(self):
+        self._conteos = dict.fromkeys(self.CLAVES, 0)
+        self.padre: Optional['Rollup'] = None
+
+    def _aplicar(self, delta: Dict[str, int], signo: int = 1):
+        """Suma (o resta) un delta a los contadores de este nivel y de los superiores"""
+        nivel = self
+        while nivel is not None:
+            for clave, valor in delta.items():
+                nivel._conteos[clave] += signo * valor
+            nivel = nivel.padre
+
     def get_estadisticas(self) -> dict:
-        """Calcula estadÃ­sticas generales de la tarjeta"""
-        total_puertos = len(self.puertos)
-        puertos_online = len([p for p in self.puertos if p.status == 'online'])
-        puertos_warning = len([p for p in self.puertos if p.status == 'warning'])
-        puertos_critical = len([p for p in self.puertos if p.status == 'critical'])
-        
-        total_onts = sum(p.total_onts for p in self.puertos)
-        total_online = sum(p.online_onts for p in self.puertos)
-        total_offline = total_onts - total_online
-        
+        """Estadísticas agregadas (O(1))"""
+        with self.lock:
+            conteos = dict(self._conteos)
         return {
-            'total_puertos': total_puertos,
-            'puertos_online': puertos_online,
-            'puertos_warning': puertos_warning,
-            'puertos_critical': puertos_critical,
-            'total_onts': total_onts,
-            'total_online': total_online,
-            'total_offline': total_offline,
-            'porcentaje_general': round((total_online / total_onts) * 100) if total_onts > 0 else 0
+            **conteos,
+            'total_offline': conteos['total_onts'] - conteos['total_online'],
+            'porcentaje_general': (
+                round((conteos['total_online'] / conteos['total_onts']) * 100) if conteos['total_onts'] > 0 else 0
+            )
         }
-    
+
+
+class TarjetaBoard(Rollup):
+    """Modelo para representar una tarjeta con sus puertos"""
+
+    def __init__(self, tarjeta: str, puertos: Iterable[Puerto] = ()):
+        super().__init__()
+        self.tarjeta = tarjeta
+        self.puertos: List[Puerto] = []
+        self._por_numero: Dict[str, Puerto] = {}
+        for puerto in puertos:
+            self.add_puerto(puerto)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TarjetaBoard':
+        """Crea la tarjeta a partir del diccionario que retorna BoardService"""
+        return cls(data['tarjeta'], (Puerto(p['puerto'], p['total_onts'], p['online_onts'], p.get('puerto_completo'))
+                                     for p in data.get('puertos', [])))
+
+    def add_puerto(self, puerto: Puerto):
+        """Agrega un puerto a la tarjeta (ordenados por número); si ya existe se reemplazan sus conteos"""
+        with self.lock:
+            existente = self._por_numero.get(str(puerto.puerto))
+            if existente is not None:
+                self.actualizar_puerto(puerto.puerto, puerto.total_onts, puerto.online_onts)
+                return
+            self._por_numero[str(puerto.puerto)] = puerto
+            self.puertos.append(puerto)
+            if len(self.puertos) > 1 and int(self.puertos[-2].puerto) > int(puerto.puerto):
+                self.puertos.sort(key=lambda p: int(p.puerto))
+            self._aplicar(puerto.aporte())
+
+    def get_puerto(self, puerto) -> Optional[Puerto]:
+        return self._por_numero.get(str(puerto))
+
+    def actualizar_puerto(self, puerto, total_onts: Optional[int] = None, online_onts: Optional[int] = None,
+                          delta_online: int = 0) -> bool:
+        """
+        Cambia los conteos de un puerto y ajusta los contadores de la tarjeta y de los
+        niveles superiores con la diferencia. Retorna False si el puerto no existe.
+        """
+        p = self._por_numero.get(str(puerto))
+        if p is None:
+            return False
+        with self.lock:
+            total = p.total_onts if total_onts is None else total_onts
+            online = p.online_onts if online_onts is None else online_onts
+            online = max(0, min(total, online + delta_online))
+            if (total, online) == (p.total_onts, p.online_onts):
+                return True
+            anterior = p.aporte()
+            p._set_conteos(total, online)
+            self._aplicar(anterior, -1)
+            self._aplicar(p.aporte())
+        return True
+
     def get_puertos_criticos(self) -> list:
         """Retorna lista de puertos en estado crÃ­tico"""
         return [p for p in self.puertos if p.status == 'critical']
-    
+
     def get_puertos_warning(self) -> list:
         """Retorna lista de puertos en estado warning"""
         return [p for p in self.puertos if p.status == 'warning']
-    
+
     def to_dict(self) -> dict:
         """Convierte el objeto a diccionario"""
-        return {
-            'tarjeta': self.tarjeta,
-            'puertos': [p.to_dict() for p in self.puertos],
-            'estadisticas': self.get_estadisticas()
-        }
\ No newline at end of file
+        with self.lock:
+            return {
+                'tarjeta': self.tarjeta,
+                'puertos': [p.to_dict() for p in self.puertos],
+                'estadisticas': self.get_estadisticas()
+            }
+
+
+class ChasisBoard(Rollup):
+    """Modelo para representar todas las tarjetas de servicio de un chasis"""
+
+    def __init__(self, tarjetas: list = None, errores: dict = None):
+        super().__init__()
+        self.tarjetas: List[TarjetaBoard] = []
+        self._por_tarjeta: Dict[str, TarjetaBoard] = {}
+        self.errores = errores or {}  # tarjeta -> mensaje de error
+        for tarjeta in sorted(tarjetas or [], key=lambda t: int(t.tarjeta)):
+            self.add_tarjeta(tarjeta)
+
+    def add_tarjeta(self, tarjeta: TarjetaBoard):
+        """Agrega una tarjeta; sus contadores (y sus cambios posteriores) se suman al chasis"""
+        with self.lock:
+            tarjeta.padre = self
+            self.tarjetas.append(tarjeta)
+            self._por_tarjeta[str(tarjeta.tarjeta)] = tarjeta
+            self._aplicar(tarjeta._conteos)
+
+    def get_tarjeta(self, tarjeta) -> Optional[TarjetaBoard]:
+        return self._por_tarjeta.get(str(tarjeta))
+
+    def actualizar_puerto(self, tarjeta, puerto, **conteos) -> bool:
+        """Cambia los conteos de un puerto de una tarjeta del chasis"""
+        t = self.get_tarjeta(tarjeta)
+        return t is not None and t.actualizar_puerto(puerto, **conteos)
+
+    @property
+    def estadisticas(self) -> dict:
+        """Estadísticas agregadas de todas las tarjetas"""
+        return {**self.get_estadisticas(), 'total_tarjetas': len(self.tarjetas)}
+
+    def to_dict(self) -> dict:
+        """Convierte el objeto a diccionario"""
+        with self.lock:
+            return {
+                'tarjetas': [t.to_dict() for t in self.tarjetas],
+                'estadisticas': self.estadisticas,
+                'errores': self.errores
+            }
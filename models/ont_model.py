@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional
 
 @dataclass
 class ONT:
@@ -16,6 +16,7 @@ class ONT:
     last_down_time: str = ""
     last_down_cause: str = ""
     descripcion: str = ""
+    sn: str = ""
     
     def __post_init__(self):
         """Calcula la diferencia RX después de la inicialización"""
@@ -45,15 +46,83 @@ class ONT:
             'last_down_time': self.last_down_time,
             'last_down_cause': self.last_down_cause,
             'descripcion': self.descripcion,
+            'sn': self.sn,
             'is_online': self.is_online(),
             'has_critical_rx_diff': self.has_critical_rx_diff()
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ONT':
+        """Crea la ONT a partir de to_dict() (ignora los campos calculados)"""
+        campos = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in campos and k != 'rx_diff'})
+
+@dataclass
+class ONTDetalle(ONT):
+    """Detalle de una sola ONT (display ont info / optical-info / register-info / wan-info)"""
+    control_flag: str = ""
+    config_state: str = ""
+    match_state: str = ""
+    equipment_id: str = ""
+    line_profile: str = ""
+    service_profile: str = ""
+    cpu_occupation: str = ""
+    memory_occupation: str = ""
+    last_up_time: str = ""
+    last_dying_gasp_time: str = ""
+    online_duration: str = ""
+    tx_power: Optional[float] = None
+    voltage: Optional[float] = None
+    bias_current: Optional[float] = None
+    catv_rx: Optional[float] = None
+    registros: List[dict] = field(default_factory=list)   # historial de altas/caídas
+    wan: List[dict] = field(default_factory=list)         # conexiones WAN de la ONT
+    errores: Dict[str, str] = field(default_factory=dict)  # comando -> error (secciones opcionales)
+    consultado: str = ""
+    stale: bool = False
+    stale_age_s: Optional[float] = None
+    
+    def to_dict(self) -> dict:
+        """Convierte el detalle a diccionario para la API"""
+        return {
+            **super().to_dict(),
+            'control_flag': self.control_flag,
+            'config_state': self.config_state,
+            'match_state': self.match_state,
+            'equipment_id': self.equipment_id,
+            'line_profile': self.line_profile,
+            'service_profile': self.service_profile,
+            'cpu_occupation': self.cpu_occupation,
+            'memory_occupation': self.memory_occupation,
+            'last_up_time': self.last_up_time,
+            'last_dying_gasp_time': self.last_dying_gasp_time,
+            'online_duration': self.online_duration,
+            'tx_power': self.tx_power,
+            'voltage': self.voltage,
+            'bias_current': self.bias_current,
+            'catv_rx': self.catv_rx,
+            'registros': self.registros,
+            'wan': self.wan,
+            'errores': self.errores,
+            'consultado': self.consultado,
+            'stale': self.stale,
+            'stale_age_s': self.stale_age_s
+        }
+
 class ONTCollection:
     """Colección de ONTs con métodos de utilidad"""
     
+    # Columnas del formato columnar (los campos calculados los deriva el cliente)
+    COLUMNAS = ('id', 'tarjeta', 'puerto', 'ont_rx', 'olt_rx', 'rx_diff', 'temperature', 'distance',
+                'estado', 'last_down_time', 'last_down_cause', 'descripcion', 'sn')
+    # Columnas con pocos valores distintos: se envían como índices a un diccionario
+    COLUMNAS_DICCIONARIO = ('tarjeta', 'puerto', 'estado', 'last_down_cause')
+    
     def __init__(self, onts: List[ONT] = None):
         self.onts = onts or []
+        # Se marca como stale cuando se sirve la última copia buena porque el OLT no responde
+        self.stale = False
+        self.stale_age_s: Optional[float] = None
     
     def add_ont(self, ont: ONT):
         """Agrega una ONT a la colección"""
@@ -84,4 +153,29 @@ class ONTCollection:
             'total_onts': self.get_total_count(),
             'online_onts': self.get_online_count(),
             'critical_onts': self.get_critical_count()
-        }
\ No newline at end of file
+        }
+    
+    def to_columnar(self) -> dict:
+        """
+        Formato columnar compacto para la API: los nombres de campo una sola vez, una
+        lista de valores por columna y las columnas repetitivas codificadas como índices
+        a `diccionarios[campo]`.
+        """
+        columnas = []
+        diccionarios = {}
+        for campo in self.COLUMNAS:
+            valores = [getattr(ont, campo) for ont in self.onts]
+            if campo in self.COLUMNAS_DICCIONARIO:
+                indices: Dict[str, int] = {}
+                valores = [indices.setdefault(v, len(indices)) for v in valores]
+                diccionarios[campo] = list(indices)
+            columnas.append(valores)
+        return {
+            'filas': len(self.onts),
+            'campos': list(self.COLUMNAS),
+            'columnas': columnas,
+            'diccionarios': diccionarios,
+            'resumen': self.get_summary(),
+            'stale': self.stale,
+            'stale_age_s': self.stale_age_s
+        }
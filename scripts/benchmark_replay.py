@@ -0,0 +1,167 @@
+"""
+Ejecuta los parsers, los servicios y las rutas Flask contra un transcript capturado
+(Config.CAPTURE_FILE) en lugar del OLT, y reporta latencias y throughput. Sin OLT, sin
+limitador de comandos y sin latencia de red: los resultados son reproducibles.
+
+Captura (en producción):
+    OLT_CAPTURE_FILE=captures/olt-{pid}.jsonl.gz python app.py
+
+Uso:
+    python scripts/benchmark_replay.py captures/olt-1234.jsonl.gz
+    python scripts/benchmark_replay.py captures/olt-1234.jsonl.gz --iterations 200 --http
+    python scripts/benchmark_replay.py captures/olt-1234.jsonl.gz --latency-factor 1   # latencia capturada
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from services.transcript import Transcript  # noqa: E402
+
+
+def _configurar(transcript_path: str, latency_factor: float):
+    """Modo reproducción sin procesos ni hilos en segundo plano"""
+    Config.REPLAY_FILE = transcript_path
+    Config.REPLAY_LATENCY_FACTOR = latency_factor
+    Config.CAPTURE_FILE = None
+    Config.SESSION_BROKER_ENABLED = False
+    Config.AUTOFIND_WATCHER_ENABLED = False
+    Config.INVENTORY_POLL_ENABLED = False
+    Config.OPTICAL_REPORT_ENABLED = False
+    Config.KEEPALIVE_INTERVAL = 0
+    Config.CHASSIS_CACHE_TTL = 0
+    Config.ONT_DETAIL_TTL = 0
+
+
+def _carga(path: str) -> Dict[str, list]:
+    """Puertos, tarjetas y comandos presentes en el transcript"""
+    puertos, tarjetas, salidas = set(), set(), {}
+    chasis = False
+    for registro in Transcript.iter_records(path):
+        if registro.get('error'):
+            continue
+        command, context = registro['command'], registro['context']
+        interfaz = re.match(r'interface-gpon-\d+/(\d+)$', context)
+        summary = re.match(r'display ont info summary (\d+)$', command)
+        if interfaz and summary:
+            puertos.add((interfaz.group(1), summary.group(1)))
+        if interfaz:
+            salidas[(interfaz.group(1), command)] = registro['output']
+        board = re.match(r'display board 0/(\d+) \| include port$', command)
+        if board:
+            tarjetas.add(board.group(1))
+        chasis = chasis or command == 'display board 0'
+    return {
+        'puertos': sorted(puertos, key=lambda p: (int(p[0]), int(p[1]))),
+        'tarjetas': sorted(tarjetas, key=int),
+        'chasis': chasis,
+        'salidas': salidas
+    }
+
+
+def _medir(nombre: str, fn: Callable[[], object], iterations: int) -> dict:
+    tiempos = []
+    errores = 0
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            errores += 1
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    total_s = sum(tiempos) / 1000
+    return {
+        'nombre': nombre,
+        'n': iterations,
+        'errores': errores,
+        'media_ms': statistics.mean(tiempos),
+        'p50_ms': tiempos[len(tiempos) // 2],
+        'p95_ms': tiempos[min(int(len(tiempos) * 0.95), len(tiempos) - 1)],
+        'max_ms': tiempos[-1],
+        'ops_s': iterations / total_s if total_s else float('inf')
+    }
+
+
+def _casos(carga: Dict[str, list], http: bool) -> List[Tuple[str, Callable[[], object]]]:
+    from services import registry
+    ont_service = registry.get_ont_service()
+    board_service = registry.get_board_service()
+    casos = []
+
+    for tarjeta, puerto in carga['puertos']:
+        summary = carga['salidas'].get((tarjeta, f"display ont info summary {puerto}"), '')
+        optical = carga['salidas'].get((tarjeta, f"display ont optical-info {puerto} all"), '')
+        casos.append((f"parser onts {tarjeta}/{puerto}",
+                      lambda s=summary, o=optical, t=tarjeta, p=puerto: ont_service._parse_ont_data(s, o, t, p)))
+        casos.append((f"ONTService {tarjeta}/{puerto}",
+                      lambda t=tarjeta, p=puerto: ont_service.obtener_onts(t, p)))
+
+    if board_service is not None:
+        for tarjeta in carga['tarjetas']:
+            casos.append((f"BoardService {tarjeta}", lambda t=tarjeta: board_service.obtener_puertos_tarjeta(t)))
+        if carga['chasis']:
+            casos.append(("BoardService chasis", lambda: board_service.obtener_chasis(force=True)))
+
+    if http:
+        from app import create_app
+        client = create_app().test_client()
+
+        def get(url):
+            response = client.get(url)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{url}: HTTP {response.status_code}")
+            return response
+
+        def post_onts(tarjeta, puerto):
+            response = client.post("/onts", data={"tarjeta": tarjeta, "puerto": puerto})
+            if response.status_code >= 400:
+                raise RuntimeError(f"/onts: HTTP {response.status_code}")
+            return response
+
+        for tarjeta, puerto in carga['puertos']:
+            casos.append((f"POST /onts {tarjeta}/{puerto}", lambda t=tarjeta, p=puerto: post_onts(t, p)))
+        for tarjeta in carga['tarjetas']:
+            casos.append((f"GET /api/board/{tarjeta}", lambda t=tarjeta: get(f"/api/board/{t}")))
+        if carga['chasis']:
+            casos.append(("GET /api/chassis", lambda: get("/api/chassis?refresh=1")))
+    return casos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcript", help="archivo .jsonl.gz capturado con OLT_CAPTURE_FILE")
+    parser.add_argument("--iterations", type=int, default=50, help="repeticiones por caso")
+    parser.add_argument("--latency-factor", type=float, default=0.0,
+                        help="factor de la latencia capturada (0 = ninguna, 1 = real)")
+    parser.add_argument("--http", action="store_true", help="incluir las rutas Flask (test client)")
+    parser.add_argument("--filter", default="", help="solo los casos que contengan este texto")
+    args = parser.parse_args()
+
+    _configurar(args.transcript, args.latency_factor)
+    carga = _carga(args.transcript)
+    print(f"Transcript: {len(carga['puertos'])} puertos, {len(carga['tarjetas'])} tarjetas, "
+          f"chasis: {'sí' if carga['chasis'] else 'no'}")
+
+    casos = [(n, fn) for n, fn in _casos(carga, args.http) if args.filter in n]
+    if not casos:
+        print("El transcript no tiene comandos reconocidos para medir")
+        return 1
+
+    print(f"{'caso':<32}{'n':>6}{'err':>5}{'media':>10}{'p50':>10}{'p95':>10}{'max':>10}{'ops/s':>10}")
+    for nombre, fn in casos:
+        r = _medir(nombre, fn, args.iterations)
+        print(f"{r['nombre']:<32}{r['n']:>6}{r['errores']:>5}{r['media_ms']:>10.3f}{r['p50_ms']:>10.3f}"
+              f"{r['p95_ms']:>10.3f}{r['max_ms']:>10.3f}{r['ops_s']:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
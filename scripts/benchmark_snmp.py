@@ -0,0 +1,182 @@
+"""
+Compara el backend SNMP (GETBULK) con el scraping CLI sobre el mismo chasis sintético.
+
+El CLI se ejecuta con ReplayConnection sobre un transcript generado a partir de los datos
+(mismas salidas que "display ont info summary", "display ont optical-info" y "display
+board"), y SNMP contra scripts/snmp_agent.py en un puerto UDP local. Primero se verifica
+que ambos caminos entreguen exactamente las mismas ONTs y puertos; luego se mide cada
+tarjeta completa. --cli-ms / --snmp-ms simulan la latencia de cada comando/consulta
+(en un OLT real un comando CLI de una tabla grande tarda segundos).
+
+La columna cpu es el tiempo de CPU de la aplicación por iteración (hilo que consulta; el
+agente SNMP corre en otro hilo del mismo proceso y no se cuenta, pero compite por el GIL y
+explica buena parte de la diferencia con la media, que en producción es del OLT). SNMP ahorra latencia del
+OLT, pero codificar y decodificar BER en Python puro cuesta bastante más CPU que parsear
+la salida CLI (con --cli-ms 0 --snmp-ms 0, unas decenas de ms por tarjeta contra pocos
+ms): conviene cuando los comandos CLI son lentos o el OLT está cargado, no cuando la CPU
+del servidor es el recurso escaso.
+
+Uso:
+    python scripts/benchmark_snmp.py
+    python scripts/benchmark_snmp.py --tarjetas 1 2 3 4 --onts 64 --cli-ms 800 --snmp-ms 20
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_replay import _medir  # noqa: E402
+from snmp_agent import SnmpAgent, generar_onts, tabla_oids  # noqa: E402
+from config import Config  # noqa: E402
+from services import snmp_source as mib  # noqa: E402
+from services.board_service import BoardService  # noqa: E402
+from services.connection_service import ConnectionService  # noqa: E402
+from services.ont_service import ONTService  # noqa: E402
+from services.snmp_client import SnmpClient  # noqa: E402
+from services.snmp_source import SNMPDataSource  # noqa: E402
+from services.transcript import ReplayConnection, Transcript  # noqa: E402
+
+PUERTOS = 16
+LINEA = "  " + "-" * 77
+
+
+def _fecha(caida) -> str:
+    return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(*caida)
+
+
+def _salida_summary(onts: List[dict]) -> str:
+    """Salida de "display ont info summary N" para las ONTs de un puerto"""
+    lineas = [LINEA, "  ONT  Run     Last                Last                Last",
+              "  ID   State   UpTime              DownTime            DownCause", LINEA]
+    for ont in onts:
+        causa = mib.CAUSAS_CAIDA.get(ont['causa'], '-') if ont['causa'] else '-'
+        subida = "2025-12-01 08:00:00" if ont['online'] else "-"
+        lineas.append(f"  {ont['id']:<4} {'online' if ont['online'] else 'offline':<7} {subida:<19} "
+                      f"{_fecha(ont['caida'])} {causa}")
+    lineas += [LINEA, "  ONT        SN        Type          Distance Rx/Tx power  Description",
+               "  ID                                    (m)      (dBm)", LINEA]
+    for ont in onts:
+        if ont['online']:
+            distancia, potencia = str(ont['distancia']), f"{ont['rx'] / 100:.2f}/2.10"
+        else:
+            distancia, potencia = "-", "-/-"
+        lineas.append(f"  {ont['id']:<4} {ont['sn'].hex().upper()}  HG8245H  {distancia:>8} "
+                      f"{potencia:>13}  {ont['descripcion']}")
+    return "\n".join(lineas + [LINEA])
+
+
+def _salida_optical(onts: List[dict]) -> str:
+    """Salida de "display ont optical-info N all" (solo las ONTs online tienen lectura)"""
+    lineas = [LINEA, "  ONT  Rx power  Tx power  OLT Rx ONT  Temperature  Voltage  Distance",
+              "  ID   (dBm)     (dBm)     power(dBm)  (C)          (V)      (m)", LINEA]
+    for ont in onts:
+        if ont['online']:
+            lineas.append(f"  {ont['id']:<4} {ont['rx'] / 100:.2f}    2.10      "
+                          f"{(ont['olt_rx'] - 10000) / 100:.2f}      {ont['temperatura']:<12} "
+                          f"3.28     {ont['distancia']}")
+    return "\n".join(lineas + [LINEA])
+
+
+def _transcript(onts: List[dict], latencia: float) -> Transcript:
+    """Transcript con las salidas CLI de todo el chasis sintético"""
+    por_puerto: Dict[tuple, list] = defaultdict(list)
+    for ont in onts:
+        por_puerto[(ont['tarjeta'], ont['puerto'])].append(ont)
+
+    transcript = Transcript()
+    for tarjeta in sorted({t for t, _ in por_puerto}):
+        contexto = f"interface-gpon-0/{tarjeta}"
+        board = []
+        for puerto in range(PUERTOS):
+            lista = por_puerto.get((tarjeta, puerto), [])
+            transcript.add(contexto, f"display ont info summary {puerto}", _salida_summary(lista), latencia)
+            transcript.add(contexto, f"display ont optical-info {puerto} all", _salida_optical(lista), latencia)
+            board.append(f"  In port 0/ {tarjeta}/{puerto} , the total of ONTs are: {len(lista)}, "
+                         f"online: {sum(o['online'] for o in lista)}")
+        transcript.add("config", f"display board 0/{tarjeta} | include port", "\n".join(board), latencia)
+    return transcript
+
+
+def _onts(collections) -> list:
+    return [sorted((o.to_dict() for o in c.onts), key=lambda o: int(o['id'])) for c in collections.values()]
+
+
+def _comparar(tarjetas, puertos, cli, snmp) -> int:
+    """Cantidad de diferencias entre los dos backends (ONTs y conteos por puerto)"""
+    diferencias = 0
+    for tarjeta in tarjetas:
+        a, b = _onts(cli['ont'].obtener_onts_tarjeta(tarjeta, puertos)), \
+            _onts(snmp['ont'].obtener_onts_tarjeta(tarjeta, puertos))
+        for puerto, (onts_cli, onts_snmp) in enumerate(zip(a, b)):
+            if onts_cli != onts_snmp:
+                diferencias += 1
+                for x, y in zip(onts_cli, onts_snmp):
+                    if x != y:
+                        print(f"  ONT {tarjeta}/{puerto}/{x['id']}: "
+                              f"{ {k: (x[k], y.get(k)) for k in x if x[k] != y.get(k)} }")
+                        break
+        if cli['board'].obtener_puertos_tarjeta(tarjeta) != snmp['board'].obtener_puertos_tarjeta(tarjeta):
+            diferencias += 1
+            print(f"  Puertos de la tarjeta {tarjeta} distintos")
+    return diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tarjetas", nargs="+", default=["1", "2", "3"])
+    parser.add_argument("--onts", type=int, default=32, help="máximo de ONTs por puerto")
+    parser.add_argument("--iterations", type=int, default=10, help="repeticiones por caso")
+    parser.add_argument("--cli-ms", type=float, default=0.0, help="latencia simulada por comando CLI")
+    parser.add_argument("--snmp-ms", type=float, default=0.0, help="latencia simulada por consulta SNMP")
+    parser.add_argument("--max-repetitions", type=int, default=Config.SNMP_CONFIG['max_repetitions'])
+    args = parser.parse_args()
+
+    onts = generar_onts([int(t) for t in args.tarjetas], PUERTOS, args.onts)
+    agent = SnmpAgent(tabla_oids(onts), latencia=args.snmp_ms / 1000).start()
+    transcript = _transcript(onts, args.cli_ms / 1000)
+    print(f"Chasis sintético: {len(args.tarjetas)} tarjetas, {len(onts)} ONTs; agente en puerto {agent.address[1]}")
+
+    cs = ConnectionService(Config.DEVICE_CONFIG, connection_factory=lambda _: ReplayConnection(transcript, latency_factor=1.0))
+    client = SnmpClient(agent.address[0], port=agent.address[1], timeout=5.0)
+    fuente = SNMPDataSource(client, max_repetitions=args.max_repetitions)
+    cli = {'ont': ONTService(cs), 'board': BoardService(cs)}
+    snmp = {'ont': ONTService(cs, data_source=fuente), 'board': BoardService(cs, data_source=fuente)}
+    puertos = [str(p) for p in range(PUERTOS)]
+
+    diferencias = _comparar(args.tarjetas, puertos, cli, snmp)
+    if diferencias:
+        print(f"Los backends difieren en {diferencias} puertos/tarjetas")
+        return 1
+    print("CLI y SNMP entregan las mismas ONTs y conteos por puerto")
+
+    print(f"{'caso':<32}{'n':>6}{'err':>5}{'media':>10}{'p50':>10}{'p95':>10}{'max':>10}{'cpu':>10}"
+          f"{'consultas':>11}")
+    for tarjeta in args.tarjetas:
+        casos = [
+            (f"CLI onts tarjeta {tarjeta}", lambda t=tarjeta: cli['ont'].obtener_onts_tarjeta(t, puertos), None),
+            (f"SNMP onts tarjeta {tarjeta}", lambda t=tarjeta: snmp['ont'].obtener_onts_tarjeta(t, puertos), client),
+            (f"CLI puertos tarjeta {tarjeta}", lambda t=tarjeta: cli['board'].obtener_puertos_tarjeta(t), None),
+            (f"SNMP puertos tarjeta {tarjeta}", lambda t=tarjeta: snmp['board'].obtener_puertos_tarjeta(t), client),
+        ]
+        for nombre, fn, contador in casos:
+            antes = contador.requests if contador else 0
+            cpu = time.thread_time()
+            r = _medir(nombre, fn, args.iterations)
+            cpu_ms = (time.thread_time() - cpu) * 1000 / args.iterations
+            # En CLI: comandos por iteración (2 por puerto para las ONTs, 1 para los puertos)
+            consultas = (contador.requests - antes) / args.iterations if contador else \
+                (2 * PUERTOS if 'onts' in nombre else 1)
+            print(f"{r['nombre']:<32}{r['n']:>6}{r['errores']:>5}{r['media_ms']:>10.3f}{r['p50_ms']:>10.3f}"
+                  f"{r['p95_ms']:>10.3f}{r['max_ms']:>10.3f}{cpu_ms:>10.3f}{consultas:>11.1f}")
+    agent.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Mide el arranque en frío de la aplicación (desde que se lanza el proceso
+hasta que /api/test responde) y la memoria residente una vez lista, y lo
+compara con el presupuesto de Config.
+
+Uso:
+    python scripts/benchmark_startup.py                 # build desde fuente
+    python scripts/benchmark_startup.py --exe dist/app  # build congelado (PyInstaller)
+    python scripts/benchmark_startup.py --source --exe dist/app --exe dist/app_fast/app_fast
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+
+URL = "http://127.0.0.1:5002/api/test"
+
+
+def _wait_ready(proc: subprocess.Popen, timeout: float) -> bool:
+    """Sondea /api/test hasta obtener respuesta o agotar el tiempo"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(URL, timeout=0.5) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
+def _proc_children(pid: int) -> List[int]:
+    """Hijos directos de un proceso según /proc (Linux)"""
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children.extend(int(c) for c in f.read().split())
+    return children
+
+
+def _proc_rss(pid: int) -> int:
+    """Memoria residente de un proceso según /proc (Linux), en bytes"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def medir_rss(pid: int) -> Optional[int]:
+    """
+    Memoria residente del proceso y sus hijos en bytes. El bootloader onefile de
+    PyInstaller ejecuta la aplicación en un proceso hijo, por eso se suma el árbol.
+    """
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        return sum(p.memory_info().rss for p in [proc] + proc.children(recursive=True))
+    except ImportError:
+        pass
+
+    if not os.path.isdir("/proc"):
+        return None
+    try:
+        total, pendientes = 0, [pid]
+        while pendientes:
+            actual = pendientes.pop()
+            total += _proc_rss(actual)
+            pendientes.extend(_proc_children(actual))
+        return total
+    except OSError:
+        return None
+
+
+def medir_arranque(cmd: list, timeout: float):
+    """Lanza la aplicación y retorna (segundos hasta que responde, RSS en bytes)"""
+    env = dict(os.environ, OLT_DEBUG='0', OLT_PREWARM_SSH='0')
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_ready(proc, timeout):
+            raise RuntimeError(f"La aplicación no respondió en {timeout}s")
+        elapsed = time.perf_counter() - t0
+        return elapsed, medir_rss(proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def benchmark(nombre: str, cmd: list, budget: float, runs: int, timeout: float) -> bool:
+    """Ejecuta varias mediciones de un build e imprime el resultado"""
+    resultados = sorted(medir_arranque(cmd, timeout) for _ in range(runs))
+    tiempos = [t for t, _ in resultados]
+    mediana, rss = resultados[len(resultados) // 2]
+    ok = mediana <= budget
+
+    rss_txt = f"{rss / (1024 * 1024):.1f} MiB" if rss is not None else "n/d"
+    print(f"{nombre:<28} min={tiempos[0]:.3f}s mediana={mediana:.3f}s max={tiempos[-1]:.3f}s "
+          f"rss={rss_txt:<10} presupuesto={budget:.2f}s {'OK' if ok else 'EXCEDIDO'}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exe', action='append', default=[],
+                        help="Ejecutable congelado a medir (se puede repetir)")
+    parser.add_argument('--source', action='store_true',
+                        help="Medir también python app.py (por defecto si no se indica --exe)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    objetivos = []
+    if args.source or not args.exe:
+        objetivos.append(("fuente (app.py)", [sys.executable, os.path.join(ROOT, 'app.py')],
+                          Config.STARTUP_BUDGET_SOURCE))
+    for exe in args.exe:
+        objetivos.append((os.path.relpath(exe, ROOT), [os.path.abspath(exe)], Config.STARTUP_BUDGET_FROZEN))
+
+    ok = True
+    for nombre, cmd, budget in objetivos:
+        ok = benchmark(nombre, cmd, budget, args.runs, args.timeout) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Agente SNMPv2c de prueba que responde GET / GETNEXT / GETBULK con las tablas de ONTs
+de HUAWEI-XPON-MIB que lee SNMPDataSource, a partir de un chasis sintético. Sirve para
+probar y medir el backend SNMP sin OLT (ver scripts/benchmark_snmp.py).
+
+Uso:
+    python scripts/snmp_agent.py --port 1161 --tarjetas 1 2 3 --onts 40
+    OLT_DATA_SOURCE=snmp OLT_SNMP_PORT=1161 ...   # con DEVICE_CONFIG['ip'] apuntando a 127.0.0.1
+"""
+import argparse
+import bisect
+import logging
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services import snmp_client as ber  # noqa: E402
+from services import snmp_source as mib  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+SYS_UPTIME = ber.parse_oid('1.3.6.1.2.1.1.3.0')
+MAX_RESPUESTA = 8192   # bytes por respuesta, como el máximo de mensaje habitual de un agente
+
+
+def generar_onts(tarjetas: List[int], puertos: int = 16, onts_por_puerto: int = 32, semilla: int = 1) -> List[dict]:
+    """Chasis sintético: una entrada por ONT con los valores tal como los reporta el OLT"""
+    rnd = random.Random(semilla)
+    causas = [0, 1, 2, 13, 3]
+    onts = []
+    for tarjeta in tarjetas:
+        for puerto in range(puertos):
+            for ont_id in range(rnd.randint(onts_por_puerto // 2, onts_por_puerto)):
+                online = rnd.random() > 0.1
+                onts.append({
+                    'tarjeta': int(tarjeta),
+                    'puerto': puerto,
+                    'id': ont_id,
+                    'sn': bytes([0x48, 0x57, 0x54, 0x43]) + rnd.getrandbits(32).to_bytes(4, 'big'),
+                    'descripcion': f"cliente {tarjeta}{puerto:02d}{ont_id:03d} zona {rnd.randint(1, 9)}",
+                    'online': online,
+                    'rx': rnd.randint(-2900, -1500) if online else mib.VALOR_INVALIDO,
+                    'olt_rx': rnd.randint(-3000, -1800) + 10000 if online else mib.VALOR_INVALIDO,
+                    'temperatura': rnd.randint(30, 65) if online else mib.VALOR_INVALIDO,
+                    'distancia': rnd.randint(200, 20000) if online else -1,
+                    'caida': (2025, rnd.randint(1, 12), rnd.randint(1, 28),
+                              rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59)),
+                    'causa': rnd.choice(causas),
+                })
+    return onts
+
+
+def _date_and_time(fecha: Tuple[int, ...]) -> bytes:
+    year, month, day, hour, minute, second = fecha
+    return year.to_bytes(2, 'big') + bytes([month, day, hour, minute, second, 0])
+
+
+def tabla_oids(onts: List[dict]) -> Dict[tuple, Tuple[int, object]]:
+    """OID -> (tipo, valor) de las columnas que recorre SNMPDataSource"""
+    tabla = {SYS_UPTIME: (ber.TIMETICKS, 0)}
+    for ont in onts:
+        index = (mib.if_index(ont['tarjeta'], ont['puerto']), ont['id'])
+        valores = {
+            mib.ONT_SN: (ber.OCTET_STRING, ont['sn']),
+            mib.ONT_DESCRIPCION: (ber.OCTET_STRING, ont['descripcion'].encode()),
+            mib.ONT_RUN_STATUS: (ber.INTEGER, 1 if ont['online'] else 2),
+            mib.ONT_DISTANCIA: (ber.INTEGER, ont['distancia']),
+            mib.ONT_LAST_DOWN_TIME: (ber.OCTET_STRING, _date_and_time(ont['caida'])),
+            mib.ONT_LAST_DOWN_CAUSE: (ber.INTEGER, ont['causa']),
+            mib.OPT_TEMPERATURA: (ber.INTEGER, ont['temperatura']),
+            mib.OPT_RX: (ber.INTEGER, ont['rx']),
+            mib.OPT_OLT_RX: (ber.INTEGER, ont['olt_rx']),
+        }
+        for columna, valor in valores.items():
+            tabla[columna + index] = valor
+    return tabla
+
+
+class SnmpAgent:
+    """Agente UDP sobre una tabla OID ordenada (búsqueda del siguiente OID con bisect)"""
+
+    def __init__(self, tabla: Dict[tuple, Tuple[int, object]], host: str = '127.0.0.1', port: int = 0,
+                 community: str = 'public', latencia: float = 0.0):
+        self.tabla = tabla
+        self.oids = sorted(tabla)
+        self.community = community
+        self.latencia = latencia
+        self.requests = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self._thread: Optional[threading.Thread] = None
+
+    def _siguiente(self, oid: tuple) -> Tuple[tuple, int, object]:
+        i = bisect.bisect_right(self.oids, oid)
+        if i >= len(self.oids):
+            return oid, ber.END_OF_MIB_VIEW, None
+        siguiente = self.oids[i]
+        return (siguiente,) + self.tabla[siguiente]
+
+    @staticmethod
+    def _tamano(varbind) -> int:
+        """Bytes aproximados del varbind codificado"""
+        oid, _, value = varbind
+        return 8 + len(oid) * 2 + (len(value) if isinstance(value, bytes) else 5)
+
+    def responder(self, mensaje: dict) -> bytes:
+        """Mensaje de respuesta para una consulta decodificada"""
+        oids = [oid for oid, _, _ in mensaje['varbinds']]
+        pdu = mensaje['pdu']
+        if pdu == ber.GET:
+            varbinds = [(oid,) + self.tabla.get(oid, (ber.NO_SUCH_INSTANCE, None)) for oid in oids]
+        elif pdu == ber.GET_NEXT:
+            varbinds = [self._siguiente(oid) for oid in oids]
+        elif pdu == ber.GET_BULK:
+            non_repeaters = max(mensaje['error_status'], 0)
+            max_repetitions = max(mensaje['error_index'], 0)
+            varbinds = [self._siguiente(oid) for oid in oids[:non_repeaters]]
+            cursores = oids[non_repeaters:]
+            tamano = 64 + sum(self._tamano(vb) for vb in varbinds)
+            for _ in range(max_repetitions if cursores else 0):
+                fila = [self._siguiente(oid) for oid in cursores]
+                # Se corta en repeticiones completas para no exceder el tamaño de mensaje
+                tamano += sum(self._tamano(vb) for vb in fila)
+                if varbinds and tamano > MAX_RESPUESTA:
+                    break
+                varbinds += fila
+                cursores = [oid for oid, _, _ in fila]
+                if all(tag == ber.END_OF_MIB_VIEW for _, tag, _ in fila):
+                    break
+        else:
+            return ber.encode_message(self.community, ber.RESPONSE, mensaje['request_id'], [], 5, 0)
+        return ber.encode_message(self.community, ber.RESPONSE, mensaje['request_id'], varbinds)
+
+    def serve_forever(self):
+        while True:
+            try:
+                data, remitente = self.sock.recvfrom(65535)
+            except OSError:
+                return
+            try:
+                mensaje = ber.decode_message(data)
+            except ber.SnmpError as e:
+                logger.warning(f"Mensaje inválido de {remitente}: {e}")
+                continue
+            if mensaje['community'] != self.community:
+                continue
+            self.requests += 1
+            if self.latencia:
+                time.sleep(self.latencia)
+            self.sock.sendto(self.responder(mensaje), remitente)
+
+    def start(self) -> "SnmpAgent":
+        self._thread = threading.Thread(target=self.serve_forever, name="snmp-agent", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1161)
+    parser.add_argument("--community", default="public")
+    parser.add_argument("--tarjetas", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--onts", type=int, default=32, help="máximo de ONTs por puerto")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por respuesta")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    onts = generar_onts(args.tarjetas, onts_por_puerto=args.onts)
+    agent = SnmpAgent(tabla_oids(onts), args.host, args.port, args.community, args.latencia)
+    print(f"Agente SNMP en {agent.address[0]}:{agent.address[1]} con {len(onts)} ONTs "
+          f"({len(agent.oids)} OIDs)")
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        agent.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+Servidor de producción multi-hilo con waitress (funciona también en Windows):
+
+    python serve.py
+
+waitress atiende todas las peticiones en un solo proceso, así que las sesiones
+SSH, la caché y los sondeos se comparten sin necesidad del broker.
+"""
+import time
+
+_STARTED_AT = time.perf_counter()
+
+from waitress import serve
+
+from app import create_app
+from config import Config
+from services import registry
+from services.log_pipeline import configurar_logging
+
+
+def main():
+    configurar_logging()
+    app = create_app()
+
+    host, port = Config.WSGI_BIND.rsplit(':', 1)
+    if Config.PREWARM_SSH:
+        registry.start_ssh_prewarm(host, int(port), started_at=_STARTED_AT)
+
+    serve(app, host=host, port=int(port), threads=Config.WSGI_THREADS)
+
+
+if __name__ == '__main__':
+    main()
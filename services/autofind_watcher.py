@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from services.command_scheduler import BACKGROUND, prioridad
+
+logger = logging.getLogger(__name__)
+
+class AutofindWatcher:
+    """
+    Consulta `display ont autofind all` periódicamente en segundo plano y mantiene
+    un índice en memoria por (F/S/P, SN). Cada cambio (ONT nueva o desaparecida)
+    se registra como un evento numerado para que los clientes reciban solo diferencias.
+    """
+
+    MAX_EVENTS = 1000
+
+    def __init__(self, ont_service, interval: float = 60):
+        self.ont_service = ont_service
+        self.interval = interval
+        self._index: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._events = deque(maxlen=self.MAX_EVENTS)
+        self._seq = 0
+        self._last_refreshed: Optional[datetime] = None
+        self._last_error: Optional[str] = None
+        self._cond = threading.Condition()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Funciones llamadas con la lista completa de entradas tras cada sondeo
+        self.listeners = []
+
+    @staticmethod
+    def _key(entry: Dict[str, str]) -> Tuple[str, str]:
+        return entry.get('fsp', ''), entry.get('sn', '')
+
+    def start(self):
+        """Inicia el hilo de sondeo si no está corriendo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="autofind-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Autofind watcher iniciado (intervalo {self.interval}s)")
+
+    def stop(self):
+        """Detiene el hilo de sondeo"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with prioridad(BACKGROUND):
+                    self.refresh()
+            except Exception as e:
+                logger.warning(f"Error en sondeo de autofind: {e}")
+            self._stop.wait(self.interval)
+
+    def refresh(self) -> dict:
+        """Ejecuta una consulta inmediata al OLT y aplica las diferencias al índice"""
+        # Si ya hay un sondeo en curso se espera a que termine en lugar de lanzar otro
+        if not self._refresh_lock.acquire(blocking=False):
+            with self._refresh_lock:
+                return self.snapshot()
+
+        try:
+            entries = self.ont_service.obtener_autofind_onts()
+            self._apply(entries)
+            return self.snapshot()
+        except Exception as e:
+            with self._cond:
+                self._last_error = str(e)
+            raise
+        finally:
+            self._refresh_lock.release()
+
+    def _apply(self, entries: List[Dict[str, str]]):
+        """Reemplaza el índice y registra las ONTs nuevas y desaparecidas"""
+        nuevo = {self._key(entry): entry for entry in entries}
+
+        with self._cond:
+            agregadas = [nuevo[k] for k in nuevo.keys() - self._index.keys()]
+            eliminadas = [self._index[k] for k in self._index.keys() - nuevo.keys()]
+
+            for tipo, lista in (('added', agregadas), ('removed', eliminadas)):
+                for entry in lista:
+                    self._seq += 1
+                    self._events.append({'seq': self._seq, 'type': tipo, 'entry': entry})
+
+            self._index = nuevo
+            self._last_refreshed = datetime.now()
+            self._last_error = None
+            self._cond.notify_all()
+
+        if agregadas or eliminadas:
+            logger.info(f"Autofind: {len(agregadas)} ONTs nuevas, {len(eliminadas)} desaparecidas")
+
+        for listener in self.listeners:
+            try:
+                listener(entries)
+            except Exception as e:
+                logger.warning(f"Error notificando entradas de autofind: {e}")
+
+    def snapshot(self) -> dict:
+        """Estado actual del índice, sin consultar el OLT"""
+        with self._cond:
+            entries = sorted(self._index.values(), key=lambda e: (e.get('fsp', ''), e.get('number', '')))
+            return {
+                'data': entries,
+                'count': len(entries),
+                'seq': self._seq,
+                'last_refreshed': self._last_refreshed.isoformat() if self._last_refreshed else None,
+                'last_error': self._last_error
+            }
+
+    def events_since(self, seq: int, timeout: float = 15) -> dict:
+        """
+        Retorna los eventos posteriores a `seq`, esperando hasta `timeout` segundos si no hay
+        ninguno. Si los eventos pedidos ya salieron del buffer se indica `reset` para que el
+        cliente vuelva a cargar el snapshot completo.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq == seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Un cliente con un seq mayor viene de una instancia anterior del servidor
+            oldest = self._events[0]['seq'] if self._events else self._seq + 1
+            reset = seq > self._seq or (seq < self._seq and seq + 1 < oldest)
+            events = [] if reset else [e for e in self._events if e['seq'] > seq]
+            return {
+                'seq': self._seq,
+                'reset': reset,
+                'events': events,
+                'last_refreshed': self._last_refreshed.isoformat() if self._last_refreshed else None
+            }
@@ -1,51 +1,108 @@
 import logging
 import re
-from typing import Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from models.board_model import ChasisBoard, Puerto, Rollup, TarjetaBoard
+from services.cache import TTLCache
+from services.command_scheduler import propagar_prioridad
+from services.connection_service import ConnectionPool, DeviceUnavailableError
+from services.log_pipeline import campos, capturar_salida
 
 logger = logging.getLogger(__name__)
 
 class BoardService:
     """Servicio para operaciones con tarjetas GPON"""
     
-    def __init__(self, connection_service):
+    # Tarjetas de servicio PON en "display board 0" (H901GPHF, H805GPFD, H902XSHD...)
+    SERVICE_BOARD_PATTERN = r'GP|XG|XS|EP'
+    
+    def __init__(self, connection_service, pool: Optional[ConnectionPool] = None,
+                 cache: Optional[TTLCache] = None, chasis_ttl: float = 30, last_good_ttl: float = 3600,
+                 data_source=None, tarjeta_ttl: float = 0):
         self.connection_service = connection_service
+        self.pool = pool
+        self.cache = cache or TTLCache()
+        self.chasis_ttl = chasis_ttl
+        self.last_good_ttl = last_good_ttl
+        # Fuente alternativa al CLI para los puertos de una tarjeta (ej. SNMPDataSource)
+        self.data_source = data_source
+        # Segundos que se sirve una tarjeta desde caché (0 = siempre se consulta; con eventos
+        # del OLT la copia en caché se mantiene al día con actualizar_puerto)
+        self.tarjeta_ttl = tarjeta_ttl
+    
+    def _ultimo_bueno(self, key, error: DeviceUnavailableError) -> Dict:
+        """Retorna la última respuesta exitosa marcada como stale, o relanza el error"""
+        stale = self.cache.get_stale(key)
+        if stale is None:
+            raise error
+        data, age = stale
+        logger.warning(f"OLT no disponible, sirviendo {key} de hace {age:.0f}s")
+        return {**data.to_dict(), 'stale': True, 'stale_age_s': round(age)}
     
-    def obtener_puertos_tarjeta(self, tarjeta: str) -> Dict:
+    def obtener_puertos_tarjeta(self, tarjeta: str, force: bool = False) -> Dict:
         """
         Obtiene informaciÃ³n de todos los puertos de una tarjeta
         Args:
             tarjeta: formato "0/2" o "0/3"
+            force: ignorar la caché (tarjeta_ttl) y consultar el dispositivo
         Returns:
             Dict con informaciÃ³n de puertos y estadÃ­sticas
         """
+        key = ('board', tarjeta)
+        if self.tarjeta_ttl and not force:
+            cached = self.cache.get_stale(key)
+            if cached is not None and cached[1] < self.tarjeta_ttl:
+                return cached[0].to_dict()
+        try:
+            if self.data_source is not None:
+                data = self._consultar_fuente(tarjeta)
+            else:
+                with self.connection_service.lock:
+                    data = self._consultar_tarjeta(self.connection_service, tarjeta)
+            # En caché se guarda el modelo, que actualizar_puerto modifica en el lugar
+            self.cache.set(key, data, ttl=self.last_good_ttl)
+            return data.to_dict()
+        except DeviceUnavailableError as e:
+            return self._ultimo_bueno(key, e)
+    
+    def _consultar_tarjeta(self, conn, tarjeta: str) -> TarjetaBoard:
+        """Ejecuta la consulta de puertos de una tarjeta sobre la sesión indicada"""
         try:
-            logger.info(f"Iniciando consulta para tarjeta {tarjeta}")
+            inicio = time.monotonic()
+            logger.debug(f"Iniciando consulta para tarjeta {tarjeta}")
             
             # Ejecutar comando display board
             command = f"display board 0/{tarjeta} | include port"
-            logger.info(f"Ejecutando comando: {command}")
-            
-            output = self.connection_service.execute_command(command, delay_factor=2, timeout=30)
-            
-            logger.info(f"Comando ejecutado, procesando output...")
-            logger.debug(f"Output del comando board: {output}")
+            output = conn.execute_command(command, delay_factor=2, timeout=30)
+            capturar_salida(command, output, tarjeta=tarjeta)
             
             # Parsear datos
             puertos_data = self._parse_board_output(output, tarjeta)
             
-            logger.info(f"Se procesaron {len(puertos_data['puertos'])} puertos para tarjeta {tarjeta}")
+            logger.info(f"Se procesaron {len(puertos_data.puertos)} puertos",
+                        extra=campos(tarjeta=tarjeta, inicio=inicio))
             return puertos_data
             
+        except DeviceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo puertos de tarjeta {tarjeta}: {str(e)}")
             raise Exception(f"Error en consulta de tarjeta: {str(e)}")
     
-    def _parse_board_output(self, output: str, tarjeta: str) -> Dict:
+    def _consultar_fuente(self, tarjeta: str) -> TarjetaBoard:
+        """Consulta los puertos de una tarjeta en la fuente de datos alternativa (sin sesión SSH)"""
+        return self._resultado(tarjeta, [
+            Puerto(p['puerto'], p['total_onts'], p['online_onts'], p['puerto_completo'])
+            for p in self.data_source.puertos_tarjeta(tarjeta)
+        ])
+    
+    def _parse_board_output(self, output: str, tarjeta: str) -> TarjetaBoard:
         """Parsea la salida del comando display board"""
         puertos = []
         lines = output.split('\n')
         
-        logger.info(f"Parseando {len(lines)} lÃ­neas de output")
+        logger.debug(f"Parseando {len(lines)} lÃ­neas de output")
         
         # PatrÃ³n para capturar: In port 0/ 2/0 , the total of ONTs are:  33, online:  31
         pattern = r'In port (\d+/\s*\d+/\d+)\s*,\s*the total of ONTs are:\s*(\d+),\s*online:\s*(\d+)'
@@ -65,62 +122,118 @@ class BoardService:
                     # Extraer solo el nÃºmero del puerto (Ãºltimo dÃ­gito)
                     puerto_numero = port_path.split('/')[-1]
                     
-                    # Calcular porcentaje
-                    percentage = round((online_onts / total_onts) * 100) if total_onts > 0 else 0
-                    
-                    # Determinar estado
-                    if percentage >= 70:
-                        status = 'online'
-                    elif percentage >= 30:
-                        status = 'warning'
-                    else:
-                        status = 'critical'
-                    
-                    puerto_info = {
-                        'puerto': puerto_numero,
-                        'puerto_completo': port_path,
-                        'total_onts': total_onts,
-                        'online_onts': online_onts,
-                        'offline_onts': total_onts - online_onts,
-                        'percentage': percentage,
-                        'status': status
-                    }
-                    
+                    puerto_info = Puerto(puerto_numero, total_onts, online_onts, port_path)
                     puertos.append(puerto_info)
-                    logger.debug(f"Puerto parseado: {puerto_info}")
                     
                 except Exception as e:
                     logger.warning(f"Error parseando lÃ­nea {i}: {line} - {e}")
                     continue
         
-        logger.info(f"Total de puertos parseados: {len(puertos)}")
+        logger.debug(f"Total de puertos parseados: {len(puertos)}")
         
-        # Ordenar por nÃºmero de puerto
-        puertos.sort(key=lambda x: int(x['puerto']))
+        return self._resultado(tarjeta, puertos)
+    
+    def _resultado(self, tarjeta: str, puertos: List[Puerto]) -> TarjetaBoard:
+        """Tarjeta con sus puertos; las estadísticas se acumulan al agregar cada puerto"""
+        resultado = TarjetaBoard(tarjeta, sorted(puertos, key=lambda p: int(p.puerto)))
+        logger.debug(f"EstadÃ­sticas calculadas: {resultado.get_estadisticas()}")
+        return resultado
+    
+    def actualizar_puerto(self, tarjeta: str, puerto: str, total_onts: Optional[int] = None,
+                          online_onts: Optional[int] = None, delta_online: int = 0) -> bool:
+        """
+        Actualiza los conteos de un puerto en las copias en caché de la tarjeta y del
+        chasis sin consultar el OLT (eventos y consultas puntuales de ONTs). Los modelos
+        se modifican en el lugar, bajo Rollup.lock, y sus estadísticas se ajustan con la diferencia.
+        Retorna False si el puerto no estaba en caché.
+        """
+        conteos = {'total_onts': total_onts, 'online_onts': online_onts, 'delta_online': delta_online}
+        entradas = []  # (clave, valor en caché, tarjeta a modificar)
+        stale = self.cache.get_stale(('board', tarjeta))
+        if stale is not None:
+            entradas.append((('board', tarjeta), stale[0], stale[0]))
+        for key in ('chasis', ('chasis', 'last_good')):
+            stale = self.cache.get_stale(key)
+            if stale is not None and stale[0].get_tarjeta(tarjeta) is not None:
+                entradas.append((key, stale[0], stale[0].get_tarjeta(tarjeta)))
+
+        actualizado, modificadas = False, {}
+        # La tarjeta y el chasis se actualizan juntos: un to_dict() concurrente ve ambos o ninguno
+        with Rollup.lock:
+            for key, valor, modelo in entradas:
+                # La tarjeta del chasis puede ser el mismo objeto que la de ('board', tarjeta)
+                if id(modelo) not in modificadas:
+                    modificadas[id(modelo)] = modelo.actualizar_puerto(puerto, **conteos)
+                if not modificadas[id(modelo)]:
+                    continue
+                # Con la caché del broker cada valor es una copia y hay que volver a guardarlo
+                actualizado |= self.cache.replace(key, valor)
+        return actualizado
+    
+    def obtener_chasis(self, force: bool = False) -> Dict:
+        """
+        Obtiene los puertos de todas las tarjetas de servicio del chasis
+        Args:
+            force: ignorar la caché y consultar el dispositivo
+        Returns:
+            Dict con las tarjetas, sus puertos y estadísticas agregadas del chasis
+        """
+        if force:
+            self.cache.invalidate('chasis')
+        try:
+            data = self.cache.get_or_load('chasis', self._consultar_chasis, ttl=self.chasis_ttl)
+            # Copia de respaldo con TTL largo para servirla si el OLT deja de responder
+            self.cache.set(('chasis', 'last_good'), data, ttl=self.last_good_ttl)
+            return data.to_dict()
+        except DeviceUnavailableError as e:
+            return self._ultimo_bueno(('chasis', 'last_good'), e)
+    
+    def _consultar_chasis(self) -> ChasisBoard:
+        """Lista las tarjetas con "display board 0" y las consulta en paralelo"""
+        logger.info("Iniciando consulta del chasis completo")
         
-        # Calcular estadÃ­sticas generales
-        total_puertos = len(puertos)
-        puertos_online = len([p for p in puertos if p['status'] == 'online'])
-        puertos_warning = len([p for p in puertos if p['status'] == 'warning'])
-        puertos_critical = len([p for p in puertos if p['status'] == 'critical'])
+        with self.connection_service.lock:
+            output = self.connection_service.execute_global_command("display board 0", delay_factor=2, timeout=30)
+        tarjetas = self._parse_chasis_output(output)
+        logger.info(f"Tarjetas de servicio detectadas: {tarjetas}")
         
-        total_onts_general = sum(p['total_onts'] for p in puertos)
-        total_online_general = sum(p['online_onts'] for p in puertos)
+        resultados, errores = [], {}
         
-        estadisticas = {
-            'total_puertos': total_puertos,
-            'puertos_online': puertos_online,
-            'puertos_warning': puertos_warning,
-            'puertos_critical': puertos_critical,
-            'total_onts': total_onts_general,
-            'total_online': total_online_general,
-            'total_offline': total_onts_general - total_online_general
-        }
+        @propagar_prioridad
+        def consultar(tarjeta: str):
+            if self.data_source is not None:
+                return self._consultar_fuente(tarjeta)
+            if self.pool is None:
+                with self.connection_service.lock:
+                    return self._consultar_tarjeta(self.connection_service, tarjeta)
+            with self.pool.acquire() as conn:
+                return self._consultar_tarjeta(conn, tarjeta)
         
-        logger.info(f"EstadÃ­sticas calculadas: {estadisticas}")
+        workers = self.pool.size if self.pool else 1
+        with ThreadPoolExecutor(max_workers=max(min(workers, len(tarjetas)), 1)) as executor:
+            futures = {tarjeta: executor.submit(consultar, tarjeta) for tarjeta in tarjetas}
+            for tarjeta, future in futures.items():
+                try:
+                    resultados.append(future.result())
+                except Exception as e:
+                    logger.warning(f"Error consultando tarjeta {tarjeta} del chasis: {e}")
+                    errores[tarjeta] = str(e)
         
-        return {
-            'tarjeta': tarjeta,
-            'puertos': puertos,
-            'estadisticas': estadisticas
-        }
\ No newline at end of file
+        chasis = ChasisBoard(resultados, errores)
+        # Cada tarjeta queda también como copia por tarjeta: un cambio en un puerto
+        # actualiza a la vez la tarjeta y los totales del chasis
+        for tarjeta in chasis.tarjetas:
+            self.cache.set(('board', tarjeta.tarjeta), tarjeta, ttl=self.last_good_ttl)
+        return chasis
+    
+    def _parse_chasis_output(self, output: str) -> List[str]:
+        """Extrae los slots con tarjetas de servicio PON en estado normal"""
+        tarjetas = []
+        for line in output.split('\n'):
+            match = re.match(r'^\s*(\d+)\s+(\S+)\s+(\S+)', line)
+            if not match:
+                continue
+            slot, board_name, status = match.groups()
+            if re.search(self.SERVICE_BOARD_PATTERN, board_name) and 'normal' in status.lower():
+                tarjetas.append(slot)
+        return tarjetas
@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Caché en memoria con expiración por entrada. Conserva el último valor aunque
+    haya expirado (get_stale) y evita que varios hilos recalculen la misma clave
+    a la vez (get_or_load).
+    """
+
+    def __init__(self, default_ttl: float = 30):
+        self.default_ttl = default_ttl
+        self._data: Dict[Hashable, Tuple[Any, float, float]] = {}  # clave -> (valor, guardado, expira)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Valor vigente de la clave, o None si no existe o expiró"""
+        entry = self._data.get(key)
+        if entry is None or entry[2] < time.monotonic():
+            return None
+        return entry[0]
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Último valor guardado (aunque haya expirado) y su antigüedad en segundos"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        return entry[0], time.monotonic() - entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Guarda un valor con el TTL indicado (o el TTL por defecto)"""
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now, now + (self.default_ttl if ttl is None else ttl))
+
+    def replace(self, key: Hashable, value: Any) -> bool:
+        """Reemplaza el valor guardado conservando su expiración; False si la clave no existe"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            self._data[key] = (value, entry[1], entry[2])
+            return True
+
+    def invalidate(self, key: Hashable):
+        """Elimina la clave"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Retorna el valor vigente o lo calcula con `loader` (una sola vez aunque haya varios hilos)"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Otro hilo pudo haberlo cargado mientras esperábamos
+            value = self.get(key)
+            if value is None:
+                value = loader()
+                self.set(key, value, ttl)
+            return value
@@ -0,0 +1,287 @@
+import functools
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0  # consultas de un operador (un puerto, una ONT, monitor)
+BULK = 1         # exportaciones y autorizaciones masivas
+BACKGROUND = 2   # sondeos periódicos (autofind, inventario)
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk', BACKGROUND: 'background'}
+
+_local = threading.local()
+
+
+def current_priority() -> int:
+    """Prioridad de los comandos enviados por el hilo actual (INTERACTIVE por defecto)"""
+    return getattr(_local, 'priority', INTERACTIVE)
+
+
+@contextmanager
+def prioridad(nivel: int):
+    """Asigna la prioridad de los comandos que el hilo actual envíe dentro del bloque"""
+    anterior = current_priority()
+    _local.priority = nivel
+    try:
+        yield
+    finally:
+        _local.priority = anterior
+
+
+def propagar_prioridad(fn):
+    """Envuelve `fn` para que se ejecute con la prioridad del hilo que la crea (ThreadPoolExecutor)"""
+    nivel = current_priority()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with prioridad(nivel):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class DeviceSaturatedError(Exception):
+    """El plano de gestión del dispositivo está saturado: la tarea se debe reintentar más tarde"""
+
+    def __init__(self, device: str, priority: int, retry_in: float):
+        self.device = device
+        self.priority = priority
+        self.retry_in = retry_in
+        super().__init__(f"Dispositivo {device} saturado: comandos {PRIORITY_NAMES.get(priority, priority)} "
+                         f"rechazados (reintento en {retry_in:.0f}s)")
+
+    def __reduce__(self):
+        # Permite enviar la excepción entre procesos (broker de sesiones)
+        return self.__class__, (self.device, self.priority, self.retry_in)
+
+
+class SessionLock:
+    """
+    Lock reentrante de una sesión SSH. Los hilos que esperan la sesión no compiten por
+    el lock: esperan en la cola de prioridades del CommandScheduler del dispositivo
+    (ver CommandScheduler.reservar), así una consulta interactiva se adelanta a las
+    exportaciones y sondeos que esperan la misma sesión.
+    """
+
+    def __init__(self, scheduler: "CommandScheduler"):
+        self.scheduler = scheduler
+        self._owner: Optional[int] = None
+        self._depth = 0
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        return self.scheduler.reservar([self], blocking=blocking, timeout=timeout) is not None
+
+    def release(self):
+        self.scheduler.liberar(self)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class CommandScheduler:
+    """
+    Cola de prioridades de las sesiones SSH de un dispositivo y limitador de comandos
+    (token bucket).
+
+    Los hilos esperan primero una sesión (reservar / SessionLock) en una cola ordenada
+    por prioridad: INTERACTIVE antes que BULK y BACKGROUND, y cada sesión que se libera
+    pasa al primer hilo en espera que la puede usar. Las prioridades con límite en
+    `max_queue` se rechazan con DeviceSaturatedError si ya hay ese número de hilos
+    esperando, o si esperan más de `max_wait` segundos.
+
+    Luego cada comando CLI consume un token; los tokens se reponen a `rate` por segundo
+    hasta `burst` (rate=0: sin límite) y, si faltan, los comandos también se despachan
+    por prioridad.
+    """
+
+    def __init__(self, name: str, rate: float = 5.0, burst: int = 10,
+                 max_queue: Optional[Dict[int, int]] = None, max_wait: Optional[Dict[int, float]] = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue or {}
+        self.max_wait = max_wait or {}
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._heap = []       # comandos esperando un token: (prioridad, orden de llegada)
+        self._esperas = []    # hilos esperando una sesión: (prioridad, orden de llegada, sesiones)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+        self._granted = {p: 0 for p in PRIORITY_NAMES}
+        self._rejected = {p: 0 for p in PRIORITY_NAMES}
+        self._wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+        self._session_granted = {p: 0 for p in PRIORITY_NAMES}
+        self._session_wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self._session_wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _depth(self, priority: int) -> int:
+        """Hilos y comandos en cola que se atenderían antes o junto con uno de `priority`"""
+        return (sum(1 for e in self._esperas if e[0] <= priority)
+                + sum(1 for p, _ in self._heap if p <= priority))
+
+    def saturado(self, priority: int = BULK) -> bool:
+        """Indica si un comando de `priority` se rechazaría ahora (para diferir tareas masivas)"""
+        limit = self.max_queue.get(priority)
+        with self._cond:
+            return limit is not None and self._depth(priority) >= limit
+
+    def _reject(self, priority: int):
+        self._rejected[priority] = self._rejected.get(priority, 0) + 1
+        retry_in = (len(self._esperas) + len(self._heap) + 1) / self.rate if self.rate else 0
+        raise DeviceSaturatedError(self.name, priority, retry_in)
+
+    def _libre(self, sesiones, clave: tuple) -> Optional[SessionLock]:
+        """Primera sesión libre de `sesiones` que no espera ningún hilo anterior a `clave` en la cola"""
+        reservadas = {id(s) for e in self._esperas if e[:2] < clave for s in e[2]}
+        for sesion in sesiones:
+            if sesion._owner is None and id(sesion) not in reservadas:
+                return sesion
+        return None
+
+    @staticmethod
+    def _tomar(sesion: SessionLock, owner: int) -> SessionLock:
+        sesion._owner = owner
+        sesion._depth = 1
+        return sesion
+
+    def reservar(self, sesiones, priority: Optional[int] = None, blocking: bool = True,
+                 timeout: Optional[float] = None) -> Optional[SessionLock]:
+        """
+        Toma para el hilo actual una de `sesiones` (en orden de preferencia), esperando
+        por prioridad si están ocupadas. Reentrante: si el hilo ya tiene una, la retorna.
+        Retorna None si no se obtuvo (blocking=False o `timeout` vencido).
+        """
+        priority = current_priority() if priority is None else priority
+        owner = threading.get_ident()
+        start = time.monotonic()
+        max_wait = self.max_wait.get(priority)
+
+        with self._cond:
+            for sesion in sesiones:
+                if sesion._owner == owner:
+                    sesion._depth += 1
+                    return sesion
+
+            entry = (priority, next(self._counter), tuple(sesiones))
+            libre = self._libre(sesiones, entry[:2])
+            if libre is not None or not blocking:
+                return libre if libre is None else self._tomar(libre, owner)
+
+            limit = self.max_queue.get(priority)
+            if limit is not None and self._depth(priority) >= limit:
+                self._reject(priority)
+
+            heapq.heappush(self._esperas, entry)
+            try:
+                while True:
+                    libre = self._libre(sesiones, entry[:2])
+                    if libre is not None:
+                        break
+                    waited = time.monotonic() - start
+                    if max_wait is not None and waited >= max_wait:
+                        self._reject(priority)
+                    if timeout is not None and waited >= timeout:
+                        return None
+                    limites = [t - waited for t in (max_wait, timeout) if t is not None]
+                    self._cond.wait(min(limites) if limites else None)
+            finally:
+                self._esperas.remove(entry)
+                heapq.heapify(self._esperas)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self._session_granted[priority] = self._session_granted.get(priority, 0) + 1
+            self._session_wait_total[priority] = self._session_wait_total.get(priority, 0.0) + waited
+            self._session_wait_max[priority] = max(self._session_wait_max.get(priority, 0.0), waited)
+            if waited > 5:
+                logger.info(f"Tarea {PRIORITY_NAMES.get(priority)} esperó {waited:.1f}s una sesión de {self.name}")
+            return self._tomar(libre, owner)
+
+    def liberar(self, sesion: SessionLock):
+        """Libera una sesión tomada con reservar(); al soltarla pasa al primer hilo en espera"""
+        with self._cond:
+            if sesion._owner != threading.get_ident():
+                raise RuntimeError("La sesión no pertenece a este hilo")
+            sesion._depth -= 1
+            if sesion._depth == 0:
+                sesion._owner = None
+                self._cond.notify_all()
+
+    def acquire(self, priority: Optional[int] = None):
+        """Espera un token para enviar un comando (el hilo ya tiene su sesión)"""
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+
+        with self._cond:
+            if self.rate:
+                entry = (priority, next(self._counter))
+                heapq.heappush(self._heap, entry)
+                try:
+                    while True:
+                        self._refill()
+                        if self._heap[0] == entry and self._tokens >= 1:
+                            self._tokens -= 1
+                            break
+                        # El primero de la cola espera el próximo token; el resto, a que avance la cola
+                        self._cond.wait((1 - self._tokens) / self.rate if self._heap[0] == entry else None)
+                finally:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                    self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self._granted[priority] = self._granted.get(priority, 0) + 1
+            self._wait_total[priority] = self._wait_total.get(priority, 0.0) + waited
+            self._wait_max[priority] = max(self._wait_max.get(priority, 0.0), waited)
+            if waited > 5:
+                logger.info(f"Comando {PRIORITY_NAMES.get(priority)} esperó {waited:.1f}s en la cola de {self.name}")
+
+    def metrics(self) -> dict:
+        """Hilos esperando sesión, comandos esperando token y tiempos de espera por prioridad"""
+        with self._cond:
+            self._refill()
+            por_prioridad = {}
+            for priority, nombre in PRIORITY_NAMES.items():
+                granted = self._granted[priority]
+                sesiones = self._session_granted[priority]
+                por_prioridad[nombre] = {
+                    'en_cola': sum(1 for p, _ in self._heap if p == priority),
+                    'esperando_sesion': sum(1 for e in self._esperas if e[0] == priority),
+                    'despachados': granted,
+                    'rechazados': self._rejected[priority],
+                    'espera_promedio_ms': round(self._wait_total[priority] / granted * 1000, 1) if granted else 0.0,
+                    'espera_max_ms': round(self._wait_max[priority] * 1000, 1),
+                    'espera_sesion_promedio_ms': (
+                        round(self._session_wait_total[priority] / sesiones * 1000, 1) if sesiones else 0.0
+                    ),
+                    'espera_sesion_max_ms': round(self._session_wait_max[priority] * 1000, 1),
+                    'limite_cola': self.max_queue.get(priority)
+                }
+            return {
+                'device': self.name,
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2),
+                'en_cola': len(self._heap),
+                'esperando_sesion': len(self._esperas),
+                'saturado': any(self._depth(p) >= limit for p, limit in self.max_queue.items()),
+                'prioridades': por_prioridad
+            }
@@ -1,30 +1,102 @@
-from netmiko import ConnectHandler
-from typing import Optional
+from contextlib import contextmanager
+from typing import Callable, Optional, TYPE_CHECKING
+import functools
 import logging
+import threading
+import time
+
+from services.command_scheduler import BACKGROUND, CommandScheduler, SessionLock
+from services.device_health import DeviceHealth, DeviceUnavailableError  # noqa: F401 (re-export)
+
+if TYPE_CHECKING:
+    from netmiko import BaseConnection
 
 logger = logging.getLogger(__name__)
 
+def sesion_exclusiva(method):
+    """Ejecuta un método de servicio con la sesión SSH (self.connection_service) bloqueada"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.connection_service.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class ConnectionService:
     """Servicio para manejar la conexión SSH al dispositivo"""
     
-    def __init__(self, device_config: dict):
+    def __init__(self, device_config: dict, health: Optional[DeviceHealth] = None,
+                 liveness_interval: float = 30, scheduler: Optional[CommandScheduler] = None,
+                 connection_factory: Optional[Callable[[dict], "BaseConnection"]] = None):
         self.device_config = device_config
-        self.connection: Optional[ConnectHandler] = None
+        self.connection: Optional["BaseConnection"] = None
         self.current_context = "global"  # Rastrear el contexto actual
+        # Limitador de comandos por prioridad (compartido por todas las sesiones al mismo OLT)
+        self.scheduler = scheduler
+        # Serializa las secuencias de comandos (interfaz + comandos + salida) entre hilos; los
+        # hilos en espera obtienen la sesión por prioridad (sin scheduler, uno sin límite de tasa)
+        self.lock = SessionLock(scheduler or CommandScheduler(device_config.get('host') or device_config.get('ip', ''),
+                                                              rate=0))
+        # Circuit breaker del dispositivo (compartido por todas las sesiones al mismo OLT)
+        self.health = health or DeviceHealth(device_config.get('host') or device_config.get('ip', ''))
+        # is_alive() solo se comprueba si la última operación exitosa es más antigua que esto
+        self.liveness_interval = liveness_interval
+        # Crea la conexión a partir de device_config (por defecto netmiko; ver services.transcript)
+        self.connection_factory = connection_factory
+        self._last_ok = 0.0      # última operación exitosa (incluye keepalives)
+        self._last_used = 0.0    # último comando real
     
-    def connect(self) -> ConnectHandler:
+    def connect(self) -> "BaseConnection":
         """Establece y mantiene la conexión SSH"""
+        # Con el circuito abierto se falla de inmediato en lugar de esperar el timeout de login
+        self.health.check()
+        
+        if self.connection is not None and time.monotonic() - self._last_ok < self.liveness_interval:
+            return self.connection
+        
         try:
             if self.connection is None or not self.connection.is_alive():
-                logger.info("Estableciendo nueva conexión SSH")
-                self.connection = ConnectHandler(**self.device_config)
-                self._initialize_connection()
-                self.current_context = "config"  # Después de inicializar estamos en modo config
+                self._open_connection()
+            self._last_ok = time.monotonic()
             return self.connection
         except Exception as e:
             logger.error(f"Error estableciendo conexión: {e}")
+            self.health.record_failure(e, probe=self._probe)
             raise
     
+    def _open_connection(self):
+        """Abre una sesión SSH nueva y la deja en modo config"""
+        logger.info("Estableciendo nueva conexión SSH")
+        self.connection = None
+        if self.connection_factory is not None:
+            self.connection = self.connection_factory(self.device_config)
+        else:
+            # netmiko/paramiko se importan en la primera conexión para no retrasar el arranque
+            from netmiko import ConnectHandler
+            self.connection = ConnectHandler(**self.device_config)
+        self._initialize_connection()
+        self.current_context = "config"  # Después de inicializar estamos en modo config
+        self.health.record_success()
+    
+    def _probe(self):
+        """Sondeo half-open del circuit breaker: intenta reabrir la sesión"""
+        with self.lock:
+            self._open_connection()
+            self._last_ok = time.monotonic()
+    
+    def _command_done(self, ok: bool):
+        """Registra el resultado de un comando para el control de liveness"""
+        # Tras un error se fuerza is_alive() en el siguiente comando
+        self._last_ok = time.monotonic() if ok else 0.0
+        if ok:
+            self._last_used = self._last_ok
+    
+    def _esperar_turno(self):
+        """Espera un turno del scheduler según la prioridad del hilo actual"""
+        if self.scheduler is not None:
+            # Con el circuito abierto no tiene sentido hacer cola
+            self.health.check()
+            self.scheduler.acquire()
+    
     def _initialize_connection(self):
         """Inicializa la conexión con los comandos necesarios"""
         self.connection.write_channel("enable\n")
@@ -32,28 +104,36 @@ class ConnectionService:
         self.connection.write_channel("config\n")
         self.connection.read_until_pattern(r"\)")
     
-    def execute_command(self, command: str, delay_factor: int = 1, timeout: int = 20) -> str:
+    def execute_command(self, command: str, delay_factor: int = 1, timeout: int = 20,
+                        expect_string: str = r"#") -> str:
         """Ejecuta un comando y retorna la salida"""
+        self._esperar_turno()
         try:
             conn = self.connect()
-            return conn.send_command(
+            output = conn.send_command(
                 command,
                 delay_factor=delay_factor,
-                expect_string=r"#",
+                expect_string=expect_string,
                 read_timeout=timeout
             )
+            self._command_done(True)
+            return output
+        except DeviceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error ejecutando comando '{command}': {e}")
+            self._command_done(False)
             raise
     
     def execute_global_command(self, command: str, delay_factor: int = 1, timeout: int = 20) -> str:
         """Ejecuta un comando en contexto global (saliendo de cualquier interfaz)"""
+        self._esperar_turno()
         try:
             conn = self.connect()
             
             # Si estamos en una interfaz específica, salir al modo config global
             if self.current_context.startswith("interface"):
-                logger.info(f"Saliendo del contexto {self.current_context} al modo config global")
+                logger.debug(f"Saliendo del contexto {self.current_context} al modo config global")
                 conn.write_channel("quit\n")
                 conn.read_until_pattern(r"\)#")
                 self.current_context = "config"
@@ -65,28 +145,35 @@ class ConnectionService:
                 expect_string=r"#",
                 read_timeout=timeout
             )
+            self._command_done(True)
             
             return result
+        except DeviceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error ejecutando comando global '{command}': {e}")
+            self._command_done(False)
             raise
     
     def enter_interface(self, tarjeta: str):
         """Entra a la interfaz GPON especificada"""
         try:
+            interface_name = f"gpon-0/{tarjeta}"
+            if self.current_context == f"interface-{interface_name}":
+                return
+            self._esperar_turno()
             conn = self.connect()
             
             # Si ya estamos en una interfaz diferente, salir primero
-            interface_name = f"gpon-0/{tarjeta}"
             if self.current_context.startswith("interface") and self.current_context != f"interface-{interface_name}":
-                logger.info(f"Saliendo del contexto actual: {self.current_context}")
+                logger.debug(f"Saliendo del contexto actual: {self.current_context}")
                 conn.write_channel("quit\n")
                 conn.read_until_pattern(r"\)#")
                 self.current_context = "config"
             
             # Entrar a la interfaz específica
             if self.current_context != f"interface-{interface_name}":
-                logger.info(f"Entrando a interfaz gpon 0/{tarjeta}")
+                logger.debug(f"Entrando a interfaz gpon 0/{tarjeta}")
                 conn.write_channel(f"interface gpon 0/{tarjeta}\n")
                 conn.read_until_pattern(r"#")
                 self.current_context = f"interface-{interface_name}"
@@ -99,8 +186,9 @@ class ConnectionService:
         """Sale de la interfaz actual y vuelve al modo config"""
         try:
             if self.current_context.startswith("interface"):
+                self._esperar_turno()
                 conn = self.connect()
-                logger.info(f"Saliendo del contexto {self.current_context}")
+                logger.debug(f"Saliendo del contexto {self.current_context}")
                 conn.write_channel("quit\n")
                 conn.read_until_pattern(r"\)#")
                 self.current_context = "config"
@@ -115,7 +203,8 @@ class ConnectionService:
             
             # Si estamos en una interfaz, salir
             if self.current_context.startswith("interface"):
-                logger.info("Asegurando modo config global")
+                self._esperar_turno()
+                logger.debug("Asegurando modo config global")
                 conn.write_channel("quit\n")
                 conn.read_until_pattern(r"\)#")
                 self.current_context = "config"
@@ -128,6 +217,40 @@ class ConnectionService:
         """Retorna el contexto actual de la conexión"""
         return self.current_context
     
+    def idle_seconds(self) -> Optional[float]:
+        """Segundos sin tráfico en la sesión (comandos o keepalives), o None si no hay sesión"""
+        if self.connection is None or not self._last_ok:
+            return None
+        return time.monotonic() - self._last_ok
+    
+    def unused_seconds(self) -> Optional[float]:
+        """Segundos desde el último comando real, o None si no hay sesión"""
+        if self.connection is None or not self._last_used:
+            return None
+        return time.monotonic() - self._last_used
+    
+    def keepalive(self) -> bool:
+        """
+        Envía un no-op (línea vacía) para que el OLT no cierre la sesión por inactividad.
+        No espera si otro hilo está usando la sesión (en ese caso ya hay tráfico) y cede
+        el turno a cualquier hilo que la esté esperando.
+        """
+        if self.lock.scheduler.reservar([self.lock], priority=BACKGROUND, blocking=False) is None:
+            return False
+        try:
+            if self.connection is None:
+                return False
+            self.connection.write_channel("\n")
+            self.connection.read_until_pattern(r"#", read_timeout=10)
+            self._last_ok = time.monotonic()
+            return True
+        except Exception as e:
+            logger.warning(f"Keepalive fallido, se verificará la sesión en el próximo uso: {e}")
+            self._command_done(False)
+            return False
+        finally:
+            self.lock.release()
+    
     def disconnect(self):
         """Cierra la conexión"""
         if self.connection and self.connection.is_alive():
@@ -143,4 +266,81 @@ class ConnectionService:
                 logger.error(f"Error cerrando conexión: {e}")
             finally:
                 self.connection = None
-                self.current_context = "global"
\ No newline at end of file
+                self.current_context = "global"
+                self._last_ok = 0.0
+
+
+class ConnectionPool:
+    """
+    Conjunto acotado de sesiones SSH al mismo dispositivo. La primera sesión es la
+    que usan las consultas interactivas; las tareas masivas toman sesiones con
+    acquire() y prefieren las adicionales para no competir con ellas. Cada sesión que
+    se libera pasa al hilo de mayor prioridad que la espera (ver CommandScheduler).
+    """
+
+    def __init__(self, device_config: dict, size: int = 2, health: Optional[DeviceHealth] = None,
+                 liveness_interval: float = 30, scheduler: Optional[CommandScheduler] = None,
+                 connection_factory: Optional[Callable[[dict], "BaseConnection"]] = None):
+        self.device_config = device_config
+        # Todas las sesiones comparten el estado de salud y el limitador de comandos del dispositivo
+        self.health = health or DeviceHealth(device_config.get('host') or device_config.get('ip', ''))
+        self.scheduler = scheduler
+        # Sin limitador de comandos, un scheduler sin límite de tasa ordena igual la espera de sesiones
+        arbitro = scheduler or CommandScheduler(device_config.get('host') or device_config.get('ip', ''), rate=0)
+        self.members = [ConnectionService(device_config, self.health, liveness_interval, arbitro,
+                                          connection_factory)
+                        for _ in range(max(size, 1))]
+        self.primary = self.members[0]
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """Reserva una sesión del pool (bloqueada para el hilo actual) mientras dure el bloque"""
+        # No tiene sentido esperar una sesión libre si el dispositivo está caído
+        self.health.check()
+        # Las sesiones adicionales primero: la principal queda para las consultas interactivas
+        sesiones = [member.lock for member in self.members[1:]] + [self.primary.lock]
+        lock = self.primary.lock.scheduler.reservar(sesiones, timeout=timeout)
+        if lock is None:
+            raise TimeoutError("No hay sesiones SSH libres en el pool")
+        try:
+            yield next(member for member in self.members if member.lock is lock)
+        finally:
+            lock.release()
+
+    def disconnect_all(self):
+        """Cierra todas las sesiones del pool"""
+        for member in self.members:
+            member.disconnect()
+
+    def start_keepalive(self, interval: float = 60, idle_after: float = 120, max_idle: float = 0):
+        """
+        Inicia el hilo de keepalive del pool
+        Args:
+            interval: segundos entre revisiones
+            idle_after: solo se envía el no-op a sesiones sin tráfico durante este tiempo
+            max_idle: cierra las sesiones adicionales sin uso real durante este tiempo (0 = nunca)
+        """
+        def run():
+            while True:
+                time.sleep(interval)
+                for member in self.members:
+                    idle = member.idle_seconds()
+                    if idle is None:
+                        continue
+                    unused = member.unused_seconds()
+                    if (max_idle and member is not self.primary
+                            and unused is not None and unused > max_idle):
+                        logger.info(f"Cerrando sesión SSH adicional sin uso desde hace {unused:.0f}s")
+                        with member.lock:
+                            member.disconnect()
+                    elif idle >= idle_after:
+                        member.keepalive()
+
+        thread = threading.Thread(target=run, name="ssh-keepalive", daemon=True)
+        thread.start()
+        return thread
+
@@ -0,0 +1,145 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'        # Dispositivo sano: se permiten comandos
+OPEN = 'open'            # Dispositivo caído: se rechazan comandos de inmediato
+HALF_OPEN = 'half_open'  # Sondeo en curso para comprobar si volvió
+
+
+class DeviceUnavailableError(Exception):
+    """El circuito del dispositivo está abierto: no se intenta conectar hasta el próximo sondeo"""
+
+    def __init__(self, device: str, retry_in: float, last_error: Optional[str] = None):
+        self.device = device
+        self.retry_in = retry_in
+        self.last_error = last_error
+        super().__init__(f"Dispositivo {device} no disponible (reintento en {retry_in:.0f}s): {last_error}")
+
+    def __reduce__(self):
+        # Permite enviar la excepción entre procesos (broker de sesiones)
+        return self.__class__, (self.device, self.retry_in, self.last_error)
+
+
+class DeviceHealth:
+    """
+    Máquina de estados de salud de un dispositivo (circuit breaker).
+
+    Tras `failure_threshold` fallos de conexión consecutivos el circuito se abre y
+    todas las peticiones fallan de inmediato con DeviceUnavailableError. Un hilo en
+    segundo plano sondea el dispositivo con backoff exponencial (half-open) y cierra
+    el circuito cuando el sondeo tiene éxito.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3,
+                 base_backoff: float = 5.0, max_backoff: float = 300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self.next_probe_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_success: Optional[datetime] = None
+        self.last_failure: Optional[datetime] = None
+
+        self._lock = threading.Lock()
+        self._probe_thread: Optional[threading.Thread] = None
+
+    def check(self):
+        """Lanza DeviceUnavailableError si el circuito no está cerrado"""
+        if self.state == CLOSED:
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                retry_in = max((self.next_probe_at or time.monotonic()) - time.monotonic(), 0)
+                raise DeviceUnavailableError(self.name, retry_in, self.last_error)
+
+    def record_success(self):
+        """Registra una conexión exitosa y cierra el circuito"""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Dispositivo {self.name} disponible nuevamente, cerrando circuito")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_count = 0
+            self.next_probe_at = None
+            self.last_success = datetime.now()
+
+    def record_failure(self, error: Exception, probe: Optional[Callable[[], None]] = None):
+        """
+        Registra un fallo de conexión
+        Args:
+            error: excepción producida al conectar
+            probe: función que intenta reconectar; se usa para los sondeos half-open
+        """
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self.last_failure = datetime.now()
+
+            if self.state == CLOSED and self.failures < self.failure_threshold:
+                return
+            self._open()
+
+            if probe is not None and (self._probe_thread is None or not self._probe_thread.is_alive()):
+                self._probe_thread = threading.Thread(
+                    target=self._probe_loop, args=(probe,), name=f"probe-{self.name}", daemon=True
+                )
+                self._probe_thread.start()
+
+    def _open(self):
+        """Abre el circuito y programa el próximo sondeo con backoff exponencial (con jitter)"""
+        backoff = min(self.base_backoff * (2 ** self.opened_count), self.max_backoff)
+        backoff *= random.uniform(0.9, 1.1)
+        self.opened_count += 1
+        self.state = OPEN
+        self.next_probe_at = time.monotonic() + backoff
+        logger.warning(f"Circuito abierto para {self.name} tras {self.failures} fallos; "
+                       f"próximo sondeo en {backoff:.0f}s ({self.last_error})")
+
+    def _probe_loop(self, probe: Callable[[], None]):
+        """Sondea el dispositivo hasta que responda"""
+        while True:
+            delay = (self.next_probe_at or time.monotonic()) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self._lock:
+                if self.state == CLOSED:
+                    return
+                self.state = HALF_OPEN
+
+            try:
+                probe()
+                self.record_success()
+                return
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    self.last_failure = datetime.now()
+                    self._open()
+
+    def to_dict(self) -> dict:
+        """Estado del dispositivo para la API"""
+        retry_in = None
+        if self.state != CLOSED and self.next_probe_at is not None:
+            retry_in = round(max(self.next_probe_at - time.monotonic(), 0), 1)
+        return {
+            'device': self.name,
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in_s': retry_in,
+            'last_error': self.last_error,
+            'last_success': self.last_success.isoformat() if self.last_success else None,
+            'last_failure': self.last_failure.isoformat() if self.last_failure else None
+        }
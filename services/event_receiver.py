@@ -0,0 +1,319 @@
+"""
+Recepción de eventos del OLT (syslog y traps SNMPv2c) para actualizar el estado de
+ONTs y puertos sin esperar al siguiente sondeo. Cada evento de ONT (online, offline,
+LOS, dying-gasp) se aplica de inmediato al inventario y a los conteos en caché de la
+tarjeta/chasis, y programa una consulta CLI solo del puerto afectado para confirmar.
+"""
+import logging
+import re
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from services.command_scheduler import BACKGROUND, DeviceSaturatedError, prioridad
+from services.snmp_client import OID, SnmpError, TRAP_V2, decode_message, parse_oid
+from services.snmp_source import CAUSAS_CAIDA, IFINDEX_BASE, ONT_LAST_DOWN_CAUSE, ONT_RUN_STATUS, puerto_if_index
+
+logger = logging.getLogger(__name__)
+
+SNMP_TRAP_OID = parse_oid('1.3.6.1.6.3.1.1.4.1.0')
+
+# Ubicación de la ONT en los mensajes de syslog del OLT
+_UBICACIONES = [
+    re.compile(r'FrameID:\s*(\d+),\s*SlotID:\s*(\d+),\s*PortID:\s*(\d+),\s*ONT\s*ID:\s*(\d+)', re.I),
+    re.compile(r'\b(\d+)/\s*(\d+)/\s*(\d+)\b\D{0,20}?\bONT\s*(?:ID)?\s*[:=]?\s*(\d+)', re.I),
+]
+# Tipo de evento: gana el que aparece primero en el mensaje (el estado anterior se descarta)
+_RECUPERACION = re.compile(r'\b(clear(ed)?|recover(ed|y)?|restore(d)?|resume[ds]?)\b', re.I)
+_ESTADO_ANTERIOR = re.compile(r'\b(previous|last|old)\s+(state|status)\s*(is|was)?\s*[:=]?\s*[\w-]+'
+                              r'|\bfrom\s+[\w-]+\s+to\b', re.I)
+_EVENTOS_SYSLOG = [
+    (re.compile(r'dying[- ]?gasp|\bDGi\b|\bpower(ed)?[- ]off\b', re.I), 'offline', 'dying-gasp'),
+    (re.compile(r'\bLOSi\b|\bLOBi\b'), 'offline', 'LOSi/LOBi'),
+    (re.compile(r'\bloss of burst\b', re.I), 'offline', 'LOSi/LOBi'),
+    (re.compile(r'\bLOS\b'), 'offline', 'LOS'),
+    (re.compile(r'\bloss of signal\b', re.I), 'offline', 'LOS'),
+    (re.compile(r'\boff-?line\b', re.I), 'offline', ''),
+    (re.compile(r'\bon-?line\b', re.I), 'online', ''),
+]
+
+
+@dataclass
+class OntEvent:
+    """Cambio de estado de una ONT informado por el OLT"""
+    tarjeta: str
+    puerto: str
+    ont_id: str
+    estado: str                  # 'online' / 'offline'
+    causa: str = ''
+    origen: str = 'syslog'
+    fecha: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> dict:
+        return {
+            'tarjeta': self.tarjeta,
+            'puerto': self.puerto,
+            'ont_id': self.ont_id,
+            'estado': self.estado,
+            'causa': self.causa,
+            'origen': self.origen,
+            'fecha': self.fecha.isoformat(timespec='seconds')
+        }
+
+
+def parse_syslog(mensaje: str) -> Optional[OntEvent]:
+    """Evento de ONT a partir de una línea de syslog, o None si no es un evento de ONT"""
+    mensaje = re.sub(r'^<\d+>', '', mensaje.strip())
+    for patron in _UBICACIONES:
+        ubicacion = patron.search(mensaje)
+        if ubicacion:
+            break
+    else:
+        return None
+    _, slot, puerto, ont_id = ubicacion.groups()
+
+    # "online, previous state offline" / "from online to offline": solo cuenta el estado nuevo
+    texto = _ESTADO_ANTERIOR.sub(' ', mensaje)
+    eventos = sorted((coincidencia.start(), orden, estado, causa)
+                     for orden, (patron, estado, causa) in enumerate(_EVENTOS_SYSLOG)
+                     if (coincidencia := patron.search(texto)))
+    if not eventos:
+        return None
+    _, _, estado, causa = eventos[0]
+    if estado == 'offline':
+        # "ONT offline, cause: dying-gasp": la causa puede venir después del estado
+        causa = causa or next((c for _, _, e, c in eventos if e == 'offline' and c), '')
+        # La recuperación de una alarma de caída (LOS, dying-gasp...) es una subida
+        if _RECUPERACION.search(texto):
+            estado, causa = 'online', ''
+    return OntEvent(slot, puerto, ont_id, estado, causa)
+
+
+def parse_trap(mensaje: dict, trap_oids: Optional[Dict[str, Tuple[str, str]]] = None) -> Optional[OntEvent]:
+    """
+    Evento de ONT a partir de un trap SNMPv2c decodificado. La ONT se ubica por el índice
+    (ifIndex, ONT ID) de los varbinds de HUAWEI-XPON-MIB; el estado sale del run status
+    y la causa de caída incluidos en el trap, o de `trap_oids` (OID del trap -> (estado, causa)).
+    """
+    valores: Dict[OID, object] = {oid: value for oid, _, value in mensaje['varbinds']}
+    ubicacion = next(((oid[-2], oid[-1]) for oid in valores
+                      if len(oid) > 2 and oid[-2] >= IFINDEX_BASE), None)
+    if ubicacion is None:
+        return None
+    slot, puerto = puerto_if_index(ubicacion[0])
+
+    estado, causa = None, ''
+    trap_oid = valores.get(SNMP_TRAP_OID)
+    if trap_oids and isinstance(trap_oid, tuple):
+        estado, causa = trap_oids.get('.'.join(map(str, trap_oid)), (None, ''))
+    for oid, value in valores.items():
+        if oid[:len(ONT_RUN_STATUS)] == ONT_RUN_STATUS and value in (1, 2):
+            estado = 'online' if value == 1 else 'offline'
+        elif oid[:len(ONT_LAST_DOWN_CAUSE)] == ONT_LAST_DOWN_CAUSE and isinstance(value, int) and value > 0:
+            causa = CAUSAS_CAIDA.get(value, str(value))
+    if estado is None:
+        return None
+    return OntEvent(str(slot), str(puerto), str(ubicacion[1]), estado, causa if estado == 'offline' else '',
+                    origen='trap')
+
+
+class EventProcessor:
+    """
+    Aplica los eventos de ONT al inventario y a los conteos de puertos en caché, y
+    agrupa las consultas de confirmación por puerto: una ráfaga de eventos del mismo
+    puerto (ej. un corte de fibra) produce una sola consulta.
+    """
+
+    MAX_EVENTS = 200
+
+    def __init__(self, inventory, board_service, ont_service, refresh_delay: float = 15,
+                 refresh_min_interval: float = 120):
+        self.inventory = inventory
+        self.board_service = board_service
+        self.ont_service = ont_service
+        self.refresh_delay = refresh_delay
+        self.refresh_min_interval = refresh_min_interval
+        self._pendientes: Dict[Tuple[str, str], float] = {}       # puerto -> instante de consulta
+        self._ultimo_refresco: Dict[Tuple[str, str], float] = {}
+        self._eventos = deque(maxlen=self.MAX_EVENTS)
+        self._stats = {'recibidos': 0, 'aplicados': 0, 'desconocidos': 0, 'ignorados': 0,
+                       'refrescos': 0, 'refrescos_fallidos': 0}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia el hilo de consultas de confirmación si no está corriendo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def ignorar(self):
+        """Cuenta un mensaje recibido que no es un evento de ONT"""
+        with self._cond:
+            self._stats['ignorados'] += 1
+
+    def procesar(self, evento: OntEvent) -> bool:
+        """Aplica un evento; retorna False si la ONT no estaba en el inventario"""
+        with self._cond:
+            self._stats['recibidos'] += 1
+            self._eventos.append(evento.to_dict())
+
+        cambios = {'estado': evento.estado}
+        if evento.estado == 'offline':
+            # Una ONT caída no tiene lectura óptica (igual que en "display ont optical-info")
+            cambios.update(last_down_time=evento.fecha.strftime('%Y-%m-%d %H:%M:%S'),
+                           ont_rx=None, olt_rx=None, temperature=None)
+            if evento.causa:
+                cambios['last_down_cause'] = evento.causa
+
+        anterior = self.inventory.update_ont(evento.tarjeta, evento.puerto, evento.ont_id, cambios)
+        if anterior is not None and self.board_service is not None:
+            delta = (evento.estado == 'online') - (anterior.get('estado', '').lower() == 'online')
+            if delta:
+                self.board_service.actualizar_puerto(evento.tarjeta, evento.puerto, delta_online=delta)
+
+        with self._cond:
+            self._stats['aplicados' if anterior is not None else 'desconocidos'] += 1
+        logger.info(f"Evento {evento.origen}: ONT {evento.tarjeta}/{evento.puerto}/{evento.ont_id} "
+                    f"{evento.estado}{f' ({evento.causa})' if evento.causa else ''}")
+        self.programar_refresco(evento.tarjeta, evento.puerto)
+        return anterior is not None
+
+    def programar_refresco(self, tarjeta: str, puerto: str):
+        """Programa la consulta del puerto (una por ráfaga y como mucho una cada refresh_min_interval)"""
+        key = (str(tarjeta), str(puerto))
+        with self._cond:
+            if key in self._pendientes:
+                return
+            ahora = time.monotonic()
+            ultimo = self._ultimo_refresco.get(key)
+            siguiente = ahora + self.refresh_delay
+            if ultimo is not None:
+                siguiente = max(siguiente, ultimo + self.refresh_min_interval)
+            self._pendientes[key] = siguiente
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                ahora = time.monotonic()
+                listos = [key for key, instante in self._pendientes.items() if instante <= ahora]
+                if not listos:
+                    proximo = min(self._pendientes.values(), default=ahora + 60)
+                    self._cond.wait(max(proximo - ahora, 0.05))
+                    continue
+                for key in listos:
+                    del self._pendientes[key]
+                    self._ultimo_refresco[key] = ahora
+            for tarjeta, puerto in listos:
+                self._refrescar(tarjeta, puerto)
+
+    def _refrescar(self, tarjeta: str, puerto: str):
+        """Consulta el puerto; ONTService lleva el resultado al inventario y a los conteos"""
+        try:
+            with prioridad(BACKGROUND):
+                self.ont_service.obtener_onts(tarjeta, puerto)
+            with self._cond:
+                self._stats['refrescos'] += 1
+        except DeviceSaturatedError as e:
+            logger.info(f"Eventos: consulta de {tarjeta}/{puerto} diferida, {e}")
+            self.programar_refresco(tarjeta, puerto)
+        except Exception as e:
+            with self._cond:
+                self._stats['refrescos_fallidos'] += 1
+            logger.warning(f"Eventos: error consultando {tarjeta}/{puerto}: {e}")
+
+    def snapshot(self) -> dict:
+        """Contadores, puertos con consulta pendiente y últimos eventos (más recientes primero)"""
+        with self._cond:
+            ahora = time.monotonic()
+            return {
+                'stats': dict(self._stats),
+                'pendientes': [{'tarjeta': t, 'puerto': p, 'en_s': round(max(instante - ahora, 0), 1)}
+                               for (t, p), instante in sorted(self._pendientes.items())],
+                'eventos': list(reversed(self._eventos))
+            }
+
+
+class EventReceiver:
+    """Escucha syslog y traps SNMPv2c por UDP y entrega los eventos de ONT al EventProcessor"""
+
+    def __init__(self, processor: EventProcessor, host: str = '0.0.0.0', syslog_port: Optional[int] = 5514,
+                 trap_port: Optional[int] = 1162, community: str = 'public',
+                 fuentes: Optional[Iterable[str]] = None, trap_oids: Optional[Dict[str, Tuple[str, str]]] = None):
+        self.processor = processor
+        self.host = host
+        self.syslog_port = syslog_port
+        self.trap_port = trap_port
+        self.community = community
+        # Direcciones aceptadas (None = cualquiera)
+        self.fuentes = set(fuentes) if fuentes else None
+        self.trap_oids = trap_oids or {}
+        self._sockets = []
+
+    def start(self):
+        """Abre los puertos UDP configurados (los que fallen se registran y se omiten)"""
+        for nombre, port, manejar in (('syslog', self.syslog_port, self._syslog),
+                                      ('traps', self.trap_port, self._trap)):
+            if not port:
+                continue
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.bind((self.host, port))
+            except OSError as e:
+                logger.error(f"No se pudo escuchar {nombre} en {self.host}:{port}: {e}")
+                sock.close()
+                continue
+            self._sockets.append(sock)
+            threading.Thread(target=self._escuchar, args=(sock, manejar), name=f"events-{nombre}",
+                             daemon=True).start()
+            logger.info(f"Recibiendo {nombre} del OLT en {self.host}:{port}")
+        self.processor.start()
+
+    def stop(self):
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+        self.processor.stop()
+
+    def _escuchar(self, sock: socket.socket, manejar: Callable[[bytes], Optional[OntEvent]]):
+        while True:
+            try:
+                data, (origen, _) = sock.recvfrom(65535)
+            except OSError:
+                return
+            if self.fuentes is not None and origen not in self.fuentes:
+                continue
+            try:
+                evento = manejar(data)
+                if evento is None:
+                    self.processor.ignorar()
+                else:
+                    self.processor.procesar(evento)
+            except Exception as e:
+                logger.warning(f"Error procesando mensaje de {origen}: {e}")
+
+    def _syslog(self, data: bytes) -> Optional[OntEvent]:
+        return parse_syslog(data.decode('utf-8', errors='replace'))
+
+    def _trap(self, data: bytes) -> Optional[OntEvent]:
+        try:
+            mensaje = decode_message(data)
+        except SnmpError as e:
+            logger.debug(f"Trap ilegible (solo se admite SNMPv2c): {e}")
+            return None
+        if mensaje['pdu'] != TRAP_V2 or mensaje['community'] != self.community:
+            return None
+        return parse_trap(mensaje, self.trap_oids)
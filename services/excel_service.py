@@ -1,17 +1,84 @@
 import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from typing import Dict, List
+
 from models.ont_model import ONTCollection
 
 class ExcelService:
     """Servicio para generar reportes en Excel"""
     
+    HEADERS = [
+        "ID ONU", "DESCRIPCION", "ONT RX", "OLT RX", "DIFERENCIA",
+        "TEMPERATURA", "DISTANCIA", "ESTADO", "HORA CAIDA", "ULTIMA CAIDA"
+    ]
+    
     @staticmethod
     def generar_reporte(ont_collection: ONTCollection) -> io.BytesIO:
         """Genera un archivo Excel con los datos de las ONTs"""
+        # openpyxl se importa al generar el primer reporte para no retrasar el arranque
+        from openpyxl import Workbook
+
         wb = Workbook()
         ws = wb.active
         ws.title = "Reporte ONTs"
+        ExcelService._escribir_hoja(ws, ont_collection)
+        return ExcelService._guardar(wb)
+    
+    @staticmethod
+    def generar_reporte_tarjetas(colecciones: Dict[str, ONTCollection]) -> io.BytesIO:
+        """Genera un Excel con una hoja por tarjeta (incluye la columna PUERTO)"""
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        wb.remove(wb.active)
+        for tarjeta, coleccion in colecciones.items():
+            ws = wb.create_sheet(title=f"Tarjeta {tarjeta}")
+            ExcelService._escribir_hoja(ws, coleccion, incluir_puerto=True)
+        return ExcelService._guardar(wb)
+    
+    @staticmethod
+    def generar_reporte_optico(colecciones: Dict[str, ONTCollection], resumen: List[dict],
+                               rangos: List[str], fallidas: Dict[str, str]) -> io.BytesIO:
+        """Genera el reporte óptico: hoja de resumen por puerto y una hoja por tarjeta"""
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Resumen"
+        headers = (["TARJETA", "PUERTO", "ONTS", "ONLINE", "RX CRITICO", "RX MIN", "RX PROMEDIO", "RX MAX"]
+                   + [f"RX {rango}" for rango in rangos])
+        for col, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+            ws.column_dimensions[cell.column_letter].width = max(len(header) + 2, 10)
+
+        row = 1
+        for row, fila in enumerate(resumen, 2):
+            valores = [fila['tarjeta'], fila['puerto'], fila['total'], fila['online'], fila['criticas'],
+                       fila['rx_min'], fila['rx_promedio'], fila['rx_max']] + fila['rangos']
+            for col, valor in enumerate(valores, 1):
+                ws.cell(row=row, column=col, value=valor)
+            if fila['criticas']:
+                ws.cell(row=row, column=5).font = Font(bold=True, color="FF0000")
+
+        # Totales y tarjetas que no se pudieron consultar
+        total_row = row + 1
+        ws.cell(row=total_row, column=1, value="TOTAL").font = Font(bold=True)
+        for col, campo in ((3, 'total'), (4, 'online'), (5, 'criticas')):
+            ws.cell(row=total_row, column=col, value=sum(f[campo] for f in resumen)).font = Font(bold=True)
+        for row, (tarjeta, error) in enumerate(sorted(fallidas.items()), total_row + 2):
+            ws.cell(row=row, column=1, value=tarjeta)
+            ws.cell(row=row, column=2, value=f"ERROR: {error}").font = Font(color="FF0000")
+
+        for tarjeta, coleccion in colecciones.items():
+            ExcelService._escribir_hoja(wb.create_sheet(title=f"Tarjeta {tarjeta}"), coleccion, incluir_puerto=True)
+        return ExcelService._guardar(wb)
+    
+    @staticmethod
+    def _escribir_hoja(ws, ont_collection: ONTCollection, incluir_puerto: bool = False):
+        """Escribe encabezados y filas de ONTs en una hoja"""
+        from openpyxl.styles import Font, PatternFill, Alignment
         
         # Configurar estilos
         header_font = Font(bold=True, color="FFFFFF")
@@ -19,10 +86,8 @@ class ExcelService:
         header_alignment = Alignment(horizontal="center", vertical="center")
         
         # Encabezados
-        headers = [
-            "ID ONU", "DESCRIPCION", "ONT RX", "OLT RX", "DIFERENCIA",
-            "TEMPERATURA", "DISTANCIA", "ESTADO", "HORA CAIDA", "ULTIMA CAIDA"
-        ]
+        headers = (["PUERTO"] if incluir_puerto else []) + ExcelService.HEADERS
+        offset = 1 if incluir_puerto else 0
         
         # Aplicar encabezados con estilo
         for col, header in enumerate(headers, 1):
@@ -33,28 +98,30 @@ class ExcelService:
         
         # Agregar datos
         for row, ont in enumerate(ont_collection.onts, 2):
-            ws.cell(row=row, column=1, value=ont.id)
-            ws.cell(row=row, column=2, value=ont.descripcion)
-            ws.cell(row=row, column=3, value=ont.ont_rx)
-            ws.cell(row=row, column=4, value=ont.olt_rx)
+            if incluir_puerto:
+                ws.cell(row=row, column=1, value=f"0/{ont.tarjeta}/{ont.puerto}")
+            ws.cell(row=row, column=offset + 1, value=ont.id)
+            ws.cell(row=row, column=offset + 2, value=ont.descripcion)
+            ws.cell(row=row, column=offset + 3, value=ont.ont_rx)
+            ws.cell(row=row, column=offset + 4, value=ont.olt_rx)
             
             # Diferencia con color condicional
-            diff_cell = ws.cell(row=row, column=5, value=ont.rx_diff)
+            diff_cell = ws.cell(row=row, column=offset + 5, value=ont.rx_diff)
             if ont.has_critical_rx_diff():
                 diff_cell.font = Font(color="FF0000")  # Rojo para valores críticos
             
-            ws.cell(row=row, column=6, value=ont.temperature)
-            ws.cell(row=row, column=7, value=ont.distance)
+            ws.cell(row=row, column=offset + 6, value=ont.temperature)
+            ws.cell(row=row, column=offset + 7, value=ont.distance)
             
             # Estado con color
-            estado_cell = ws.cell(row=row, column=8, value=ont.estado)
+            estado_cell = ws.cell(row=row, column=offset + 8, value=ont.estado)
             if ont.is_online():
                 estado_cell.font = Font(color="00AA00")  # Verde para online
             else:
                 estado_cell.font = Font(color="FF0000")  # Rojo para offline
             
-            ws.cell(row=row, column=9, value=ont.last_down_time)
-            ws.cell(row=row, column=10, value=ont.last_down_cause)
+            ws.cell(row=row, column=offset + 9, value=ont.last_down_time)
+            ws.cell(row=row, column=offset + 10, value=ont.last_down_cause)
         
         # Ajustar ancho de columnas
         for column in ws.columns:
@@ -70,11 +137,12 @@ class ExcelService:
             
             adjusted_width = min(max_length + 2, 50)
             ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Guardar en memoria
+    
+    @staticmethod
+    def _guardar(wb) -> io.BytesIO:
+        """Guarda el libro en memoria"""
         file_stream = io.BytesIO()
         wb.save(file_stream)
         file_stream.seek(0)
         
         return file_stream
-    
\ No newline at end of file
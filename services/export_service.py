@@ -0,0 +1,74 @@
+import logging
+from typing import Dict, List
+
+from models.ont_model import ONTCollection
+from services.command_scheduler import BULK, DeviceSaturatedError, prioridad
+
+logger = logging.getLogger(__name__)
+
+
+class ExportService:
+    """Exportaciones de tarjetas completas a Excel, ejecutadas como trabajos de JobManager"""
+
+    PUERTOS = 16  # puertos 0-15 de cada tarjeta
+
+    def __init__(self, ont_service, pool, excel_service):
+        self.ont_service = ont_service
+        self.pool = pool
+        self.excel_service = excel_service
+
+    @staticmethod
+    def normalizar_tarjetas(tarjetas) -> List[str]:
+        """Valida y ordena la lista de tarjetas para que los pedidos equivalentes se dedupliquen"""
+        if isinstance(tarjetas, str):
+            tarjetas = tarjetas.split(',')
+        try:
+            numeros = sorted({int(str(t).strip()) for t in tarjetas if str(t).strip()})
+        except ValueError:
+            raise ValueError(f"Tarjetas inválidas: {tarjetas}")
+        if not numeros or any(n < 0 or n > 31 for n in numeros):
+            raise ValueError("Indique al menos una tarjeta válida (0-31)")
+        return [str(n) for n in numeros]
+
+    def exportar_tarjetas(self, job, params: Dict) -> str:
+        """Consulta todos los puertos de las tarjetas y guarda el Excel (runner 'export_tarjetas')"""
+        tarjetas = params['tarjetas']
+        job.definir_pasos([f"{t}/{p}" for t in tarjetas for p in range(self.PUERTOS)])
+
+        colecciones = {}
+        with prioridad(BULK):
+            for tarjeta in tarjetas:
+                # Una sesión del pool por tarjeta para no bloquear las consultas interactivas
+                with self.pool.acquire() as conn:
+                    colecciones[tarjeta] = self._exportar_tarjeta(self.ont_service.con_sesion(conn), job, tarjeta)
+
+        total = sum(c.get_total_count() for c in colecciones.values())
+        if total == 0:
+            raise ValueError("No se encontraron ONTs en las tarjetas solicitadas")
+
+        ruta = job.ruta_archivo(f"Reporte_Tarjeta_{'_'.join(tarjetas)}_Puertos_0_{self.PUERTOS - 1}.xlsx")
+        file_stream = self.excel_service.generar_reporte_tarjetas(colecciones)
+        with open(ruta, 'wb') as f:
+            f.write(file_stream.getbuffer())
+        logger.info(f"Exportación de tarjetas {tarjetas}: {total} ONTs en {ruta}")
+        return ruta
+
+    def _exportar_tarjeta(self, ont_service, job, tarjeta: str) -> ONTCollection:
+        coleccion = ONTCollection()
+        for p in range(self.PUERTOS):
+            paso = f"{tarjeta}/{p}"
+            try:
+                parcial = ont_service.obtener_onts(tarjeta, str(p))
+                coleccion.extend(parcial)
+                detalle = f"{parcial.get_total_count()} ONTs"
+                if parcial.stale:
+                    job.avanzar(paso, 'stale', f"{detalle} (datos de hace {parcial.stale_age_s}s)")
+                else:
+                    job.avanzar(paso, 'ok', detalle)
+            except DeviceSaturatedError:
+                raise
+            except Exception as e:
+                # No detiene todo si un puerto falla, solo se registra en el progreso
+                logger.warning(f"Error exportando puerto {paso}: {e}")
+                job.avanzar(paso, 'error', str(e))
+        return coleccion
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+COMPLETADO = 'completado'
+ERROR = 'error'
+
+
+class Job:
+    """Trabajo en segundo plano con progreso por pasos (ej. cada puerto de una tarjeta)"""
+
+    def __init__(self, job_id: str, tipo: str, params: dict, directorio: str, cond: threading.Condition):
+        self.id = job_id
+        self.tipo = tipo
+        self.params = params
+        self.estado = PENDIENTE
+        self.pasos: Dict[str, dict] = OrderedDict()
+        self.error: Optional[str] = None
+        self.archivo: Optional[str] = None
+        self.creado = datetime.now()
+        self.iniciado: Optional[datetime] = None
+        self.terminado: Optional[datetime] = None
+        self.solicitudes = 1   # cuántas veces se pidió (deduplicación)
+        self.version = 0       # aumenta con cada cambio, para los streams de progreso
+        self._directorio = directorio
+        self._cond = cond
+
+    def _cambio(self):
+        self.version += 1
+        self._cond.notify_all()
+
+    def definir_pasos(self, nombres: List[str]):
+        """Declara los pasos del trabajo antes de empezar a ejecutarlos"""
+        with self._cond:
+            self.pasos = OrderedDict((nombre, {'estado': PENDIENTE, 'detalle': ''}) for nombre in nombres)
+            self._cambio()
+
+    def avanzar(self, paso: str, estado: str, detalle: str = ''):
+        """Marca el resultado de un paso ('ok', 'stale', 'error')"""
+        with self._cond:
+            self.pasos[paso] = {'estado': estado, 'detalle': detalle}
+            self._cambio()
+
+    def ruta_archivo(self, nombre: str) -> str:
+        """Ruta en el directorio de exportaciones donde el trabajo guarda su resultado"""
+        nombre = re.sub(r'[^\w.\-]', '_', nombre)
+        return os.path.join(self._directorio, f"{self.id}_{nombre}")
+
+    def nombre_archivo(self) -> Optional[str]:
+        """Nombre de descarga del archivo generado (sin el prefijo del id)"""
+        if not self.archivo:
+            return None
+        nombre = os.path.basename(self.archivo)
+        return nombre[len(self.id) + 1:] if nombre.startswith(f"{self.id}_") else nombre
+
+    def to_dict(self) -> dict:
+        completados = sum(1 for paso in self.pasos.values() if paso['estado'] != PENDIENTE)
+        total = len(self.pasos)
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'params': self.params,
+            'estado': self.estado,
+            'progreso': round(completados / total * 100) if total else 0,
+            'pasos_completados': completados,
+            'pasos_total': total,
+            'pasos': [{'paso': nombre, **paso} for nombre, paso in self.pasos.items()],
+            'error': self.error,
+            'archivo': self.nombre_archivo(),
+            'solicitudes': self.solicitudes,
+            'version': self.version,
+            'creado': self.creado.isoformat(),
+            'iniciado': self.iniciado.isoformat() if self.iniciado else None,
+            'terminado': self.terminado.isoformat() if self.terminado else None
+        }
+
+
+class JobManager:
+    """
+    Cola de trabajos largos (exportaciones, reportes) ejecutados por un conjunto acotado de hilos.
+    Cada tipo de trabajo tiene un runner registrado que recibe (job, params), reporta su
+    progreso con job.avanzar() y retorna la ruta del archivo generado. Si se pide un
+    trabajo idéntico a uno pendiente o en curso se retorna el existente.
+    """
+
+    def __init__(self, directorio: str, workers: int = 2, retention: float = 86400):
+        self.directorio = directorio
+        self.retention = retention
+        self.runners: Dict[str, Callable[[Job, dict], str]] = {}
+        self._jobs: Dict[str, Job] = OrderedDict()
+        self._activos: Dict[Tuple[str, str], Job] = {}   # (tipo, params) -> trabajo sin terminar
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="job")
+        os.makedirs(directorio, exist_ok=True)
+
+    def registrar(self, tipo: str, runner: Callable[[Job, dict], str]):
+        """Registra la función que ejecuta los trabajos de `tipo`"""
+        self.runners[tipo] = runner
+
+    def submit(self, tipo: str, params: dict) -> dict:
+        """Encola un trabajo, o retorna el que ya está pendiente/en curso con los mismos parámetros"""
+        if tipo not in self.runners:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        key = (tipo, json.dumps(params, sort_keys=True))
+
+        with self._cond:
+            self._purgar()
+            job = self._activos.get(key)
+            if job is not None:
+                job.solicitudes += 1
+                logger.info(f"Trabajo {tipo} {params} ya en curso ({job.id}), se reutiliza")
+                return {**job.to_dict(), 'deduplicado': True}
+
+            job = Job(uuid.uuid4().hex[:12], tipo, params, self.directorio, self._cond)
+            self._jobs[job.id] = job
+            self._activos[key] = job
+
+        logger.info(f"Trabajo {job.id} ({tipo} {params}) encolado")
+        self._executor.submit(self._run, job, key)
+        return {**job.to_dict(), 'deduplicado': False}
+
+    def _run(self, job: Job, key: Tuple[str, str]):
+        with self._cond:
+            job.estado = EN_CURSO
+            job.iniciado = datetime.now()
+            job._cambio()
+        try:
+            archivo = self.runners[job.tipo](job, job.params)
+            with self._cond:
+                job.archivo = archivo
+                job.estado = COMPLETADO
+            logger.info(f"Trabajo {job.id} completado: {archivo}")
+        except Exception as e:
+            logger.error(f"Trabajo {job.id} ({job.tipo}) falló: {e}")
+            with self._cond:
+                job.error = str(e)
+                job.estado = ERROR
+        finally:
+            with self._cond:
+                job.terminado = datetime.now()
+                self._activos.pop(key, None)
+                job._cambio()
+
+    def _purgar(self):
+        """Elimina los trabajos terminados hace más de `retention` (y sus archivos de exportación)"""
+        limite = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.terminado is None or job.terminado.timestamp() > limite:
+                continue
+            del self._jobs[job_id]
+            # Los archivos guardados en otros directorios (reportes) se conservan
+            if job.archivo and os.path.dirname(os.path.abspath(job.archivo)) == os.path.abspath(self.directorio):
+                try:
+                    os.remove(job.archivo)
+                except OSError:
+                    pass
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Estado de un trabajo, o None si no existe"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self) -> List[dict]:
+        """Todos los trabajos conservados, del más reciente al más antiguo (sin el detalle por paso)"""
+        with self._cond:
+            return [{**job.to_dict(), 'pasos': []} for job in reversed(self._jobs.values())]
+
+    def wait(self, job_id: str, version: int, timeout: float = 15) -> Optional[dict]:
+        """Espera hasta `timeout` segundos a que el trabajo cambie respecto de `version`"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            job = self._jobs.get(job_id)
+            while job is not None and job.version == version and job.terminado is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return job.to_dict() if job else None
+
+    def archivo(self, job_id: str) -> Optional[str]:
+        """Ruta del archivo de un trabajo completado que aún existe en disco"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.estado != COMPLETADO or not job.archivo:
+                return None
+            return job.archivo if os.path.exists(job.archivo) else None
@@ -0,0 +1,167 @@
+"""
+Logging fuera del hilo de la petición: los registros se encolan (QueueHandler) y un
+hilo aparte (QueueListener) los formatea y escribe en consola y en un archivo rotativo.
+
+Campos estructurados: logger.info("...", extra=campos(tarjeta=t, puerto=p, inicio=t0))
+agrega olt, tarjeta, puerto y duracion_ms al registro (texto: "[olt=... tarjeta=...]",
+JSON: una clave por campo).
+
+Las salidas CLI crudas solo se registran con capturar_salida(), que está desactivada
+por defecto y, activada, guarda una muestra de las salidas recortadas a un tamaño máximo.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from config import Config
+
+RAW_LOGGER = 'olt.raw'
+_raw = logging.getLogger(RAW_LOGGER)
+_raw.propagate = False
+_raw.setLevel(logging.CRITICAL + 1)   # sin captura hasta configurar_logging()
+
+_listener: Optional[QueueListener] = None
+_handler: Optional['_ColaHandler'] = None
+
+
+def campos(inicio: Optional[float] = None, **valores) -> dict:
+    """
+    `extra` de un registro con campos estructurados (olt, tarjeta, puerto, ...).
+    Args:
+        inicio: time.monotonic() del comienzo de la operación; agrega duracion_ms
+    """
+    if inicio is not None:
+        valores['duracion_ms'] = round((time.monotonic() - inicio) * 1000)
+    return {'campos': {k: v for k, v in valores.items() if v is not None}}
+
+
+def capturar_salida(comando: str, salida: str, **valores):
+    """Registra una muestra de la salida cruda de un comando, recortada a LOG_RAW_MAX_BYTES"""
+    if not _raw.isEnabledFor(logging.DEBUG) or random.random() >= Config.LOG_RAW_SAMPLE_RATE:
+        return
+    texto = salida[:Config.LOG_RAW_MAX_BYTES]
+    if len(salida) > len(texto):
+        texto += f"\n... ({len(salida) - len(texto)} caracteres más)"
+    _raw.debug(f"{comando}\n{texto}", extra=campos(comando=comando, caracteres=len(salida), **valores))
+
+
+class _Formato(logging.Formatter):
+    """Texto con los campos estructurados entre corchetes, o una línea JSON por registro"""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(prefijo)s%(message)s')
+        self.json_lines = json_lines
+        self.olt = Config.DEVICE_CONFIG.get('ip')
+
+    def _campos(self, record: logging.LogRecord) -> dict:
+        valores = getattr(record, 'campos', None)
+        if not valores:
+            return {}
+        return {'olt': self.olt, **valores}
+
+    def format(self, record: logging.LogRecord) -> str:
+        valores = self._campos(record)
+        if self.json_lines:
+            linea = {
+                'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                'nivel': record.levelname,
+                'logger': record.name,
+                'hilo': record.threadName,
+                **valores,
+                'mensaje': record.getMessage(),
+            }
+            return json.dumps(linea, ensure_ascii=False, default=str)
+        record.prefijo = "[" + " ".join(f"{k}={v}" for k, v in valores.items()) + "] " if valores else ""
+        return super().format(record)
+
+
+class _ColaHandler(QueueHandler):
+    """QueueHandler sobre una cola acotada: con la cola llena el registro se descarta sin bloquear"""
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+def _archivo(ruta: str, json_lines: bool) -> RotatingFileHandler:
+    # Un archivo por proceso si la ruta incluye {pid} (varios workers de gunicorn)
+    ruta = ruta.format(pid=os.getpid())
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    handler = RotatingFileHandler(ruta, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT,
+                                  encoding='utf-8', delay=True)
+    handler.setFormatter(_Formato(json_lines))
+    return handler
+
+
+def configurar_logging(nivel: Optional[str] = None) -> QueueListener:
+    """
+    Reemplaza los handlers del logger raíz por la cola y arranca el hilo escritor
+    (consola + LOG_FILE). Llamadas posteriores no hacen nada.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+
+    json_lines = Config.LOG_FORMAT == 'json'
+    consola = logging.StreamHandler(sys.stderr)
+    consola.setFormatter(_Formato())
+    handlers = [consola]
+    if Config.LOG_FILE:
+        handlers.append(_archivo(Config.LOG_FILE, json_lines))
+
+    if Config.LOG_RAW_CAPTURE and Config.LOG_RAW_FILE:
+        # Las salidas crudas van solo a su archivo
+        for handler in handlers:
+            handler.addFilter(lambda record: record.name != RAW_LOGGER)
+        raw = _archivo(Config.LOG_RAW_FILE, json_lines)
+        raw.addFilter(logging.Filter(RAW_LOGGER))
+        handlers.append(raw)
+
+    _handler = _ColaHandler(queue.Queue(Config.LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel((nivel or Config.LOG_LEVEL).upper())
+
+    if Config.LOG_RAW_CAPTURE:
+        _raw.setLevel(logging.DEBUG)
+        _raw.addHandler(_handler)
+
+    _listener = QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logging)
+    return _listener
+
+
+def detener_logging():
+    """Escribe los registros pendientes y detiene el hilo escritor"""
+    global _listener
+    if _listener is None:
+        return
+    if _handler is not None and _handler.descartados:
+        logging.getLogger(__name__).warning(f"{_handler.descartados} registros descartados con la cola llena")
+    _listener.stop()
+    _listener = None
+
+
+def estado() -> dict:
+    """Registros pendientes en la cola y descartados desde el arranque"""
+    if _handler is None:
+        return {'activo': False}
+    return {'activo': _listener is not None, 'pendientes': _handler.queue.qsize(),
+            'descartados': _handler.descartados}
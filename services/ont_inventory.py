@@ -0,0 +1,444 @@
+import base64
+import heapq
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from services.command_scheduler import BACKGROUND, DeviceSaturatedError, prioridad
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, int, int]  # (tarjeta, puerto, ont_id)
+
+
+class _SortedIndex:
+    """Lista ordenada de (valor, clave) para búsquedas por rango y recorridos ordenados"""
+
+    def __init__(self):
+        self.items: List[Tuple[float, Key]] = []
+        self.missing: Set[Key] = set()  # claves sin valor (se ordenan al final)
+
+    def add(self, value, key: Key):
+        if value is None:
+            self.missing.add(key)
+        else:
+            insort(self.items, (value, key))
+
+    def remove(self, value, key: Key):
+        if value is None:
+            self.missing.discard(key)
+            return
+        pos = bisect_left(self.items, (value, key))
+        if pos < len(self.items) and self.items[pos] == (value, key):
+            del self.items[pos]
+
+    def bounds(self, lo=None, hi=None) -> Tuple[int, int]:
+        """Posiciones [inicio, fin) de los valores con lo <= valor < hi"""
+        start = 0 if lo is None else bisect_left(self.items, (lo,))
+        end = len(self.items) if hi is None else bisect_left(self.items, (hi,))
+        return start, max(start, end)
+
+
+class ONTInventory:
+    """
+    Inventario en memoria de todas las ONTs consultadas (poller o consultas puntuales)
+    con índices secundarios para filtrar, ordenar y paginar sin recorrer todo el inventario.
+    """
+
+    # Campos numéricos con índice ordenado (filtros por rango y ordenamiento)
+    SORTED_FIELDS = ('rx_diff', 'ont_rx', 'olt_rx', 'temperature', 'distance', 'last_down')
+    # Campos con índice de igualdad (valores en minúsculas)
+    EQUALITY_FIELDS = ('estado', 'last_down_cause')
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 1000
+
+    def __init__(self, olt: str = ''):
+        self.olt = olt
+        self._records: Dict[Key, dict] = {}
+        # Valores normalizados por campo (columnas) usados por los índices y filtros
+        self._columns: Dict[str, Dict[Key, object]] = {}
+        self._by_port: Dict[Tuple[int, int], Set[Key]] = {}
+        self._by_tarjeta: Dict[int, Set[Key]] = {}
+        self._equality: Dict[str, Dict[str, Set[Key]]] = {f: {} for f in self.EQUALITY_FIELDS}
+        self._sorted: Dict[str, _SortedIndex] = {f: _SortedIndex() for f in self.SORTED_FIELDS}
+        self._sorted['ont'] = _SortedIndex()  # orden natural tarjeta/puerto/ont
+        self._port_updated: Dict[Tuple[int, int], datetime] = {}
+        self._last_updated: Optional[datetime] = None
+        self._lock = threading.RLock()
+        # Funciones llamadas con (tarjeta, puerto, registros) tras actualizar un puerto
+        self.listeners = []
+        # Índice de búsqueda (SearchIndex) para el filtro de descripción; sin él se recorre
+        self.search_index = None
+
+    @staticmethod
+    def _parse_down_time(value: str) -> Optional[float]:
+        """Convierte "2025-08-31 10:13:30" a timestamp"""
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp() if value else None
+        except ValueError:
+            return None
+
+    def _normalize(self, key: Key, record: dict) -> dict:
+        values = {f: record.get(f) for f in self.SORTED_FIELDS if f != 'last_down'}
+        values['last_down'] = self._parse_down_time(record.get('last_down_time', ''))
+        values['ont'] = key
+        for field in self.EQUALITY_FIELDS:
+            values[field] = (record.get(field) or '').lower()
+        values['descripcion'] = (record.get('descripcion') or '').lower()
+        return values
+
+    def _add(self, key: Key, record: dict):
+        values = self._normalize(key, record)
+        self._records[key] = record
+        for field, value in values.items():
+            self._columns.setdefault(field, {})[key] = value
+        self._by_port.setdefault(key[:2], set()).add(key)
+        self._by_tarjeta.setdefault(key[0], set()).add(key)
+        for field in self.EQUALITY_FIELDS:
+            self._equality[field].setdefault(values[field], set()).add(key)
+        for field, index in self._sorted.items():
+            index.add(values[field], key)
+
+    def _remove(self, key: Key):
+        del self._records[key]
+        values = {field: column.pop(key) for field, column in self._columns.items()}
+        self._by_port[key[:2]].discard(key)
+        self._by_tarjeta[key[0]].discard(key)
+        for field in self.EQUALITY_FIELDS:
+            self._equality[field].get(values[field], set()).discard(key)
+        for field, index in self._sorted.items():
+            index.remove(values[field], key)
+
+    def update_port(self, tarjeta: str, puerto: str, collection):
+        """Reemplaza las ONTs de un puerto con el resultado de una consulta al OLT"""
+        if getattr(collection, 'stale', False):
+            return
+        records = [{**ont.to_dict(), 'olt': self.olt} for ont in collection.onts]
+        port = (int(tarjeta), int(puerto))
+
+        with self._lock:
+            for key in list(self._by_port.get(port, ())):
+                self._remove(key)
+            for record in records:
+                self._add((port[0], port[1], int(record['id'])), record)
+            self._port_updated[port] = self._last_updated = datetime.now()
+
+        for listener in self.listeners:
+            try:
+                listener(tarjeta, puerto, records)
+            except Exception as e:
+                logger.warning(f"Error notificando actualización de {tarjeta}/{puerto}: {e}")
+
+    def update_ont(self, tarjeta, puerto, ont_id, cambios: dict) -> Optional[dict]:
+        """
+        Aplica cambios a una sola ONT (ej. un evento de caída) sin consultar el OLT.
+        Retorna el registro anterior, o None si la ONT no está en el inventario.
+        """
+        key = (int(tarjeta), int(puerto), int(ont_id))
+        with self._lock:
+            anterior = self._records.get(key)
+            if anterior is None:
+                return None
+            record = {**anterior, **cambios}
+            if 'estado' in cambios:
+                record['is_online'] = record['estado'].lower() == 'online'
+            if 'ont_rx' in cambios or 'olt_rx' in cambios:
+                record['rx_diff'] = (round(record['olt_rx'] - record['ont_rx'], 2)
+                                     if record.get('ont_rx') is not None and record.get('olt_rx') is not None
+                                     else None)
+                record['has_critical_rx_diff'] = record['rx_diff'] is not None and record['rx_diff'] < -5.00
+            self._remove(key)
+            self._add(key, record)
+            self._last_updated = datetime.now()
+            records = [self._records[k] for k in self._by_port[key[:2]]]
+
+        for listener in self.listeners:
+            try:
+                listener(str(tarjeta), str(puerto), records)
+            except Exception as e:
+                logger.warning(f"Error notificando actualización de {tarjeta}/{puerto}: {e}")
+        return anterior
+
+    def get(self, tarjeta, puerto, ont_id) -> Optional[dict]:
+        """Registro de una ONT, o None si no está en el inventario"""
+        return self._records.get((int(tarjeta), int(puerto), int(ont_id)))
+
+    def records(self) -> List[dict]:
+        """Copia de todos los registros (para reconstruir índices derivados)"""
+        with self._lock:
+            return list(self._records.values())
+
+    @staticmethod
+    def _number(value) -> Optional[float]:
+        return None if value in (None, '') else float(value)
+
+    def _candidates(self, filters: dict, sort_field: Optional[str] = None
+                    ) -> Tuple[Optional[Set[Key]], Optional[Tuple[int, int]]]:
+        """
+        Claves que cumplen los filtros (None = sin restricción) y posiciones [inicio, fin)
+        del rango pedido sobre `sort_field`, si hay uno. Se parte del índice más selectivo
+        y el resto de condiciones se verifican sobre esos candidatos. Si el único filtro es
+        un rango sobre `sort_field` no se arma el conjunto: basta con recorrer ese tramo.
+        El conjunto retornado puede ser el de un índice: es de solo lectura.
+        """
+        sets: List[Set[Key]] = []
+        ranges = []  # (campo, lo, hi, inicio, fin)
+
+        if filters.get('tarjeta') not in (None, ''):
+            tarjeta = int(filters['tarjeta'])
+            if filters.get('puerto') not in (None, ''):
+                sets.append(self._by_port.get((tarjeta, int(filters['puerto'])), set()))
+            else:
+                sets.append(self._by_tarjeta.get(tarjeta, set()))
+
+        for field, param in (('estado', 'estado'), ('last_down_cause', 'causa')):
+            if filters.get(param):
+                index = self._equality[field]
+                values = {v.strip().lower() for v in str(filters[param]).split(',')}
+                sets.append(index.get(values.pop(), set()) if len(values) == 1
+                            else set().union(*(index.get(v, set()) for v in values)))
+
+        for field in ('rx_diff', 'ont_rx', 'olt_rx', 'temperature', 'distance'):
+            lo, hi = self._number(filters.get(f'{field}_min')), self._number(filters.get(f'{field}_max'))
+            if lo is not None or hi is not None:
+                ranges.append((field, lo, hi, *self._sorted[field].bounds(lo, hi)))
+
+        if filters.get('down_within') not in (None, ''):
+            lo = time.time() - float(filters['down_within'])
+            ranges.append(('last_down', lo, None, *self._sorted['last_down'].bounds(lo)))
+
+        span = next(((start, end) for field, _, _, start, end in ranges if field == sort_field), None)
+        if not sets and not ranges:
+            return None, None
+        if not sets and len(ranges) == 1 and span is not None:
+            return None, span
+
+        # Índice base: el de menos claves; el resto se verifica sobre sus claves
+        sets.sort(key=len)
+        ranges.sort(key=lambda r: r[4] - r[3])
+        if ranges and (not sets or ranges[0][4] - ranges[0][3] < len(sets[0])):
+            field, _, _, start, end = ranges.pop(0)
+            result = {key for _, key in self._sorted[field].items[start:end]}
+            for other in sets:
+                result &= other
+        else:
+            result = sets[0]
+            for other in sets[1:]:
+                result = result & other
+
+        for field, lo, hi, _, _ in ranges:
+            column = self._columns[field]
+            lo = float('-inf') if lo is None else lo
+            hi = float('inf') if hi is None else hi
+            result = {key for key in result if (v := column[key]) is not None and lo <= v < hi}
+        return result, span
+
+    def _ordered(self, field: str, descending: bool, candidates: Optional[Set[Key]],
+                 cursor: Optional[list], limit: int, span: Optional[Tuple[int, int]] = None) -> Iterator[Key]:
+        """
+        Recorre las claves en el orden pedido a partir del cursor [sin_valor, valor, clave].
+        Con `span` (rango filtrado sobre el mismo campo) solo se recorre ese tramo del índice.
+        """
+        index = self._sorted[field]
+        items = index.items
+        start, end = span if span is not None else (0, len(items))
+        inicio = end - 1 if descending else start  # primera posición del recorrido sin cursor
+        if span is not None:
+            missing = set()  # los filtros por rango excluyen las claves sin valor
+        elif candidates is not None:
+            missing = index.missing & candidates
+        else:
+            missing = index.missing
+
+        after = None
+        if cursor is not None and cursor[0] == 0:
+            value = tuple(cursor[1]) if field == 'ont' else cursor[1]
+            pivot = (value, tuple(cursor[2]))
+            if descending:
+                end = max(start, min(end, bisect_left(items, pivot)))
+            else:
+                start = min(end, max(start, bisect_right(items, pivot)))
+        elif cursor is not None:
+            start = end  # el cursor ya está entre las claves sin valor
+            after = tuple(cursor[2])
+
+        positions = range(end - 1, start - 1, -1) if descending else range(start, end)
+        if candidates is None:
+            for i in positions:
+                yield items[i][1]
+        elif positions:
+            # Recorrer el índice cuesta ~ limit * tramo / candidatos posiciones y seleccionar
+            # entre los candidatos ~ candidatos; si el recorrido supera ese presupuesto (valores
+            # concentrados lejos del inicio) se seleccionan los que faltan entre los candidatos.
+            needed = limit + 1
+            budget = len(candidates)
+            if needed * len(positions) <= budget * budget:
+                for steps, i in enumerate(positions):
+                    if steps == budget:
+                        positions = range(i, start - 1, -1) if descending else range(i, end)
+                        break
+                    key = items[i][1]
+                    if key in candidates:
+                        yield key
+                        needed -= 1
+                        if needed == 0:
+                            return
+                else:
+                    positions = range(0)
+            if positions:
+                # Los candidatos ya cumplen el rango de `span`: solo se descartan los anteriores
+                # al cursor o a lo ya recorrido
+                column = self._columns[field]
+                pending = ((v, key) for key in candidates if (v := column[key]) is not None)
+                if positions[0] != inicio:
+                    first = items[positions[0]]
+                    pending = (item for item in pending if (item <= first if descending else item >= first))
+                select = heapq.nlargest if descending else heapq.nsmallest
+                for _, key in select(needed, pending):
+                    yield key
+
+        for key in sorted(missing, reverse=descending):
+            if after is None or (key < after if descending else key > after):
+                yield key
+
+    def _rank(self, field: str, key: Key) -> list:
+        value = self._columns[field][key]
+        return [1, None, key] if value is None else [0, value, key]
+
+    @staticmethod
+    def _encode_cursor(rank: list) -> str:
+        return base64.urlsafe_b64encode(json.dumps(rank).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> list:
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception:
+            raise ValueError("Cursor inválido")
+
+    def query(self, filters: Optional[dict] = None, sort: str = 'ont', limit: int = DEFAULT_LIMIT,
+              cursor: Optional[str] = None) -> dict:
+        """
+        Consulta paginada del inventario
+        Args:
+            filters: tarjeta, puerto, estado, causa (listas separadas por coma), <campo>_min (incluido)
+                     y <campo>_max (excluido) para rx_diff, ont_rx, olt_rx, temperature y distance,
+                     descripcion (subcadena) y down_within (segundos desde la última caída)
+            sort: campo de ordenamiento ('ont' o uno de SORTED_FIELDS); prefijo '-' para descendente
+            limit: tamaño de página (máximo MAX_LIMIT)
+            cursor: valor de next_cursor de la página anterior (con el mismo sort)
+        Returns:
+            Dict con la página, el total de coincidencias y el cursor de la siguiente página
+        """
+        t0 = time.perf_counter()
+        filters = filters or {}
+        descending = sort.startswith('-')
+        field = sort.lstrip('-') or 'ont'
+        if field not in self._sorted:
+            raise ValueError(f"No se puede ordenar por '{field}'")
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+        rank_cursor = self._decode_cursor(cursor) if cursor else None
+        texto = (filters.get('descripcion') or '').strip().lower()
+
+        with self._lock:
+            candidates, span = self._candidates(filters, None if texto else field)
+            # El índice resuelve por trigramas; con menos de 3 caracteres solo busca prefijos,
+            # así que los textos cortos se buscan como subcadena en la columna
+            if len(texto) >= 3 and self.search_index is not None:
+                keys = self.search_index.search_keys(texto, 'descripcion')
+                candidates = keys if candidates is None else candidates & keys
+            elif texto:
+                column = self._columns.get('descripcion', {})
+                pool = column.keys() if candidates is None else candidates
+                candidates = {k for k in pool if texto in column[k]}
+
+            page: List[Key] = []
+            has_more = False
+            for key in self._ordered(field, descending, candidates, rank_cursor, limit, span):
+                if len(page) == limit:
+                    has_more = True
+                    break
+                page.append(key)
+
+            if candidates is not None:
+                total = len(candidates)
+            else:
+                total = len(self._records) if span is None else span[1] - span[0]
+            return {
+                'data': [self._records[key] for key in page],
+                'count': len(page),
+                'total': total,
+                'next_cursor': self._encode_cursor(self._rank(field, page[-1])) if has_more else None,
+                'last_updated': self._last_updated.isoformat() if self._last_updated else None,
+                'took_ms': round((time.perf_counter() - t0) * 1000, 3)
+            }
+
+    def stats(self) -> dict:
+        """Tamaño del inventario y cobertura de puertos"""
+        with self._lock:
+            return {
+                'olt': self.olt,
+                'total_onts': len(self._records),
+                'puertos': len(self._port_updated),
+                'last_updated': self._last_updated.isoformat() if self._last_updated else None
+            }
+
+
+class InventoryPoller:
+    """Recorre periódicamente todos los puertos del chasis para mantener el inventario al día"""
+
+    def __init__(self, board_service, ont_service, interval: float = 900):
+        self.board_service = board_service
+        self.ont_service = ont_service
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia el hilo de sondeo si no está corriendo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="inventory-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"Poller de inventario iniciado (intervalo {self.interval}s)")
+
+    def stop(self):
+        """Detiene el hilo de sondeo"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with prioridad(BACKGROUND):
+                    self.poll_once()
+            except Exception as e:
+                logger.warning(f"Error en sondeo de inventario: {e}")
+            self._stop.wait(self.interval)
+
+    def poll_once(self) -> int:
+        """Consulta todos los puertos con ONTs; ONTService notifica cada resultado al inventario"""
+        chasis = self.board_service.obtener_chasis()
+        puertos = [(t['tarjeta'], p['puerto']) for t in chasis['tarjetas']
+                   for p in t['puertos'] if p['total_onts'] > 0]
+
+        consultados = 0
+        for tarjeta, puerto in puertos:
+            if self._stop.is_set():
+                break
+            try:
+                self.ont_service.obtener_onts(tarjeta, puerto)
+                consultados += 1
+            except DeviceSaturatedError as e:
+                # OLT saturado: se deja el resto de los puertos para el próximo recorrido
+                logger.info(f"Inventario: recorrido diferido, {e}")
+                break
+            except Exception as e:
+                logger.warning(f"Inventario: error consultando {tarjeta}/{puerto}: {e}")
+
+        logger.info(f"Inventario: {consultados}/{len(puertos)} puertos actualizados")
+        return consultados
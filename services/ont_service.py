@@ -1,20 +1,106 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+from datetime import datetime
+import copy
 import logging
-from models.ont_model import ONT, ONTCollection
-from services.connection_service import ConnectionService
+import re
+import time
+from models.ont_model import ONT, ONTCollection, ONTDetalle
+from services.cache import TTLCache
+from services.connection_service import ConnectionService, DeviceUnavailableError, sesion_exclusiva
+from services.log_pipeline import campos, capturar_salida
 
 logger = logging.getLogger(__name__)
 
+
+class ONTNoEncontradaError(ValueError):
+    """La ONT consultada no existe en el puerto indicado"""
+
 class ONTService:
     """Servicio para operaciones con ONTs"""
     
-    def __init__(self, connection_service: ConnectionService):
+    def __init__(self, connection_service: ConnectionService, cache: Optional[TTLCache] = None,
+                 last_good_ttl: float = 3600, detail_ttl: float = 15, data_source=None):
         self.connection_service = connection_service
+        self.cache = cache or TTLCache()
+        self.last_good_ttl = last_good_ttl
+        self.detail_ttl = detail_ttl
+        # Fuente alternativa al CLI para las tablas de estado y ópticas (ej. SNMPDataSource)
+        self.data_source = data_source
+        # Funciones llamadas con (tarjeta, puerto, collection) tras cada consulta exitosa
+        self.listeners = []
     
     def obtener_onts(self, tarjeta: str, puerto: str) -> ONTCollection:
-        """Obtiene información de ONTs para un puerto específico"""
+        """
+        Obtiene información de ONTs para un puerto específico. Si el OLT no está
+        disponible se retorna la última consulta exitosa marcada como stale.
+        """
+        key = ('onts', tarjeta, puerto)
         try:
-            logger.info(f"Iniciando consulta de ONTs para tarjeta {tarjeta}, puerto {puerto}")
+            if self.data_source is not None:
+                collection = self._coleccion(self.data_source.onts_puerto(tarjeta, puerto))
+            else:
+                collection = self._consultar_onts(tarjeta, puerto)
+            self.cache.set(key, collection, ttl=self.last_good_ttl)
+            self._notificar(tarjeta, puerto, collection)
+            return collection
+        except DeviceUnavailableError:
+            stale = self.cache.get_stale(key)
+            if stale is None:
+                raise
+            cached, age = stale
+            collection = copy.copy(cached)
+            collection.stale = True
+            collection.stale_age_s = round(age)
+            logger.warning(f"OLT no disponible, sirviendo ONTs de {tarjeta}/{puerto} de hace {age:.0f}s")
+            return collection
+    
+    def obtener_onts_tarjeta(self, tarjeta: str, puertos: List[str]) -> Dict[str, ONTCollection]:
+        """
+        Obtiene las ONTs de varios puertos de una tarjeta. Con una fuente de datos que
+        recorre tarjetas completas (SNMP) se hace una sola consulta; con el CLI, una por puerto.
+        """
+        if self.data_source is None:
+            return {puerto: self.obtener_onts(tarjeta, puerto) for puerto in puertos}
+
+        try:
+            por_puerto = self.data_source.onts_tarjeta(tarjeta)
+        except DeviceUnavailableError:
+            # Cada puerto cae a su última copia buena
+            return {puerto: self.obtener_onts(tarjeta, puerto) for puerto in puertos}
+
+        resultado = {}
+        for puerto in puertos:
+            collection = self._coleccion(por_puerto.get(str(int(puerto)), {}))
+            self.cache.set(('onts', tarjeta, puerto), collection, ttl=self.last_good_ttl)
+            self._notificar(tarjeta, puerto, collection)
+            resultado[puerto] = collection
+        return resultado
+    
+    @staticmethod
+    def _coleccion(onts_data: Dict[str, dict]) -> ONTCollection:
+        """Crea la colección a partir de los diccionarios de los parsers (o de la fuente de datos)"""
+        return ONTCollection([ONT(**ont_data) for ont_data in onts_data.values()])
+    
+    def con_sesion(self, connection_service: ConnectionService) -> "ONTService":
+        """Copia del servicio que consulta por otra sesión del pool (misma caché y listeners)"""
+        service = copy.copy(self)
+        service.connection_service = connection_service
+        return service
+
+    def _notificar(self, tarjeta: str, puerto: str, collection: ONTCollection):
+        """Entrega el resultado de una consulta a los listeners (inventario)"""
+        for listener in self.listeners:
+            try:
+                listener(tarjeta, puerto, collection)
+            except Exception as e:
+                logger.warning(f"Error notificando ONTs de {tarjeta}/{puerto}: {e}")
+    
+    @sesion_exclusiva
+    def _consultar_onts(self, tarjeta: str, puerto: str) -> ONTCollection:
+        """Consulta en el OLT las ONTs de un puerto"""
+        try:
+            inicio = time.monotonic()
+            logger.debug(f"Iniciando consulta de ONTs para tarjeta {tarjeta}, puerto {puerto}")
             
             # Entrar a la interfaz GPON
             self.connection_service.enter_interface(tarjeta)
@@ -31,20 +117,17 @@ class ONTService:
             # IMPORTANTE: Salir de la interfaz después de la consulta
             self.connection_service.exit_interface()
             
-            # Debug
-            logger.debug(f"Output Summary: {output_summary}")
-            logger.debug(f"Output Optical: {output_optical}")
+            capturar_salida(f"display ont info summary {puerto}", output_summary, tarjeta=tarjeta, puerto=puerto)
+            capturar_salida(f"display ont optical-info {puerto} all", output_optical, tarjeta=tarjeta, puerto=puerto)
             
             # Parsear datos
             onts_data = self._parse_ont_data(output_summary, output_optical, tarjeta, puerto)
             
             # Crear colección
-            collection = ONTCollection()
-            for ont_data in onts_data.values():
-                ont = ONT(**ont_data)
-                collection.add_ont(ont)
+            collection = self._coleccion(onts_data)
             
-            logger.info(f"Se procesaron {collection.get_total_count()} ONTs. Contexto actual: {self.connection_service.get_current_context()}")
+            logger.info(f"Se procesaron {collection.get_total_count()} ONTs",
+                        extra=campos(tarjeta=tarjeta, puerto=puerto, inicio=inicio))
             return collection
             
         except Exception as e:
@@ -56,10 +139,12 @@ class ONTService:
                 pass
             raise
 
+    @sesion_exclusiva
     def obtener_tarjeta(self, tarjeta: str, puerto: str) -> ONTCollection:
         """Obtiene información de ONTs para un puerto específico"""
         try:
-            logger.info(f"Iniciando consulta de ONTs para tarjeta {tarjeta}, puerto {puerto}")
+            inicio = time.monotonic()
+            logger.debug(f"Iniciando consulta de ONTs para tarjeta {tarjeta}, puerto {puerto}")
             
             # Entrar a la interfaz GPON
             self.connection_service.enter_interface(tarjeta)
@@ -76,9 +161,8 @@ class ONTService:
             # IMPORTANTE: Salir de la interfaz después de la consulta
             self.connection_service.exit_interface()
             
-            # Debug
-            logger.debug(f"Output Summary: {output_summary}")
-            logger.debug(f"Output Optical: {output_optical}")
+            capturar_salida(f"display ont info summary {puerto}", output_summary, tarjeta=tarjeta, puerto=puerto)
+            capturar_salida(f"display ont optical-info {puerto} all", output_optical, tarjeta=tarjeta, puerto=puerto)
             
             # Parsear datos
             onts_data = self._parse_ont_data(output_summary, output_optical, tarjeta, puerto)
@@ -89,7 +173,8 @@ class ONTService:
                 ont = ONT(**ont_data)
                 collection.add_ont(ont)
             
-            logger.info(f"Se procesaron {collection.get_total_count()} ONTs. Contexto actual: {self.connection_service.get_current_context()}")
+            logger.info(f"Se procesaron {collection.get_total_count()} ONTs",
+                        extra=campos(tarjeta=tarjeta, puerto=puerto, inicio=inicio))
             return collection
             
         except Exception as e:
@@ -101,10 +186,12 @@ class ONTService:
                 pass
             raise
     
+    @sesion_exclusiva
     def obtener_autofind_onts(self) -> List[Dict[str, str]]:
         """Obtiene información de ONTs detectadas automáticamente (autofind)"""
         try:
-            logger.info("Iniciando consulta de autofind ONTs")
+            inicio = time.monotonic()
+            logger.debug("Iniciando consulta de autofind ONTs")
             
             # Asegurar que estamos en modo config global antes del comando autofind
             self.connection_service.ensure_config_mode()
@@ -112,12 +199,12 @@ class ONTService:
             # Ejecutar comando autofind usando el método para comandos globales
             output_autofind = self.connection_service.execute_global_command("display ont autofind all")
             
-            logger.debug(f"Output Autofind: {output_autofind}")
+            capturar_salida("display ont autofind all", output_autofind)
             
             # Parsear datos
             autofind_onts = self._parse_autofind_data(output_autofind)
             
-            logger.info(f"Se encontraron {len(autofind_onts)} ONTs en autofind. Contexto actual: {self.connection_service.get_current_context()}")
+            logger.info(f"Se encontraron {len(autofind_onts)} ONTs en autofind", extra=campos(inicio=inicio))
             return autofind_onts
             
         except Exception as e:
@@ -129,6 +216,171 @@ class ONTService:
                 pass
             raise
     
+    def obtener_detalle(self, tarjeta: str, puerto: str, ont_id: str, force: bool = False) -> ONTDetalle:
+        """
+        Obtiene el detalle de una sola ONT con comandos dirigidos (sin recorrer el puerto).
+        El resultado se guarda en caché `detail_ttl` segundos; si el OLT no está disponible
+        se retorna la última consulta exitosa marcada como stale.
+        """
+        key = ('ont_detalle', tarjeta, puerto, ont_id)
+        last_good_key = ('ont_detalle', 'last_good', tarjeta, puerto, ont_id)
+        if force:
+            self.cache.invalidate(key)
+        try:
+            detalle = self.cache.get_or_load(
+                key, lambda: self._consultar_detalle(tarjeta, puerto, ont_id), ttl=self.detail_ttl
+            )
+            self.cache.set(last_good_key, detalle, ttl=self.last_good_ttl)
+            return detalle
+        except DeviceUnavailableError:
+            stale = self.cache.get_stale(last_good_key)
+            if stale is None:
+                raise
+            cached, age = stale
+            detalle = copy.copy(cached)
+            detalle.stale = True
+            detalle.stale_age_s = round(age)
+            logger.warning(f"OLT no disponible, sirviendo ONT {tarjeta}/{puerto}/{ont_id} de hace {age:.0f}s")
+            return detalle
+    
+    @sesion_exclusiva
+    def _consultar_detalle(self, tarjeta: str, puerto: str, ont_id: str) -> ONTDetalle:
+        """Consulta en el OLT la información, potencia óptica, historial y WAN de una ONT"""
+        try:
+            inicio = time.monotonic()
+            logger.debug(f"Consultando detalle de ONT {tarjeta}/{puerto}/{ont_id}")
+            self.connection_service.enter_interface(tarjeta)
+            
+            output_info = self.connection_service.execute_command(f"display ont info {puerto} {ont_id}")
+            if 'Failure' in output_info:
+                raise ONTNoEncontradaError(f"ONT {tarjeta}/{puerto}/{ont_id} no encontrada")
+            
+            # Secciones opcionales: un error en una de ellas no invalida el detalle
+            opcionales, errores = {}, {}
+            for nombre, comando in (('optical', f"display ont optical-info {puerto} {ont_id}"),
+                                    ('register', f"display ont register-info {puerto} {ont_id}"),
+                                    ('wan', f"display ont wan-info {puerto} {ont_id}")):
+                try:
+                    output = self.connection_service.execute_command(comando)
+                    if 'Failure' in output or re.search(r'^\s*% ', output, re.MULTILINE):
+                        raise RuntimeError(output.strip().splitlines()[-1])
+                    opcionales[nombre] = output
+                except DeviceUnavailableError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Error en '{comando}': {e}")
+                    errores[comando] = str(e)
+            
+            self.connection_service.exit_interface()
+            
+            capturar_salida(f"display ont info {puerto} {ont_id}", output_info, tarjeta=tarjeta, puerto=puerto)
+            if 'optical' in opcionales:
+                capturar_salida(f"display ont optical-info {puerto} {ont_id}", opcionales['optical'],
+                                tarjeta=tarjeta, puerto=puerto)
+            
+            detalle = self._parse_detalle(output_info, opcionales, tarjeta, puerto, ont_id)
+            detalle.errores = errores
+            logger.info(f"Detalle de ONT {ont_id} consultado",
+                        extra=campos(tarjeta=tarjeta, puerto=puerto, ont=ont_id, inicio=inicio))
+            return detalle
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo detalle de ONT {tarjeta}/{puerto}/{ont_id}: {e}")
+            try:
+                self.connection_service.exit_interface()
+            except:
+                pass
+            raise
+    
+    @staticmethod
+    def _parse_campos(output: str) -> Dict[str, str]:
+        """Parsea líneas "Clave : valor" (se conserva la primera aparición de cada clave)"""
+        campos = {}
+        for line in output.split('\n'):
+            match = re.match(r'^\s*([^:]+?)\s*:\s*(.*?)\s*$', line)
+            if match and not line.strip().startswith('-'):
+                campos.setdefault(match.group(1), match.group(2))
+        return campos
+    
+    def _parse_bloques(self, output: str) -> List[Dict[str, str]]:
+        """Parsea una salida de bloques "Clave : valor" separados por líneas de guiones"""
+        bloques = re.split(r'^\s*-{10,}\s*$', output, flags=re.MULTILINE)
+        return [campos for campos in map(self._parse_campos, bloques) if campos]
+    
+    @staticmethod
+    def _numero(value: Optional[str]) -> Optional[float]:
+        """Primer número de un valor ("45(C)", "-21.36"), o None si no hay ("-")"""
+        match = re.search(r'-?\d+(?:\.\d+)?', value or '')
+        return float(match.group()) if match else None
+    
+    @staticmethod
+    def _fecha(value: Optional[str]) -> str:
+        """Normaliza "2025-08-31 10:13:30+08:00" al formato del summary"""
+        match = re.match(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', value or '')
+        return match.group() if match else ''
+    
+    def _parse_detalle(self, output_info: str, opcionales: Dict[str, str],
+                       tarjeta: str, puerto: str, ont_id: str) -> ONTDetalle:
+        """Combina las salidas de los comandos de una ONT en un ONTDetalle"""
+        info = self._parse_campos(output_info)
+        optical = self._parse_campos(opcionales.get('optical', ''))
+        
+        temperatura = self._numero(optical.get('Temperature(C)') or info.get('Temperature'))
+        distancia = self._numero(info.get('Distance(m)'))
+        causa = info.get('Last down cause', '')
+        
+        registros = [{
+            'index': b.get('Index', ''),
+            'up_time': self._fecha(b.get('UpTime')),
+            'down_time': self._fecha(b.get('DownTime')),
+            'down_cause': '' if b.get('DownCause') == '-' else b.get('DownCause', '')
+        } for b in self._parse_bloques(opcionales.get('register', '')) if 'Index' in b]
+        
+        wan = [{
+            'nombre': b.get('Name', ''),
+            'tipo_servicio': b.get('Service type', ''),
+            'tipo_conexion': b.get('Connection type', ''),
+            'estado': b.get('IPv4 Connection status', ''),
+            'ipv4': b.get('IPv4 address', ''),
+            'mascara': b.get('Subnet mask', ''),
+            'gateway': b.get('Default gateway', ''),
+            'vlan': b.get('Manage VLAN', ''),
+            'mac': b.get('MAC address', '')
+        } for b in self._parse_bloques(opcionales.get('wan', '')) if 'Name' in b]
+        
+        return ONTDetalle(
+            id=str(ont_id),
+            tarjeta=tarjeta,
+            puerto=puerto,
+            ont_rx=self._numero(optical.get('Rx optical power(dBm)')),
+            olt_rx=self._numero(optical.get('OLT Rx ONT optical power(dBm)')),
+            temperature=int(temperatura) if temperatura is not None else None,
+            distance=int(distancia) if distancia is not None else None,
+            estado=info.get('Run state', ''),
+            last_down_time=self._fecha(info.get('Last down time')),
+            last_down_cause='' if causa == '-' else causa,
+            descripcion=info.get('Description', ''),
+            sn=info.get('SN', '').split('(')[0].strip(),
+            control_flag=info.get('Control flag', ''),
+            config_state=info.get('Config state', ''),
+            match_state=info.get('Match state', ''),
+            equipment_id=info.get('Equipment-ID', ''),
+            line_profile=info.get('Line profile name') or info.get('Line profile ID', ''),
+            service_profile=info.get('Service profile name') or info.get('Service profile ID', ''),
+            cpu_occupation=info.get('CPU occupation', ''),
+            memory_occupation=info.get('Memory occupation', ''),
+            last_up_time=self._fecha(info.get('Last up time')),
+            last_dying_gasp_time=self._fecha(info.get('Last dying gasp time')),
+            online_duration=info.get('ONT online duration', ''),
+            tx_power=self._numero(optical.get('Tx optical power(dBm)')),
+            voltage=self._numero(optical.get('Voltage(V)')),
+            bias_current=self._numero(optical.get('Laser bias current(mA)')),
+            catv_rx=self._numero(optical.get('CATV Rx optical power(dBm)')),
+            registros=registros,
+            wan=wan,
+            consultado=datetime.now().isoformat()
+        )
+    
     def _parse_autofind_data(self, output_autofind: str) -> List[Dict[str, str]]:
         """Parsea la información del comando display ont autofind all (formato de bloques)"""
         autofind_onts = []
@@ -296,6 +548,8 @@ class ONTService:
                 if len(parts) >= 6 and parts[0].isdigit():
                     ont_id = parts[0]
                     if ont_id in onts:
+                        onts[ont_id]['sn'] = parts[1]
+                        
                         # Buscar donde termina la parte numérica y empieza la descripción
                         desc_parts = []
                         found_desc_start = False
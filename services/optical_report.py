@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from statistics import mean
+from typing import Dict, List, Optional, Tuple
+
+from models.ont_model import ONT, ONTCollection
+from services.command_scheduler import BULK, prioridad, propagar_prioridad
+
+logger = logging.getLogger(__name__)
+
+# Rangos de potencia recibida por la ONT (dBm) para la distribución del resumen
+RX_RANGOS: List[Tuple[str, float, float]] = [
+    ('> -20', -20, float('inf')),
+    ('-20 a -25', -25, -20),
+    ('-25 a -27', -27, -25),
+    ('< -27', float('-inf'), -27),
+]
+
+
+class OpticalReportService:
+    """
+    Reporte óptico de todo el chasis: una hoja por tarjeta y una hoja de resumen por
+    puerto (distribución de RX y ONTs con diferencia RX crítica). Cada tarjeta terminada
+    se guarda de inmediato en el directorio del día, así un reporte que falla a medias se
+    reanuda consultando solo las tarjetas que faltan.
+    """
+
+    PUERTOS = 16
+
+    def __init__(self, board_service, ont_service, pool, excel_service, directorio: str,
+                 concurrencia: int = 2, tarjetas: Optional[List[str]] = None):
+        self.board_service = board_service
+        self.ont_service = ont_service
+        self.pool = pool
+        self.excel_service = excel_service
+        self.directorio = directorio
+        self.concurrencia = concurrencia
+        self.tarjetas = tarjetas
+
+    def _puertos_por_tarjeta(self, tarjetas: Optional[List[str]]) -> Dict[str, List[str]]:
+        """Tarjetas a recorrer y sus puertos con ONTs (todos si no se conoce el chasis)"""
+        chasis = self.board_service.obtener_chasis() if self.board_service is not None else None
+        conocidos = {t['tarjeta']: [p['puerto'] for p in t['puertos'] if p['total_onts'] > 0]
+                     for t in (chasis or {}).get('tarjetas', [])}
+        todos = [str(p) for p in range(self.PUERTOS)]
+        if tarjetas is None:
+            if not conocidos:
+                raise ValueError("No se pudo obtener la lista de tarjetas del chasis")
+            tarjetas = list(conocidos)
+        return {t: conocidos.get(t, todos) for t in tarjetas}
+
+    def _archivo_tarjeta(self, carpeta: str, tarjeta: str) -> str:
+        return os.path.join(carpeta, f"tarjeta_{tarjeta}.json")
+
+    def generar(self, job, params: Dict) -> str:
+        """Genera (o reanuda) el reporte del día `params['fecha']` (runner 'reporte_optico')"""
+        fecha = params.get('fecha') or date.today().isoformat()
+        carpeta = os.path.join(self.directorio, fecha)
+        os.makedirs(carpeta, exist_ok=True)
+
+        puertos = self._puertos_por_tarjeta(params.get('tarjetas') or self.tarjetas)
+        job.definir_pasos(list(puertos))
+
+        colecciones: Dict[str, ONTCollection] = {}
+        pendientes = []
+        for tarjeta in puertos:
+            guardada = self._cargar_tarjeta(carpeta, tarjeta)
+            if guardada is not None:
+                colecciones[tarjeta] = guardada
+                job.avanzar(tarjeta, 'ok', f"{guardada.get_total_count()} ONTs (reanudada)")
+            else:
+                pendientes.append(tarjeta)
+
+        fallidas: Dict[str, str] = {}
+
+        @propagar_prioridad
+        def consultar(tarjeta: str) -> ONTCollection:
+            with self.pool.acquire() as conn:
+                return self._consultar_tarjeta(self.ont_service.con_sesion(conn), tarjeta, puertos[tarjeta])
+
+        with prioridad(BULK), ThreadPoolExecutor(max_workers=max(self.concurrencia, 1)) as executor:
+            futures = {tarjeta: executor.submit(consultar, tarjeta) for tarjeta in pendientes}
+            for tarjeta, future in futures.items():
+                try:
+                    coleccion = future.result()
+                    self._guardar_tarjeta(carpeta, tarjeta, coleccion)
+                    colecciones[tarjeta] = coleccion
+                    job.avanzar(tarjeta, 'ok', f"{coleccion.get_total_count()} ONTs")
+                except Exception as e:
+                    logger.warning(f"Reporte óptico: tarjeta {tarjeta} falló: {e}")
+                    fallidas[tarjeta] = str(e)
+                    job.avanzar(tarjeta, 'error', str(e))
+
+        if not colecciones:
+            raise RuntimeError(f"Ninguna tarjeta se pudo consultar: {fallidas}")
+
+        colecciones = {t: colecciones[t] for t in puertos if t in colecciones}
+        file_stream = self.excel_service.generar_reporte_optico(
+            colecciones, self.resumen(colecciones), [r[0] for r in RX_RANGOS], fallidas
+        )
+        ruta = os.path.join(self.directorio, f"Reporte_Optico_{fecha}.xlsx")
+        tmp = ruta + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(file_stream.getbuffer())
+        os.replace(tmp, ruta)
+
+        if fallidas:
+            logger.warning(f"Reporte óptico {fecha} incompleto, tarjetas con error: {sorted(fallidas)}")
+        logger.info(f"Reporte óptico {fecha}: {len(colecciones)} tarjetas en {ruta}")
+        return ruta
+
+    def _consultar_tarjeta(self, ont_service, tarjeta: str, puertos: List[str]) -> ONTCollection:
+        """Consulta los puertos de una tarjeta; cualquier error hace fallar la tarjeta completa"""
+        coleccion = ONTCollection()
+        for puerto in puertos:
+            parcial = ont_service.obtener_onts(tarjeta, puerto)
+            if parcial.stale:
+                # No se guarda como terminada una tarjeta con datos viejos
+                raise RuntimeError(f"OLT no disponible (puerto {tarjeta}/{puerto})")
+            coleccion.extend(parcial)
+        return coleccion
+
+    def _guardar_tarjeta(self, carpeta: str, tarjeta: str, coleccion: ONTCollection):
+        """Guarda el resultado de una tarjeta (escritura atómica)"""
+        ruta = self._archivo_tarjeta(carpeta, tarjeta)
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'tarjeta': tarjeta, 'consultado': datetime.now().isoformat(),
+                       'onts': coleccion.to_dict_list()}, f)
+        os.replace(ruta + '.tmp', ruta)
+
+    def _cargar_tarjeta(self, carpeta: str, tarjeta: str) -> Optional[ONTCollection]:
+        """Resultado guardado de una tarjeta en una ejecución anterior del mismo día"""
+        try:
+            with open(self._archivo_tarjeta(carpeta, tarjeta), encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Reporte óptico: resultado guardado de tarjeta {tarjeta} ilegible: {e}")
+            return None
+        return ONTCollection([ONT.from_dict(o) for o in data['onts']])
+
+    @staticmethod
+    def resumen(colecciones: Dict[str, ONTCollection]) -> List[dict]:
+        """Una fila por puerto con totales, ONTs críticas y distribución de RX"""
+        filas = []
+        for tarjeta, coleccion in colecciones.items():
+            por_puerto: Dict[str, List[ONT]] = {}
+            for ont in coleccion.onts:
+                por_puerto.setdefault(ont.puerto, []).append(ont)
+            for puerto in sorted(por_puerto, key=int):
+                onts = por_puerto[puerto]
+                rx = [o.ont_rx for o in onts if o.ont_rx is not None]
+                filas.append({
+                    'tarjeta': tarjeta,
+                    'puerto': puerto,
+                    'total': len(onts),
+                    'online': sum(1 for o in onts if o.is_online()),
+                    'criticas': sum(1 for o in onts if o.has_critical_rx_diff()),
+                    'rx_min': min(rx) if rx else None,
+                    'rx_promedio': round(mean(rx), 2) if rx else None,
+                    'rx_max': max(rx) if rx else None,
+                    'rangos': [sum(1 for v in rx if bajo <= v < alto) for _, bajo, alto in RX_RANGOS]
+                })
+        return filas
+
+
+class ReportScheduler:
+    """Encola el reporte óptico todos los días a la hora configurada (HH:MM, hora local)"""
+
+    def __init__(self, job_manager, hora: str = "02:00"):
+        self.job_manager = job_manager
+        self.hora, self.minuto = (int(x) for x in hora.split(':'))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia el hilo del scheduler si no está corriendo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="report-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Reporte óptico programado a las {self.hora:02d}:{self.minuto:02d}")
+
+    def stop(self):
+        """Detiene el hilo del scheduler"""
+        self._stop.set()
+
+    def proxima_ejecucion(self, ahora: Optional[datetime] = None) -> datetime:
+        ahora = ahora or datetime.now()
+        proxima = ahora.replace(hour=self.hora, minute=self.minuto, second=0, microsecond=0)
+        return proxima if proxima > ahora else proxima + timedelta(days=1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            proxima = self.proxima_ejecucion()
+            if self._stop.wait((proxima - datetime.now()).total_seconds()):
+                break
+            try:
+                self.job_manager.submit('reporte_optico', {'fecha': proxima.date().isoformat()})
+            except Exception as e:
+                logger.error(f"No se pudo encolar el reporte óptico: {e}")
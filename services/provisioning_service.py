@@ -0,0 +1,292 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from services.command_scheduler import propagar_prioridad
+from services.connection_service import ConnectionPool, ConnectionService
+
+logger = logging.getLogger(__name__)
+
+# Respuesta de "ont add": "Number of ONTs that can be added: 1, success: 1 ... ONTID :5"
+ONT_ID_PATTERN = re.compile(r'ONTID\s*:\s*(\d+)')
+# Prompt de parámetros opcionales del CLI Huawei: "{ <cr>|desc<K>|... }:"
+PARAM_PROMPT = r'\}:\s*$'
+
+# Los valores terminan dentro de comandos CLI: solo se aceptan estos parámetros, como
+# enteros acotados, y textos sin saltos de línea, comillas, '?' (ayuda del CLI) ni '#' (fin
+# de la lectura de la respuesta). Los patrones se usan con fullmatch.
+PARAMS_ENTEROS = {
+    'line_profile_id': (0, 8191),
+    'srv_profile_id': (0, 8191),
+    'vlan': (1, 4094),
+    'user_vlan': (1, 4094),
+    'gemport': (0, 1023),
+}
+PARAMS_PERMITIDOS = set(PARAMS_ENTEROS) | {'desc'}
+DESC_PATTERN = re.compile(r'[A-Za-z0-9 _.,:/()-]{1,64}')
+SN_HEX_PATTERN = re.compile(r'[0-9A-Fa-f]{16}')
+SN_PATTERN = re.compile(r'([A-Za-z0-9]{4})-?([0-9A-Fa-f]{8})')
+
+
+class ProvisioningService:
+    """
+    Autorización masiva de ONTs a partir de entradas de autofind
+    (salida de ONTService._parse_autofind_block).
+
+    Las ONTs se agrupan por tarjeta: en cada tarjeta se entra una sola vez a la
+    interfaz GPON para todos los "ont add", luego se crean los service-port en modo
+    config y, si alguno falla, se vuelve a entrar una vez para revertir esas ONTs.
+    Cada tarjeta se procesa en una sesión distinta del pool.
+    """
+
+    def __init__(self, pool: ConnectionPool, templates: Dict, defaults: Dict):
+        self.pool = pool
+        self.templates = templates
+        self.defaults = defaults
+
+    def autorizar(self, entries: List[Dict[str, str]], params: Optional[Dict] = None) -> Dict:
+        """
+        Autoriza una lista de ONTs de autofind
+        Args:
+            entries: entradas de autofind (fsp, board, port, sn, sn_hex, ...)
+            params: valores que reemplazan a los de Config.PROVISIONING (perfiles, vlan, desc...)
+        Returns:
+            Dict con el resultado por ONT y el throughput en ONTs por minuto
+        """
+        entries, params = self.validar(entries, params)
+        inicio = time.perf_counter()
+
+        grupos = self._agrupar_por_tarjeta(entries)
+        logger.info(f"Autorizando {len(entries)} ONTs en {len(grupos)} tarjetas")
+
+        resultados = []
+        with ThreadPoolExecutor(max_workers=min(self.pool.size, len(grupos)) or 1) as executor:
+            procesar = propagar_prioridad(self._procesar_tarjeta)
+            futures = [executor.submit(procesar, tarjeta, grupo, params)
+                       for tarjeta, grupo in grupos.items()]
+            for future in futures:
+                resultados.extend(future.result())
+
+        elapsed = time.perf_counter() - inicio
+        exitosas = sum(1 for r in resultados if r['status'] == 'ok')
+        throughput = round(exitosas / (elapsed / 60), 2) if elapsed > 0 else 0.0
+
+        logger.info(f"Autorización terminada: {exitosas}/{len(resultados)} ONTs en {elapsed:.1f}s "
+                    f"({throughput} ONTs/min)")
+        return {
+            'total': len(resultados),
+            'exitosas': exitosas,
+            'fallidas': len(resultados) - exitosas,
+            'duracion_s': round(elapsed, 2),
+            'onts_por_minuto': throughput,
+            'resultados': resultados
+        }
+
+    @staticmethod
+    def _entero(nombre: str, valor, minimo: int, maximo: int) -> int:
+        try:
+            numero = int(str(valor).strip())
+        except (TypeError, ValueError):
+            raise ValueError(f"{nombre} inválido: {valor!r}")
+        if not minimo <= numero <= maximo:
+            raise ValueError(f"{nombre} fuera de rango ({minimo}-{maximo}): {numero}")
+        return numero
+
+    @staticmethod
+    def _desc(valor) -> str:
+        if not isinstance(valor, str) or not DESC_PATTERN.fullmatch(valor):
+            raise ValueError(f"desc inválida (hasta 64 letras, números y {' _.,:/()-'!r}): {valor!r}")
+        return valor
+
+    def validar(self, entries, params: Optional[Dict] = None):
+        """
+        Valida y normaliza las entradas y los parámetros antes de armar los comandos.
+        Lanza ValueError con la primera entrada o parámetro rechazado.
+        """
+        params = params or {}
+        if not isinstance(params, dict):
+            raise ValueError("params debe ser un objeto")
+        desconocidos = set(params) - PARAMS_PERMITIDOS
+        if desconocidos:
+            raise ValueError(f"Parámetros no permitidos: {', '.join(sorted(desconocidos))}")
+        params = {**self.defaults, **params}
+        for nombre, (minimo, maximo) in PARAMS_ENTEROS.items():
+            if nombre in params:
+                params[nombre] = self._entero(nombre, params[nombre], minimo, maximo)
+        if params.get('desc'):
+            params['desc'] = self._desc(params['desc'])
+
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            raise ValueError("onts debe ser una lista de objetos")
+        return [self._validar_entrada(e) for e in entries], params
+
+    def _validar_entrada(self, entry: Dict) -> Dict:
+        """Entrada de autofind con solo los campos que usan las plantillas, ya validados"""
+        fsp = str(entry.get('fsp') or '').split('/')
+        if len(fsp) == 3:
+            frame, board, port = fsp
+        else:
+            frame, board, port = 0, entry.get('board'), entry.get('port')
+        frame = self._entero('frame', frame, 0, 7)
+        board = self._entero('board', board if board is not None else entry.get('board'), 0, 21)
+        port = self._entero('port', port if port is not None else entry.get('port'), 0, 15)
+
+        sn = str(entry.get('sn') or '').strip()
+        sn_hex = str(entry.get('sn_hex') or '').strip()
+        match = SN_PATTERN.fullmatch(sn)
+        if not sn_hex:
+            # "GPTF-00D35288" -> "4750544600D35288"; un SN de 16 dígitos hex se usa tal cual
+            sn_hex = sn if SN_HEX_PATTERN.fullmatch(sn) else \
+                (match.group(1).encode().hex() + match.group(2) if match else '')
+        if not SN_HEX_PATTERN.fullmatch(sn_hex) or not (match or SN_HEX_PATTERN.fullmatch(sn)):
+            raise ValueError(f"SN inválido: {entry.get('sn')!r}")
+
+        limpia = {
+            'fsp': f"{frame}/{board}/{port}",
+            'frame': str(frame),
+            'board': str(board),
+            'port': str(port),
+            'sn': sn,
+            'sn_hex': sn_hex.upper(),
+        }
+        if entry.get('desc'):
+            limpia['desc'] = self._desc(entry['desc'])
+        return limpia
+
+    @staticmethod
+    def _agrupar_por_tarjeta(entries: List[Dict[str, str]]) -> "OrderedDict[str, List[Dict]]":
+        """Agrupa las entradas por tarjeta y las ordena por puerto dentro de cada una"""
+        grupos: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        for entry in sorted(entries, key=lambda e: (int(e.get('board', 0)), int(e.get('port', 0)))):
+            grupos.setdefault(str(entry.get('board', '0')), []).append(entry)
+        return grupos
+
+    def _contexto(self, entry: Dict[str, str], params: Dict, **extra) -> Dict:
+        """Variables disponibles para las plantillas de comandos"""
+        return {
+            **params,
+            'frame': entry['frame'],
+            'board': entry['board'],
+            'port': entry['port'],
+            'sn': entry['sn'],
+            'sn_hex': entry['sn_hex'],
+            'desc': params.get('desc') or entry.get('desc') or entry['sn'],
+            **extra
+        }
+
+    @staticmethod
+    def _ejecutar(conn: ConnectionService, command: str) -> str:
+        """Ejecuta un comando de configuración confirmando el prompt de parámetros opcionales"""
+        output = conn.execute_command(command, expect_string=rf"#|{PARAM_PROMPT}")
+        if re.search(PARAM_PROMPT, output):
+            output += conn.execute_command("", expect_string=r"#")
+        if 'Failure' in output or re.search(r'^\s*% ', output, re.MULTILINE):
+            raise RuntimeError(output.strip().splitlines()[-1] if output.strip() else command)
+        return output
+
+    def _procesar_tarjeta(self, tarjeta: str, grupo: List[Dict], params: Dict) -> List[Dict]:
+        """Autoriza todas las ONTs de una tarjeta en una sesión del pool"""
+        resultados = [{
+            'sn': e.get('sn', ''), 'fsp': e.get('fsp', ''), 'ont_id': None,
+            'status': 'pending', 'error': None
+        } for e in grupo]
+
+        try:
+            with self.pool.acquire() as conn:
+                try:
+                    self._ejecutar_pasos(conn, tarjeta, grupo, resultados, params)
+                except Exception:
+                    # Dejar la sesión en modo config para el siguiente usuario del pool
+                    try:
+                        conn.ensure_config_mode()
+                    except Exception:
+                        pass
+                    raise
+        except Exception as e:
+            logger.error(f"Error autorizando ONTs en tarjeta {tarjeta}: {e}")
+            for resultado in resultados:
+                if resultado['status'] == 'pending':
+                    resultado.update(status='failed', error=str(e))
+            # Las ONTs ya agregadas quedarían registradas sin service-port: se revierten
+            # en una sesión nueva del pool (la anterior pudo haberse caído)
+            revertir = [(entry, resultado) for entry, resultado in zip(grupo, resultados)
+                        if resultado['ont_id'] and resultado['status'] == 'failed'
+                        and '; rollback:' not in resultado['error']]
+            if revertir:
+                try:
+                    with self.pool.acquire() as conn:
+                        self._revertir(conn, tarjeta, revertir, params)
+                except Exception as e:
+                    logger.error(f"No se pudieron revertir las ONTs de la tarjeta {tarjeta}: {e}")
+                    for _, resultado in revertir:
+                        if resultado['status'] != 'rolled_back' and '; rollback:' not in resultado['error']:
+                            resultado['error'] += f"; rollback: {e}"
+
+        return resultados
+
+    def _ejecutar_pasos(self, conn: ConnectionService, tarjeta: str, grupo: List[Dict],
+                        resultados: List[Dict], params: Dict):
+        """Ejecuta ont add, service-port y rollback para las ONTs de una tarjeta"""
+        # 1) ont add: una sola entrada a la interfaz para toda la tarjeta
+        conn.enter_interface(tarjeta)
+        for entry, resultado in zip(grupo, resultados):
+            try:
+                output = self._ejecutar(conn, self.templates['ont_add'].format(**self._contexto(entry, params)))
+                match = ONT_ID_PATTERN.search(output)
+                if not match:
+                    raise RuntimeError("No se obtuvo el ONTID en la respuesta")
+                resultado['ont_id'] = match.group(1)
+            except Exception as e:
+                resultado.update(status='failed', error=f"ont add: {e}")
+        conn.exit_interface()
+
+        # 2) service-port en modo config
+        revertir = []
+        for entry, resultado in zip(grupo, resultados):
+            if resultado['status'] != 'pending':
+                continue
+            try:
+                ctx = self._contexto(entry, params, ont_id=resultado['ont_id'])
+                for template in self.templates['service_ports']:
+                    self._ejecutar(conn, template.format(**ctx))
+                resultado['status'] = 'ok'
+            except Exception as e:
+                resultado.update(status='failed', error=f"service-port: {e}")
+                revertir.append((entry, resultado))
+
+        # 3) rollback de las ONTs agregadas cuyo service-port falló
+        if revertir:
+            self._revertir(conn, tarjeta, revertir, params)
+
+    def _revertir(self, conn: ConnectionService, tarjeta: str, revertir: List[tuple], params: Dict):
+        """
+        Elimina las ONTs agregadas de `revertir` ((entrada, resultado) con ont_id): primero los
+        service-port que sí se crearon (modo config), luego la ONT. Cada resultado queda en
+        'rolled_back' o con "; rollback: <error>" agregado al error.
+        """
+        conn.ensure_config_mode()
+        for entry, resultado in revertir:
+            try:
+                ctx = self._contexto(entry, params, ont_id=resultado['ont_id'])
+                self._ejecutar(conn, self.templates['service_port_delete'].format(**ctx))
+            except Exception as e:
+                logger.warning(f"Sin service-port que revertir para ONT {resultado['sn']}: {e}")
+
+        conn.enter_interface(tarjeta)
+        try:
+            for entry, resultado in revertir:
+                try:
+                    ctx = self._contexto(entry, params, ont_id=resultado['ont_id'])
+                    self._ejecutar(conn, self.templates['ont_delete'].format(**ctx))
+                    resultado['status'] = 'rolled_back'
+                except Exception as e:
+                    logger.error(f"No se pudo revertir ONT {resultado['sn']}: {e}")
+                    resultado['error'] += f"; rollback: {e}"
+        finally:
+            try:
+                conn.exit_interface()
+            except Exception as e:
+                logger.warning(f"No se pudo salir de la interfaz tras revertir ONTs de la tarjeta {tarjeta}: {e}")
@@ -0,0 +1,410 @@
+import logging
+import socket
+import sys
+import threading
+import time
+from typing import Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Servicios compartidos, creados bajo demanda en el primer uso
+_lock = threading.RLock()
+_services = {}
+
+
+def _get_or_create(name: str, factory):
+    """Retorna el servicio registrado con `name`, creándolo si aún no existe"""
+    service = _services.get(name)
+    if service is not None:
+        return service
+    with _lock:
+        if name not in _services:
+            _services[name] = factory()
+            logger.info(f"Servicio '{name}' inicializado")
+        return _services[name]
+
+
+def _get_shared(name: str, local_factory, remote_class=None):
+    """
+    Como _get_or_create, pero para componentes con estado que deben ser únicos entre
+    procesos: con el broker habilitado se retorna un proxy al componente alojado en él.
+    """
+    def factory():
+        if not Config.SESSION_BROKER_ENABLED:
+            return local_factory()
+
+        from services.session_broker import RemoteComponent, broker_authkey
+        get_connection_pool()  # asegura que el broker esté corriendo
+        return (remote_class or RemoteComponent)(Config.SESSION_BROKER_ADDRESS, broker_authkey(), name)
+    return _get_or_create(name, factory)
+
+
+def get_cache():
+    """Retorna la caché compartida de resultados consultados al OLT"""
+    from services.session_broker import RemoteCache
+
+    def factory():
+        from services.cache import TTLCache
+        return TTLCache()
+    return _get_shared('cache', factory, RemoteCache)
+
+
+def create_local_pool():
+    """Crea un pool de sesiones SSH propio de este proceso"""
+    from services.command_scheduler import CommandScheduler
+    from services.connection_service import ConnectionPool
+    from services.device_health import DeviceHealth
+    health = DeviceHealth(
+        Config.DEVICE_CONFIG['ip'],
+        failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+        base_backoff=Config.CIRCUIT_BASE_BACKOFF,
+        max_backoff=Config.CIRCUIT_MAX_BACKOFF
+    )
+    scheduler = None
+    # En reproducción no hay OLT que proteger: los comandos se sirven sin límite
+    if Config.SCHEDULER_RATE and not Config.REPLAY_FILE:
+        scheduler = CommandScheduler(Config.DEVICE_CONFIG['ip'], rate=Config.SCHEDULER_RATE,
+                                     burst=Config.SCHEDULER_BURST, max_queue=Config.SCHEDULER_MAX_QUEUE,
+                                     max_wait=Config.SCHEDULER_MAX_WAIT)
+    pool = ConnectionPool(Config.DEVICE_CONFIG, size=Config.SSH_POOL_SIZE, health=health,
+                          liveness_interval=Config.LIVENESS_CHECK_INTERVAL, scheduler=scheduler,
+                          connection_factory=create_connection_factory())
+    if Config.KEEPALIVE_INTERVAL:
+        pool.start_keepalive(Config.KEEPALIVE_INTERVAL, Config.KEEPALIVE_IDLE_AFTER, Config.SESSION_MAX_IDLE)
+    return pool
+
+
+def create_connection_factory():
+    """
+    Fábrica de conexiones según Config: reproducción de un transcript (REPLAY_FILE) y/o
+    captura de comandos (CAPTURE_FILE). None = conexión netmiko normal.
+    """
+    if not Config.REPLAY_FILE and not Config.CAPTURE_FILE:
+        return None
+
+    from services.transcript import RecordingConnection, ReplayConnection, Transcript, TranscriptRecorder
+    transcript = Transcript.load(Config.REPLAY_FILE) if Config.REPLAY_FILE else None
+    recorder = TranscriptRecorder(Config.CAPTURE_FILE) if Config.CAPTURE_FILE else None
+
+    def factory(device_config: dict):
+        if transcript is not None:
+            connection = ReplayConnection(transcript, latency_factor=Config.REPLAY_LATENCY_FACTOR)
+        else:
+            from netmiko import ConnectHandler
+            connection = ConnectHandler(**device_config)
+        return RecordingConnection(connection, recorder) if recorder is not None else connection
+    return factory
+
+
+def get_data_source():
+    """
+    Fuente de datos alternativa al CLI configurada para el OLT (Config.OLT_DATA_SOURCE),
+    o None si las ONTs y los puertos se consultan por SSH
+    """
+    def factory():
+        ip = Config.DEVICE_CONFIG['ip']
+        fuente = Config.OLT_DATA_SOURCE.get(ip, Config.DATA_SOURCE_DEFAULT)
+        if fuente != 'snmp':
+            return False
+
+        from services.device_health import DeviceHealth
+        from services.snmp_client import SnmpClient
+        from services.snmp_source import SNMPDataSource
+        snmp = Config.SNMP_CONFIG
+        client = SnmpClient(ip, community=snmp['community'], port=snmp['port'],
+                            timeout=snmp['timeout'], retries=snmp['retries'])
+        health = DeviceHealth(
+            f"{ip} (snmp)",
+            failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+            base_backoff=Config.CIRCUIT_BASE_BACKOFF,
+            max_backoff=Config.CIRCUIT_MAX_BACKOFF
+        )
+        return SNMPDataSource(client, health=health, max_repetitions=snmp['max_repetitions'])
+    return _get_or_create('data_source', factory) or None
+
+
+def get_connection_pool():
+    """
+    Retorna el pool de sesiones SSH al OLT (no abre ninguna sesión). Con el broker
+    habilitado las sesiones viven en el proceso del broker y se comparten entre procesos.
+    """
+    def factory():
+        if not Config.SESSION_BROKER_ENABLED:
+            return create_local_pool()
+
+        from services.session_broker import RemoteConnectionPool, broker_authkey, ensure_broker
+        authkey = broker_authkey()
+        if Config.SESSION_BROKER_AUTOSTART:
+            ensure_broker(Config.SESSION_BROKER_ADDRESS, authkey)
+        return RemoteConnectionPool(Config.SESSION_BROKER_ADDRESS, authkey)
+    return _get_or_create('pool', factory)
+
+
+def get_connection_service():
+    """Retorna el servicio de conexión SSH interactivo (no abre la sesión)"""
+    return get_connection_pool().primary
+
+
+def get_scheduler():
+    """Retorna el scheduler de comandos del OLT, o None si no hay límite configurado"""
+    return get_connection_pool().scheduler
+
+
+def get_ont_service():
+    """Retorna el servicio de ONTs"""
+    def factory():
+        from services.ont_service import ONTService
+        service = ONTService(get_connection_service(), cache=get_cache(), last_good_ttl=Config.LAST_GOOD_TTL,
+                             detail_ttl=Config.ONT_DETAIL_TTL, data_source=get_data_source())
+        service.listeners.append(_actualizar_inventario)
+        service.listeners.append(_actualizar_conteos)
+        return service
+    return _get_or_create('ont', factory)
+
+
+def _actualizar_inventario(tarjeta: str, puerto: str, collection):
+    """Lleva cada consulta de ONTs al inventario compartido"""
+    get_ont_inventory().update_port(tarjeta, puerto, collection)
+
+
+def _actualizar_conteos(tarjeta: str, puerto: str, collection):
+    """Lleva los totales de cada consulta de ONTs a los puertos en caché (monitor)"""
+    board_service = get_board_service()
+    if board_service is not None:
+        board_service.actualizar_puerto(tarjeta, puerto, total_onts=collection.get_total_count(),
+                                        online_onts=collection.get_online_count())
+
+
+def get_excel_service():
+    """Retorna el servicio de reportes Excel"""
+    def factory():
+        from services.excel_service import ExcelService
+        return ExcelService()
+    return _get_or_create('excel', factory)
+
+
+def get_board_service():
+    """Retorna el servicio de tarjetas, o None si no se pudo inicializar"""
+    def factory():
+        try:
+            from services.board_service import BoardService
+            # Con eventos del OLT las copias en caché se actualizan solas y pueden durar más
+            eventos = Config.EVENTS_ENABLED
+            return BoardService(get_connection_service(), pool=get_connection_pool(),
+                                cache=get_cache(),
+                                chasis_ttl=Config.EVENTS_CACHE_TTL if eventos else Config.CHASSIS_CACHE_TTL,
+                                last_good_ttl=Config.LAST_GOOD_TTL, data_source=get_data_source(),
+                                tarjeta_ttl=Config.EVENTS_CACHE_TTL if eventos else 0)
+        except ImportError as e:
+            logger.error(f"Error importando BoardService: {e}")
+        except Exception as e:
+            logger.error(f"Error inicializando BoardService: {e}")
+        return False
+    return _get_or_create('board', factory) or None
+
+
+def get_provisioning_service():
+    """Retorna el servicio de autorización masiva de ONTs"""
+    def factory():
+        from services.provisioning_service import ProvisioningService
+        return ProvisioningService(get_connection_pool(), Config.PROVISIONING_TEMPLATES, Config.PROVISIONING)
+    return _get_or_create('provisioning', factory)
+
+
+def get_autofind_watcher():
+    """Retorna el watcher de autofind, iniciando su sondeo si está habilitado"""
+    def factory():
+        from services.autofind_watcher import AutofindWatcher
+        watcher = AutofindWatcher(get_ont_service(), interval=Config.AUTOFIND_POLL_INTERVAL)
+        if Config.AUTOFIND_WATCHER_ENABLED:
+            watcher.start()
+        return watcher
+    return _get_shared('autofind', factory)
+
+
+def get_ont_inventory():
+    """Retorna el inventario de ONTs, iniciando el poller de puertos si está habilitado"""
+    def factory():
+        from services.ont_inventory import InventoryPoller, ONTInventory
+        inventory = ONTInventory(olt=Config.DEVICE_CONFIG['ip'])
+        # El poller alimenta el inventario a través de los listeners de ONTService
+        board_service = get_board_service()
+        if Config.INVENTORY_POLL_ENABLED and board_service is not None:
+            interval = Config.EVENTS_POLL_INTERVAL if Config.EVENTS_ENABLED else Config.INVENTORY_POLL_INTERVAL
+            InventoryPoller(board_service, get_ont_service(), interval=interval).start()
+        return inventory
+    return _get_shared('ont_inventory', factory)
+
+
+def get_search_index():
+    """Retorna el índice de búsqueda de ONTs, alimentado por el inventario y el watcher de autofind"""
+    def factory():
+        from services.search_index import SearchIndex
+        index = SearchIndex()
+        inventory = get_ont_inventory()
+        # Carga inicial con lo que ya está en memoria; después se actualiza de forma incremental
+        puertos = {}
+        for record in inventory.records():
+            puertos.setdefault((record['tarjeta'], record['puerto']), []).append(record)
+        for (tarjeta, puerto), records in puertos.items():
+            index.update_port(tarjeta, puerto, records)
+        inventory.listeners.append(index.update_port)
+        inventory.search_index = index
+
+        watcher = get_autofind_watcher()
+        index.update_autofind(watcher.snapshot()['data'])
+        watcher.listeners.append(index.update_autofind)
+        return index
+    return _get_shared('search', factory)
+
+
+def get_event_processor():
+    """Retorna el procesador de eventos del OLT, abriendo los puertos de syslog/traps si está habilitado"""
+    def factory():
+        from services.event_receiver import EventProcessor, EventReceiver
+        processor = EventProcessor(get_ont_inventory(), get_board_service(), get_ont_service(),
+                                   refresh_delay=Config.EVENTS_REFRESH_DELAY,
+                                   refresh_min_interval=Config.EVENTS_REFRESH_MIN_INTERVAL)
+        if Config.EVENTS_ENABLED:
+            EventReceiver(processor, Config.EVENTS_BIND, Config.EVENTS_SYSLOG_PORT, Config.EVENTS_TRAP_PORT,
+                          community=Config.SNMP_CONFIG['community'],
+                          fuentes=Config.EVENTS_SOURCES or [Config.DEVICE_CONFIG['ip']],
+                          trap_oids=Config.EVENTS_TRAP_OIDS).start()
+        return processor
+    return _get_shared('events', factory)
+
+
+def get_export_service():
+    """Retorna el servicio de exportación de tarjetas completas"""
+    def factory():
+        from services.export_service import ExportService
+        return ExportService(get_ont_service(), get_connection_pool(), get_excel_service())
+    return _get_or_create('export', factory)
+
+
+def get_optical_report_service():
+    """Retorna el servicio del reporte óptico de todo el chasis"""
+    def factory():
+        from services.optical_report import OpticalReportService
+        return OpticalReportService(get_board_service(), get_ont_service(), get_connection_pool(),
+                                    get_excel_service(), Config.REPORTS_DIR,
+                                    concurrencia=Config.OPTICAL_REPORT_WORKERS,
+                                    tarjetas=Config.OPTICAL_REPORT_TARJETAS)
+    return _get_or_create('optical_report', factory)
+
+
+def get_job_manager():
+    """Retorna la cola de trabajos en segundo plano (exportaciones)"""
+    def factory():
+        from services.job_manager import JobManager
+        manager = JobManager(Config.EXPORTS_DIR, workers=Config.EXPORT_WORKERS, retention=Config.EXPORT_RETENTION)
+        manager.registrar('export_tarjetas', get_export_service().exportar_tarjetas)
+        manager.registrar('reporte_optico', get_optical_report_service().generar)
+        return manager
+    return _get_shared('jobs', factory)
+
+
+# Componentes que el broker aloja para todos los procesos (nombre -> función local)
+SHARED_COMPONENTS = {
+    'cache': get_cache,
+    'autofind': get_autofind_watcher,
+    'ont_inventory': get_ont_inventory,
+    'search': get_search_index,
+    'jobs': get_job_manager,
+    'events': get_event_processor,
+}
+
+
+def init_services():
+    """Crea todos los servicios de inmediato (modo de arranque no diferido)"""
+    get_connection_service()
+    get_ont_service()
+    get_excel_service()
+    get_board_service()
+
+
+def _wait_for_port(host: str, port: int, timeout: float) -> bool:
+    """Espera hasta que el servidor HTTP acepte conexiones"""
+    if host in ('0.0.0.0', ''):
+        host = '127.0.0.1'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def start_ssh_prewarm(host: str, port: int, started_at: Optional[float] = None) -> threading.Thread:
+    """
+    Abre la sesión SSH en segundo plano una vez que el servidor está escuchando
+    y después arranca los sondeos en segundo plano (autofind)
+    Args:
+        host, port: dirección donde escucha el servidor HTTP
+        started_at: instante (time.perf_counter) de inicio del proceso, para medir el arranque
+    """
+    def prewarm():
+        if not _wait_for_port(host, port, Config.PREWARM_WAIT_TIMEOUT):
+            logger.warning("El servidor no empezó a escuchar; se omite el pre-calentamiento SSH")
+            return
+
+        if started_at is not None:
+            check_startup_budget(time.perf_counter() - started_at)
+
+        start_background_services()
+
+    thread = threading.Thread(target=prewarm, name="ssh-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_background_services():
+    """Abre la sesión SSH interactiva y arranca los sondeos en segundo plano"""
+    try:
+        t0 = time.perf_counter()
+        get_connection_service().connect()
+        logger.info(f"Sesión SSH pre-calentada en {time.perf_counter() - t0:.2f}s")
+    except Exception as e:
+        logger.warning(f"No se pudo pre-calentar la sesión SSH: {e}")
+
+    if Config.AUTOFIND_WATCHER_ENABLED:
+        get_autofind_watcher()
+
+    if Config.INVENTORY_POLL_ENABLED:
+        get_ont_inventory()
+        get_search_index()
+
+    if Config.EVENTS_ENABLED:
+        get_event_processor()
+
+    # Con el broker, el reporte se programa una sola vez en el proceso del broker
+    if Config.OPTICAL_REPORT_ENABLED and not Config.SESSION_BROKER_ENABLED:
+        start_report_scheduler()
+
+
+def start_report_scheduler():
+    """Programa el reporte óptico diario en la cola de trabajos"""
+    def factory():
+        from services.optical_report import ReportScheduler
+        scheduler = ReportScheduler(get_job_manager(), hora=Config.OPTICAL_REPORT_TIME)
+        scheduler.start()
+        return scheduler
+    return _get_or_create('report_scheduler', factory)
+
+
+def check_startup_budget(elapsed: float) -> bool:
+    """Registra el tiempo de arranque y lo compara con el presupuesto configurado"""
+    frozen = getattr(sys, 'frozen', False)
+    budget = Config.STARTUP_BUDGET_FROZEN if frozen else Config.STARTUP_BUDGET_SOURCE
+    build = "congelado" if frozen else "fuente"
+
+    if elapsed > budget:
+        logger.warning(f"Arranque ({build}) en {elapsed:.2f}s excede el presupuesto de {budget:.2f}s")
+        return False
+
+    logger.info(f"Arranque ({build}) en {elapsed:.2f}s (presupuesto {budget:.2f}s)")
+    return True
@@ -0,0 +1,263 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from itertools import count
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _sn_legible(sn_hex: str) -> str:
+    """Convierte el SN hexadecimal del summary (485754433D7F1A2B) al formato HWTC3D7F1A2B"""
+    try:
+        vendor = bytes.fromhex(sn_hex[:8]).decode('ascii')
+        return vendor + sn_hex[8:] if vendor.isalnum() else ''
+    except ValueError:
+        return ''
+
+
+class SearchIndex:
+    """
+    Índice de búsqueda por SN, descripción y ubicación (F/S/P/ONT) de todas las ONTs
+    del inventario y de autofind. Las subcadenas de 3 o más caracteres se resuelven con
+    un índice de trigramas y las más cortas con búsqueda por prefijo sobre los términos.
+
+    Las listas de prefijos se ordenan recién en la primera búsqueda corta después de un
+    cambio: una carga masiva cuesta un solo sort y no una inserción ordenada por término.
+    """
+
+    FIELDS = ('sn', 'descripcion', 'ont')
+    MAX_LIMIT = 200
+
+    def __init__(self):
+        self._ids = count()
+        self._doc_ids: Dict[Hashable, int] = {}               # clave externa -> id interno
+        self._keys: Dict[int, Hashable] = {}                  # id interno -> clave externa
+        self._docs: Dict[int, dict] = {}
+        self._terms: Dict[int, Tuple[Tuple[str, str], ...]] = {}  # id -> ((campo, término), ...)
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._prefix: Dict[str, List[Tuple[str, int]]] = {f: [] for f in self.FIELDS}  # (término, id) ordenado
+        self._prefix_nuevos: List[Tuple[str, str, int]] = []     # (campo, término, id) sin ordenar
+        self._prefix_borrados: Set[Tuple[str, str, int]] = set()  # (campo, término, id) a quitar
+        self._by_port: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self._autofind: Set[Hashable] = set()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _normalize_sn(value: str) -> str:
+        return value.replace('-', '').replace(' ', '').lower()
+
+    @staticmethod
+    def _trigrams_of(term: str) -> Set[str]:
+        return {term[i:i + 3] for i in range(len(term) - 2)}
+
+    def _doc_terms(self, doc: dict) -> Tuple[Tuple[str, str], ...]:
+        terms = []
+        for sn in (doc.get('sn_hex'), doc.get('sn'), _sn_legible(doc.get('sn_hex') or '')):
+            if sn:
+                terms.append(('sn', self._normalize_sn(sn)))
+        if doc.get('descripcion'):
+            terms.append(('descripcion', doc['descripcion'].lower()))
+        terms.append(('ont', doc['ubicacion']))
+        return tuple(dict.fromkeys(terms))  # sin duplicados, conservando el orden
+
+    def _put(self, key: Hashable, doc: dict):
+        """Agrega o reemplaza un documento; si sus términos no cambiaron solo se actualiza el dato"""
+        terms = self._doc_terms(doc)
+        doc_id = self._doc_ids.get(key)
+        if doc_id is not None:
+            if self._terms[doc_id] == terms:
+                self._docs[doc_id] = doc
+                return
+            self._delete(key)
+
+        doc_id = next(self._ids)
+        self._doc_ids[key] = doc_id
+        self._keys[doc_id] = key
+        self._docs[doc_id] = doc
+        self._terms[doc_id] = terms
+        for field, term in terms:
+            self._prefix_nuevos.append((field, term, doc_id))
+            for trigram in self._trigrams_of(term):
+                self._trigrams.setdefault(trigram, set()).add(doc_id)
+
+    def _delete(self, key: Hashable):
+        doc_id = self._doc_ids.pop(key)
+        del self._keys[doc_id]
+        del self._docs[doc_id]
+        for field, term in self._terms.pop(doc_id):
+            # Los ids no se reutilizan: la entrada se descarta al reordenar los prefijos
+            self._prefix_borrados.add((field, term, doc_id))
+            for trigram in self._trigrams_of(term):
+                postings = self._trigrams.get(trigram)
+                if postings is not None:
+                    postings.discard(doc_id)
+                    if not postings:
+                        del self._trigrams[trigram]
+
+    def update_port(self, tarjeta: str, puerto: str, records: List[dict]):
+        """Reemplaza las ONTs de un puerto (listener del inventario)"""
+        port = (int(tarjeta), int(puerto))
+        with self._lock:
+            nuevas = set()
+            for record in records:
+                key = (port[0], port[1], int(record['id']))
+                nuevas.add(key)
+                self._put(key, {
+                    'source': 'ont',
+                    'olt': record.get('olt', ''),
+                    'tarjeta': str(port[0]),
+                    'puerto': str(port[1]),
+                    'ont_id': str(record['id']),
+                    'fsp': f"0/{port[0]}/{port[1]}",
+                    'ubicacion': f"0/{port[0]}/{port[1]}/{record['id']}",
+                    'sn': _sn_legible(record.get('sn', '')) or record.get('sn', ''),
+                    'sn_hex': record.get('sn', ''),
+                    'descripcion': record.get('descripcion', ''),
+                    'estado': record.get('estado', '')
+                })
+            for key in self._by_port.get(port, set()) - nuevas:
+                self._delete(key)
+            self._by_port[port] = nuevas
+
+    def update_autofind(self, entries: List[dict]):
+        """Reemplaza las ONTs no autorizadas (listener del watcher de autofind)"""
+        with self._lock:
+            nuevas = set()
+            for entry in entries:
+                key = ('autofind', entry.get('fsp', ''), entry.get('sn', ''))
+                nuevas.add(key)
+                self._put(key, {
+                    'source': 'autofind',
+                    'olt': entry.get('olt', ''),
+                    'tarjeta': entry.get('board', ''),
+                    'puerto': entry.get('port', ''),
+                    'ont_id': None,
+                    'fsp': entry.get('fsp', ''),
+                    'ubicacion': entry.get('fsp', ''),
+                    'sn': entry.get('sn', ''),
+                    'sn_hex': entry.get('sn_hex', ''),
+                    'descripcion': '',
+                    'estado': 'autofind'
+                })
+            for key in self._autofind - nuevas:
+                self._delete(key)
+            self._autofind = nuevas
+
+    def _ordenar_prefijos(self):
+        """Aplica a las listas de prefijos los documentos agregados y borrados desde el último orden"""
+        if not self._prefix_nuevos and not self._prefix_borrados:
+            return
+        borrados = self._prefix_borrados
+        for field in self.FIELDS:
+            entries = self._prefix[field]
+            if borrados:
+                entries = [e for e in entries if (field, *e) not in borrados]
+            entries.extend((term, doc_id) for f, term, doc_id in self._prefix_nuevos
+                           if f == field and (f, term, doc_id) not in borrados)
+            entries.sort()
+            self._prefix[field] = entries
+        self._prefix_nuevos = []
+        self._prefix_borrados = set()
+
+    @staticmethod
+    def _tramo(entries: List[Tuple[str, int]], text: str) -> Iterable[Tuple[str, int]]:
+        """Entradas de una lista de prefijos cuyo término empieza con `text`"""
+        for pos in range(bisect_left(entries, (text,)), len(entries)):
+            if not entries[pos][0].startswith(text):
+                return
+            yield entries[pos]
+
+    def _candidates(self, text: str, field: Optional[str] = None) -> Iterable[int]:
+        """Documentos que pueden contener `text` (se verifican después)"""
+        if len(text) < 3:
+            # Subcadenas cortas: solo coincidencias por prefijo, en orden de término (las
+            # exactas primero) y de a una, para poder cortar al reunir suficientes
+            self._ordenar_prefijos()
+            tramos = [self._tramo(self._prefix[name], text)
+                      for name in (self.FIELDS if field is None else (field,))]
+            return (doc_id for _, doc_id in heapq.merge(*tramos))
+
+        postings = sorted((self._trigrams.get(t, set()) for t in self._trigrams_of(text)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        result = set(postings[0])
+        for other in postings[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def search_ids(self, query: str, field: Optional[str] = None,
+                   limit: Optional[int] = None) -> Dict[int, Tuple[int, str]]:
+        """
+        Id interno -> (calidad de la coincidencia, campo); 0 = exacta, 1 = prefijo, 2 = subcadena.
+        Con `limit`, las búsquedas cortas (por prefijo) se detienen al reunir `limit` documentos.
+        """
+        text = query.strip().lower()
+        if not text:
+            return {}
+        variants = {text, self._normalize_sn(text)} if field in (None, 'sn') else {text}
+
+        matches: Dict[int, Tuple[int, str]] = {}
+        for variant in variants:
+            for doc_id in self._candidates(variant, field):
+                if limit is not None and len(variant) < 3 and len(matches) >= limit:
+                    break
+                for term_field, term in self._terms[doc_id]:
+                    if field is not None and term_field != field:
+                        continue
+                    # Los guiones solo se ignoran al comparar SNs
+                    if variant != (self._normalize_sn(text) if term_field == 'sn' else text):
+                        continue
+                    if variant in term:
+                        quality = 0 if term == variant else 1 if term.startswith(variant) else 2
+                        if doc_id not in matches or quality < matches[doc_id][0]:
+                            matches[doc_id] = (quality, term_field)
+        return matches
+
+    def search(self, query: str, field: Optional[str] = None, limit: int = 20) -> dict:
+        """
+        Busca ONTs por subcadena de SN, descripción o ubicación (ej. "0/4/1/12")
+        Args:
+            query: texto a buscar (sin distinguir mayúsculas; los guiones del SN se ignoran)
+            field: restringir a 'sn', 'descripcion' u 'ont'
+            limit: máximo de resultados (exactas primero, luego prefijos y subcadenas). Con menos
+                   de 3 caracteres solo se buscan `limit` coincidencias y `total` es parcial
+        """
+        t0 = time.perf_counter()
+        if field is not None and field not in self.FIELDS:
+            raise ValueError(f"Campo de búsqueda inválido: {field}")
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+
+        with self._lock:
+            matches = self.search_ids(query, field, limit)
+            ordered = heapq.nsmallest(limit, matches.items(),
+                                      key=lambda m: (m[1][0], self._docs[m[0]]['ubicacion']))
+            data = [{**self._docs[doc_id], 'match': match_field}
+                    for doc_id, (_, match_field) in ordered[:limit]]
+
+        return {
+            'data': data,
+            'count': len(data),
+            'total': len(matches),
+            'parcial': len(query.strip()) < 3 and len(matches) >= limit,
+            'took_ms': round((time.perf_counter() - t0) * 1000, 3)
+        }
+
+    def search_keys(self, query: str, field: Optional[str] = None) -> Set[Hashable]:
+        """Claves externas (tarjeta, puerto, ont_id) de las ONTs autorizadas que coinciden"""
+        with self._lock:
+            keys = (self._keys[doc_id] for doc_id in self.search_ids(query, field))
+            return {key for key in keys if key[0] != 'autofind'}
+
+    def stats(self) -> dict:
+        """Tamaño del índice"""
+        with self._lock:
+            return {
+                'documentos': len(self._docs),
+                'autofind': len(self._autofind),
+                'trigramas': len(self._trigrams)
+            }
@@ -0,0 +1,465 @@
+"""
+Broker local de sesiones SSH y estado compartido.
+
+Un proceso independiente (python -m services.session_broker) es dueño del
+ConnectionPool y mantiene vivas las sesiones con el OLT. Los procesos Flask
+(reloader de debug, workers de gunicorn) usan las sesiones a través de un socket
+local con RemoteConnectionPool / RemoteConnectionService, que exponen la misma
+interfaz que ConnectionPool / ConnectionService. Así un reinicio de Flask no
+vuelve a pagar el login SSH y varios workers no abren cada uno sus propias sesiones.
+
+El broker también aloja los componentes con estado (caché, watcher de autofind...)
+registrados en services.registry.SHARED_COMPONENTS; los workers los usan con
+RemoteComponent / RemoteCache, de modo que agregar workers no multiplica los
+sondeos ni las consultas al OLT.
+"""
+import logging
+import os
+import pickle
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from multiprocessing.connection import Client, Listener
+from typing import Optional
+
+from services.command_scheduler import DeviceSaturatedError, current_priority, prioridad
+from services.device_health import DeviceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'primary'  # sesión de consultas interactivas
+ANY = 'any'          # cualquier sesión libre del pool
+
+# Errores del broker que se relanzan tal cual en el cliente; cualquier otro objeto
+# recibido como error se reemplaza por un RuntimeError
+ERRORES_REMOTOS = (DeviceUnavailableError, DeviceSaturatedError, ConnectionError, TimeoutError,
+                   ValueError, LookupError, RuntimeError)
+
+
+def broker_authkey() -> bytes:
+    """
+    Clave de autenticación del broker: OLT_BROKER_AUTHKEY o, si no está definida, una
+    clave aleatoria guardada con permisos 0600 en SESSION_BROKER_AUTHKEY_FILE (la crea
+    el primer proceso que la necesita y la leen el broker, el maestro y los workers).
+    """
+    from config import Config
+    if Config.SESSION_BROKER_AUTHKEY:
+        return Config.SESSION_BROKER_AUTHKEY.encode()
+
+    ruta = Config.SESSION_BROKER_AUTHKEY_FILE
+    try:
+        fd = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.name != 'nt' and os.stat(ruta).st_mode & 0o077:
+            raise RuntimeError(f"{ruta} es legible por otros usuarios; debe tener permisos 0600")
+        # Otro proceso puede estar terminando de escribirla
+        for _ in range(20):
+            with open(ruta, 'rb') as f:
+                clave = f.read().strip()
+            if clave:
+                return clave
+            time.sleep(0.1)
+        raise RuntimeError(f"{ruta} está vacío")
+    clave = secrets.token_hex(32).encode()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(clave)
+    logger.info(f"Clave del broker de sesiones generada en {ruta}")
+    return clave
+
+
+class SessionBroker:
+    """Servidor que atiende las peticiones de los procesos Flask sobre el pool de sesiones"""
+
+    # Métodos de ConnectionService que se pueden invocar remotamente
+    METHODS = {
+        'execute_command', 'execute_global_command', 'enter_interface',
+        'exit_interface', 'ensure_config_mode', 'get_current_context', 'connect'
+    }
+
+    def __init__(self, pool, address, authkey: bytes, components: Optional[dict] = None):
+        self.pool = pool
+        self.address = address
+        self.authkey = authkey
+        # nombre -> función que retorna el componente (se crea en el primer uso)
+        self.components = components or {}
+
+    def serve_forever(self):
+        """Acepta clientes y atiende a cada uno en su propio hilo"""
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info(f"Broker de sesiones escuchando en {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Conexión de cliente rechazada: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        """Atiende las peticiones de un cliente hasta que cierre la conexión"""
+        # Sesión reservada por el cliente (lease) y el contexto que la libera
+        state = {'member': None, 'stack': None}
+        try:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    break
+
+                try:
+                    conn.send(('ok', self._dispatch(op, payload, state)))
+                except Exception as e:
+                    conn.send(('err', self._picklable(e)))
+        finally:
+            if state['stack'] is not None:
+                state['stack'].close()
+            conn.close()
+
+    @staticmethod
+    def _picklable(error: Exception) -> Exception:
+        """Las excepciones que no se pueden serializar se envían como RuntimeError"""
+        try:
+            pickle.dumps(error)
+            return error
+        except Exception:
+            return RuntimeError(f"{type(error).__name__}: {error}")
+
+    def _dispatch(self, op: str, payload, state: dict):
+        if op == 'call':
+            target, method, args, kwargs, nivel = payload
+            if method not in self.METHODS:
+                raise ValueError(f"Método no permitido: {method}")
+            # Los comandos se encolan con la prioridad del hilo que los envió
+            with prioridad(nivel):
+                return self._call(target, method, args, kwargs, state)
+
+        if op == 'lease':
+            if state['stack'] is not None:
+                raise RuntimeError("El cliente ya tiene una sesión reservada")
+            target, nivel = payload
+            stack = ExitStack()
+            # La sesión se espera con la prioridad del hilo que la reserva
+            with prioridad(nivel):
+                if target == PRIMARY:
+                    state['member'] = stack.enter_context(self._locked(self.pool.primary))
+                else:
+                    state['member'] = stack.enter_context(self.pool.acquire())
+            state['stack'] = stack
+            return None
+
+        if op == 'release':
+            if state['stack'] is not None:
+                state['stack'].close()
+            state['member'], state['stack'] = None, None
+            return None
+
+        if op == 'component':
+            name, method, args, kwargs, nivel = payload
+            if name not in self.components or method.startswith('_'):
+                raise ValueError(f"Componente o método no permitido: {name}.{method}")
+            with prioridad(nivel):
+                return getattr(self.components[name](), method)(*args, **kwargs)
+
+        if op == 'info':
+            scheduler = getattr(self.pool, 'scheduler', None)
+            return {
+                'size': self.pool.size,
+                'health': self.pool.health.to_dict(),
+                'scheduler': scheduler.metrics() if scheduler is not None else None
+            }
+
+        if op == 'saturado':
+            scheduler = getattr(self.pool, 'scheduler', None)
+            return scheduler is not None and scheduler.saturado(payload)
+
+        if op == 'health_check':
+            self.pool.health.check()
+            return None
+
+        raise ValueError(f"Operación desconocida: {op}")
+
+    @staticmethod
+    @contextmanager
+    def _locked(member):
+        with member.lock:
+            yield member
+
+    def _call(self, target: str, method: str, args, kwargs, state: dict):
+        """Invoca el método en la sesión reservada o, si no hay, en una tomada solo para esta llamada"""
+        if state['member'] is not None:
+            return self._invoke(state['member'], method, args, kwargs)
+        if target == PRIMARY:
+            with self.pool.primary.lock:
+                return self._invoke(self.pool.primary, method, args, kwargs)
+        with self.pool.acquire() as member:
+            return self._invoke(member, method, args, kwargs)
+
+    @staticmethod
+    def _invoke(member, method: str, args, kwargs):
+        result = getattr(member, method)(*args, **kwargs)
+        # connect() retorna el objeto netmiko, que no se puede enviar al cliente
+        return None if method == 'connect' else result
+
+
+class _RemoteLease:
+    """Lock reentrante por hilo que reserva una sesión del broker mientras está tomado"""
+
+    def __init__(self, service: "RemoteConnectionService"):
+        self.service = service
+
+    def __enter__(self):
+        local = self.service._local
+        depth = getattr(local, 'depth', 0)
+        if depth == 0:
+            self.service._request('lease', (self.service.target, current_priority()))
+        local.depth = depth + 1
+        return self
+
+    def __exit__(self, *exc):
+        local = self.service._local
+        local.depth -= 1
+        if local.depth == 0:
+            self.service._request('release', None)
+        return False
+
+
+class RemoteConnectionService:
+    """Cliente del broker con la misma interfaz que ConnectionService"""
+
+    def __init__(self, address, authkey: bytes, target: str = PRIMARY):
+        self.address = address
+        self.authkey = authkey
+        self.target = target
+        # Cada hilo usa su propia conexión al broker (y por lo tanto su propio lease)
+        self._local = threading.local()
+        self.lock = _RemoteLease(self)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def _request(self, op: str, payload):
+        try:
+            conn = self._connection()
+            conn.send((op, payload))
+            status, result = conn.recv()
+        except (OSError, EOFError) as e:
+            self.close()
+            raise ConnectionError(f"Broker de sesiones no disponible en {self.address}: {e}")
+        if status == 'err':
+            if isinstance(result, ERRORES_REMOTOS):
+                raise result
+            raise RuntimeError(f"Error del broker: {type(result).__name__}: {result}")
+        return result
+
+    def _call(self, method: str, *args, **kwargs):
+        return self._request('call', (self.target, method, args, kwargs, current_priority()))
+
+    def connect(self):
+        """Abre (o verifica) la sesión en el broker"""
+        self._call('connect')
+
+    def execute_command(self, *args, **kwargs) -> str:
+        return self._call('execute_command', *args, **kwargs)
+
+    def execute_global_command(self, *args, **kwargs) -> str:
+        return self._call('execute_global_command', *args, **kwargs)
+
+    def enter_interface(self, tarjeta: str):
+        self._call('enter_interface', tarjeta)
+
+    def exit_interface(self):
+        self._call('exit_interface')
+
+    def ensure_config_mode(self):
+        self._call('ensure_config_mode')
+
+    def get_current_context(self) -> str:
+        return self._call('get_current_context')
+
+    def disconnect(self):
+        """Las sesiones pertenecen al broker: solo se cierra la conexión local"""
+        self.close()
+
+    def close(self):
+        """Cierra la conexión al broker del hilo actual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.close()
+            finally:
+                self._local.conn = None
+                self._local.depth = 0
+
+
+class _RemoteHealth:
+    """Estado del circuit breaker consultado al broker"""
+
+    def __init__(self, service: RemoteConnectionService):
+        self.service = service
+
+    def check(self):
+        self.service._request('health_check', None)
+
+    def to_dict(self) -> dict:
+        return self.service._request('info', None)['health']
+
+
+class _RemoteScheduler:
+    """Métricas y saturación del scheduler de comandos del broker"""
+
+    def __init__(self, service: RemoteConnectionService):
+        self.service = service
+
+    def saturado(self, priority: int) -> bool:
+        return self.service._request('saturado', priority)
+
+    def metrics(self) -> Optional[dict]:
+        return self.service._request('info', None)['scheduler']
+
+
+class RemoteConnectionPool:
+    """Cliente del broker con la misma interfaz que ConnectionPool"""
+
+    def __init__(self, address, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self.primary = RemoteConnectionService(address, authkey, PRIMARY)
+        self.health = _RemoteHealth(self.primary)
+        self.scheduler = _RemoteScheduler(self.primary)
+        self._size: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = self.primary._request('info', None)['size']
+        return self._size
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """Reserva una sesión libre del broker mientras dure el bloque"""
+        member = RemoteConnectionService(self.address, self.authkey, ANY)
+        try:
+            with member.lock:
+                yield member
+        finally:
+            member.close()
+
+    def start_keepalive(self, *args, **kwargs):
+        """El keepalive lo ejecuta el broker"""
+        return None
+
+    def disconnect_all(self):
+        self.primary.close()
+
+
+class RemoteComponent:
+    """Proxy de un componente alojado en el broker: cada método se ejecuta allá"""
+
+    def __init__(self, address, authkey: bytes, name: str):
+        self._name = name
+        # Se reutiliza el transporte por hilo de RemoteConnectionService
+        self._client = RemoteConnectionService(address, authkey)
+
+    def __getattr__(self, method: str):
+        if method.startswith('_'):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            return self._client._request('component', (self._name, method, args, kwargs, current_priority()))
+        return call
+
+
+class RemoteCache(RemoteComponent):
+    """
+    Caché compartida en el broker con la interfaz de TTLCache. get_or_load se resuelve
+    en el cliente porque el loader no se puede enviar al broker; la carga simultánea
+    de la misma clave solo se evita dentro de cada proceso.
+    """
+
+    def __init__(self, address, authkey: bytes, name: str = 'cache'):
+        super().__init__(address, authkey, name)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get_or_load(self, key, loader, ttl: Optional[float] = None):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            value = self.get(key)
+            if value is None:
+                value = loader()
+                self.set(key, value, ttl)
+            return value
+
+
+def broker_disponible(address, authkey: bytes) -> bool:
+    """Indica si hay un broker escuchando en la dirección"""
+    try:
+        Client(address, authkey=authkey).close()
+        return True
+    except Exception:
+        return False
+
+
+def ensure_broker(address, authkey: bytes, timeout: float = 15) -> bool:
+    """Lanza el broker como proceso independiente si no está corriendo"""
+    if broker_disponible(address, authkey):
+        return True
+    if getattr(sys, 'frozen', False):
+        logger.warning("Build congelado: el broker de sesiones se debe iniciar por separado")
+        return False
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    logger.info("Iniciando broker de sesiones en segundo plano")
+    # Proceso desacoplado: sobrevive a los reinicios del reloader de Flask
+    subprocess.Popen(
+        [sys.executable, '-m', 'services.session_broker'],
+        cwd=root,
+        stdin=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if broker_disponible(address, authkey):
+            return True
+        time.sleep(0.2)
+    logger.error(f"El broker de sesiones no respondió en {timeout}s")
+    return False
+
+
+def main():
+    from config import Config
+    from services.log_pipeline import configurar_logging
+    configurar_logging()
+    from services import registry
+
+    # Dentro del broker todos los servicios son locales
+    Config.SESSION_BROKER_ENABLED = False
+
+    broker = SessionBroker(
+        registry.get_connection_pool(),
+        Config.SESSION_BROKER_ADDRESS,
+        broker_authkey(),
+        components=registry.SHARED_COMPONENTS
+    )
+    # La sesión SSH y los sondeos arrancan sin demorar la apertura del socket
+    threading.Thread(target=registry.start_background_services, name="broker-prewarm", daemon=True).start()
+    broker.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
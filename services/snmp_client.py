@@ -0,0 +1,299 @@
+"""
+Cliente SNMPv2c mínimo (GET / GETNEXT / GETBULK sobre UDP) con codificación BER propia,
+sin dependencias externas. Solo cubre lo necesario para recorrer tablas del OLT.
+"""
+import itertools
+import logging
+import os
+import socket
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+OID = Tuple[int, ...]
+
+# Tipos BER / SNMP
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+OPAQUE = 0x44
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+
+GET = 0xA0
+GET_NEXT = 0xA1
+RESPONSE = 0xA2
+GET_BULK = 0xA5
+TRAP_V2 = 0xA7
+
+VERSION_2C = 1
+
+
+class SnmpError(Exception):
+    """Error de protocolo o respuesta con error-status"""
+
+
+class SnmpTimeout(SnmpError):
+    """El agente no respondió"""
+
+
+class _Excepcion:
+    """Valores noSuchObject / noSuchInstance / endOfMibView de una respuesta"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+
+    def __repr__(self):
+        return self.nombre
+
+
+EXCEPCIONES = {
+    NO_SUCH_OBJECT: _Excepcion('noSuchObject'),
+    NO_SUCH_INSTANCE: _Excepcion('noSuchInstance'),
+    END_OF_MIB_VIEW: _Excepcion('endOfMibView'),
+}
+
+
+def parse_oid(oid) -> OID:
+    """'1.3.6.1...' o tupla -> tupla de enteros"""
+    return tuple(int(x) for x in oid.strip('.').split('.')) if isinstance(oid, str) else tuple(oid)
+
+
+# --- Codificación BER ---
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    data = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(data)]) + data
+
+
+def _tlv(tag: int, value: bytes) -> bytes:
+    return bytes([tag]) + _encode_length(len(value)) + value
+
+
+def _encode_int(value: int, tag: int = INTEGER) -> bytes:
+    # Complemento a dos mínimo; los tipos sin signo llevan un 0 inicial si el bit alto está en 1
+    size = ((value if value >= 0 else -value - 1).bit_length() + 8) // 8
+    return _tlv(tag, value.to_bytes(size, 'big', signed=True))
+
+
+def _encode_oid(oid: OID) -> bytes:
+    if len(oid) < 2:
+        raise SnmpError(f"OID inválido: {oid}")
+    body = bytearray([oid[0] * 40 + oid[1]])
+    for arc in oid[2:]:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        body.extend(reversed(chunk))
+    return _tlv(OBJECT_IDENTIFIER, bytes(body))
+
+
+def encode_value(tag: int, value) -> bytes:
+    """Codifica un valor de varbind según su tipo"""
+    if tag in (INTEGER, COUNTER32, GAUGE32, TIMETICKS, COUNTER64):
+        return _encode_int(value, tag)
+    if tag in (OCTET_STRING, IP_ADDRESS, OPAQUE):
+        return _tlv(tag, value.encode() if isinstance(value, str) else bytes(value))
+    if tag == OBJECT_IDENTIFIER:
+        return _encode_oid(parse_oid(value))
+    if tag in (NULL, NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW):
+        return bytes([tag, 0])
+    raise SnmpError(f"Tipo no soportado: {tag:#x}")
+
+
+def encode_message(community: str, pdu_tag: int, request_id: int, varbinds: Iterable[Tuple[OID, int, object]],
+                   error_status: int = 0, error_index: int = 0) -> bytes:
+    """
+    Mensaje SNMPv2c completo. En GETBULK error_status/error_index son non-repeaters y
+    max-repetitions. Cada varbind es (oid, tipo, valor); en las consultas el tipo es NULL.
+    """
+    vbs = b''.join(_tlv(SEQUENCE, _encode_oid(oid) + encode_value(tag, value)) for oid, tag, value in varbinds)
+    pdu = _tlv(pdu_tag, _encode_int(request_id) + _encode_int(error_status) + _encode_int(error_index)
+               + _tlv(SEQUENCE, vbs))
+    return _tlv(SEQUENCE, _encode_int(VERSION_2C) + _tlv(OCTET_STRING, community.encode()) + pdu)
+
+
+# --- Decodificación BER ---
+
+def _read_tlv(data: bytes, pos: int) -> Tuple[int, int, int]:
+    """(tag, inicio del valor, fin del valor)"""
+    if pos + 2 > len(data):
+        raise SnmpError("Mensaje truncado")
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        n = length & 0x7F
+        length = int.from_bytes(data[pos:pos + n], 'big')
+        pos += n
+    if pos + length > len(data):
+        raise SnmpError("Mensaje truncado")
+    return tag, pos, pos + length
+
+
+def _decode_oid(data: bytes) -> OID:
+    if not data:
+        return ()
+    first = data[0]
+    arcs = [min(first // 40, 2), first - 40 * min(first // 40, 2)]
+    value = 0
+    for byte in data[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(value)
+            value = 0
+    return tuple(arcs)
+
+
+def _decode_value(tag: int, data: bytes):
+    if tag == INTEGER:
+        return int.from_bytes(data, 'big', signed=True)
+    if tag in (COUNTER32, GAUGE32, TIMETICKS, COUNTER64):
+        return int.from_bytes(data, 'big')
+    if tag in (OCTET_STRING, IP_ADDRESS, OPAQUE):
+        return bytes(data)
+    if tag == OBJECT_IDENTIFIER:
+        return _decode_oid(data)
+    if tag == NULL:
+        return None
+    if tag in EXCEPCIONES:
+        return EXCEPCIONES[tag]
+    raise SnmpError(f"Tipo no soportado en la respuesta: {tag:#x}")
+
+
+def decode_message(data: bytes) -> dict:
+    """Decodifica un mensaje SNMPv2c: version, community, pdu, request_id, error_status, error_index, varbinds"""
+    tag, pos, end = _read_tlv(data, 0)
+    if tag != SEQUENCE:
+        raise SnmpError("El mensaje no es una secuencia BER")
+
+    campos = []
+    for _ in range(2):
+        tag, start, pos_next = _read_tlv(data, pos)
+        campos.append(_decode_value(tag, data[start:pos_next]))
+        pos = pos_next
+    version, community = campos
+
+    pdu_tag, pos, pdu_end = _read_tlv(data, pos)
+    enteros = []
+    for _ in range(3):
+        tag, start, pos_next = _read_tlv(data, pos)
+        enteros.append(_decode_value(tag, data[start:pos_next]))
+        pos = pos_next
+
+    _, pos, vbs_end = _read_tlv(data, pos)
+    varbinds = []
+    while pos < vbs_end:
+        _, vb_start, vb_end = _read_tlv(data, pos)
+        tag, start, oid_end = _read_tlv(data, vb_start)
+        oid = _decode_oid(data[start:oid_end])
+        tag, start, value_end = _read_tlv(data, oid_end)
+        varbinds.append((oid, tag, _decode_value(tag, data[start:value_end])))
+        pos = vb_end
+
+    return {
+        'version': version,
+        'community': community.decode(errors='replace'),
+        'pdu': pdu_tag,
+        'request_id': enteros[0],
+        'error_status': enteros[1],
+        'error_index': enteros[2],
+        'varbinds': varbinds
+    }
+
+
+class SnmpClient:
+    """Cliente SNMPv2c de un agente (un socket UDP por consulta: seguro entre hilos)"""
+
+    def __init__(self, host: str, community: str = 'public', port: int = 161,
+                 timeout: float = 2.0, retries: int = 1):
+        self.host = host
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self._ids = itertools.count(int.from_bytes(os.urandom(2), 'big'))
+        self.requests = 0   # consultas enviadas (para métricas/benchmarks)
+
+    def _request(self, pdu_tag: int, oids: Sequence[OID], error_status: int = 0,
+                 error_index: int = 0) -> List[Tuple[OID, int, object]]:
+        request_id = next(self._ids) & 0x7FFFFFFF
+        mensaje = encode_message(self.community, pdu_tag, request_id, [(oid, NULL, None) for oid in oids],
+                                 error_status, error_index)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            for _ in range(self.retries + 1):
+                self.requests += 1
+                sock.sendto(mensaje, (self.host, self.port))
+                try:
+                    while True:
+                        data, _ = sock.recvfrom(65535)
+                        respuesta = decode_message(data)
+                        # Se descartan respuestas tardías de intentos anteriores
+                        if respuesta['request_id'] == request_id:
+                            break
+                except socket.timeout:
+                    continue
+                if respuesta['error_status']:
+                    raise SnmpError(f"{self.host}: error-status {respuesta['error_status']} "
+                                    f"(índice {respuesta['error_index']})")
+                return respuesta['varbinds']
+        raise SnmpTimeout(f"{self.host}:{self.port} no respondió a SNMP en {self.timeout}s "
+                          f"({self.retries + 1} intentos)")
+
+    def get(self, oids: Sequence) -> Dict[OID, object]:
+        """GET de varios OIDs"""
+        return {oid: value for oid, _, value in self._request(GET, [parse_oid(o) for o in oids])}
+
+    def get_bulk(self, oids: Sequence, non_repeaters: int = 0, max_repetitions: int = 25):
+        """GETBULK: lista de (oid, tipo, valor) intercalada por repetición"""
+        return self._request(GET_BULK, [parse_oid(o) for o in oids], non_repeaters, max_repetitions)
+
+    def walk_columns(self, columns: Sequence, start: OID = (), stop: Optional[OID] = None,
+                     max_repetitions: int = 25) -> Dict[OID, Dict[OID, object]]:
+        """
+        Recorre varias columnas de una tabla con GETBULK, en paralelo y en el rango de
+        índices [start, stop). Retorna índice de fila -> {columna: valor}.
+        """
+        columns = [parse_oid(c) for c in columns]
+        filas: Dict[OID, Dict[OID, object]] = {}
+        # Último OID leído por columna; None cuando la columna terminó
+        cursores: Dict[OID, Optional[OID]] = {c: c + tuple(start) for c in columns}
+
+        while True:
+            activas = [c for c in columns if cursores[c] is not None]
+            if not activas:
+                return filas
+            varbinds = self.get_bulk([cursores[c] for c in activas], 0, max_repetitions)
+            if not varbinds:
+                return filas
+            avanzaron = set()
+            for i, (oid, tag, value) in enumerate(varbinds):
+                column = activas[i % len(activas)]
+                if cursores[column] is None:
+                    continue
+                index = oid[len(column):]
+                if tag in EXCEPCIONES or oid[:len(column)] != column or (stop is not None and index >= stop):
+                    cursores[column] = None
+                    continue
+                if oid <= cursores[column]:
+                    raise SnmpError(f"El agente no avanza en {'.'.join(map(str, column))}")
+                cursores[column] = oid
+                avanzaron.add(column)
+                filas.setdefault(index, {})[column] = value
+            for column in activas:
+                # Una respuesta sin filas nuevas para la columna también la termina
+                if column not in avanzaron:
+                    cursores[column] = None
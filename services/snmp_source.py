@@ -0,0 +1,152 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from services.device_health import DeviceHealth
+from services.snmp_client import OID, SnmpClient, SnmpTimeout, parse_oid
+
+logger = logging.getLogger(__name__)
+
+# HUAWEI-XPON-MIB, indexadas por (ifIndex del puerto GPON, ONT ID)
+_XPON = '1.3.6.1.4.1.2011.6.128.1.1.2'
+ONT_SN = parse_oid(f'{_XPON}.43.1.3')                  # hwGponDeviceOntSn
+ONT_DESCRIPCION = parse_oid(f'{_XPON}.43.1.9')         # hwGponDeviceOntDespt
+ONT_RUN_STATUS = parse_oid(f'{_XPON}.46.1.15')         # hwGponDeviceOntControlRunStatus (1 online, 2 offline)
+ONT_DISTANCIA = parse_oid(f'{_XPON}.46.1.20')          # hwGponDeviceOntControlRanging (m)
+ONT_LAST_DOWN_TIME = parse_oid(f'{_XPON}.46.1.23')     # hwGponDeviceOntControlLastDownTime (DateAndTime)
+ONT_LAST_DOWN_CAUSE = parse_oid(f'{_XPON}.46.1.24')    # hwGponDeviceOntControlLastDownCause
+OPT_TEMPERATURA = parse_oid(f'{_XPON}.51.1.1')         # hwGponOntOpticalDdmTemperature (°C)
+OPT_RX = parse_oid(f'{_XPON}.51.1.4')                  # hwGponOntOpticalDdmRxPower (0.01 dBm)
+OPT_OLT_RX = parse_oid(f'{_XPON}.51.1.6')              # hwGponOntOpticalDdmOltRxOntPower (0.01 dBm + 10000)
+
+COLUMNAS_ONT = [ONT_SN, ONT_DESCRIPCION, ONT_RUN_STATUS, ONT_DISTANCIA, ONT_LAST_DOWN_TIME,
+                ONT_LAST_DOWN_CAUSE, OPT_TEMPERATURA, OPT_RX, OPT_OLT_RX]
+
+IFINDEX_BASE = 4194304000
+VALOR_INVALIDO = 2147483647  # el OLT lo reporta para ONTs sin lectura óptica (offline)
+
+# Causas de caída como las muestra "display ont info summary"
+CAUSAS_CAIDA = {
+    1: 'LOS', 2: 'LOSi/LOBi', 3: 'LOFi', 4: 'SFi', 5: 'LOAi', 6: 'LOAMi', 7: 'deactive-fail',
+    8: 'deactive', 9: 'reset', 10: 're-register', 11: 'popup-fail', 13: 'dying-gasp',
+    15: 'LOKi', 18: 'ring', 30: 'shutdown', 31: 'LOFi', 32: 'LOS'
+}
+
+
+def if_index(slot: int, puerto: int) -> int:
+    """ifIndex de un puerto GPON del frame 0"""
+    return IFINDEX_BASE + int(slot) * 8192 + int(puerto) * 256
+
+
+def puerto_if_index(valor: int) -> Tuple[int, int]:
+    """(slot, puerto) de un ifIndex de puerto GPON (inversa de if_index)"""
+    offset = int(valor) - IFINDEX_BASE
+    return offset // 8192, (offset % 8192) // 256
+
+
+def _fecha(valor) -> str:
+    """DateAndTime (RFC 2579) -> 'YYYY-MM-DD HH:MM:SS' como en el CLI"""
+    if not isinstance(valor, bytes) or len(valor) < 7:
+        return ''
+    year = int.from_bytes(valor[:2], 'big')
+    if year == 0:
+        return ''
+    return f"{year:04d}-{valor[2]:02d}-{valor[3]:02d} {valor[4]:02d}:{valor[5]:02d}:{valor[6]:02d}"
+
+
+def _potencia(valor, offset: int = 0) -> Optional[float]:
+    if not isinstance(valor, int) or valor == VALOR_INVALIDO:
+        return None
+    return round((valor - offset) / 100, 2)
+
+
+class SNMPDataSource:
+    """
+    Fuente de datos por SNMP (GETBULK) para las tablas de estado y ópticas de las ONTs.
+    Recorre una tarjeta completa en pocas consultas y entrega los mismos diccionarios
+    que los parsers del CLI, así ONTService y BoardService no distinguen el origen.
+    """
+
+    nombre = 'snmp'
+
+    def __init__(self, client: SnmpClient, health: Optional[DeviceHealth] = None,
+                 max_repetitions: int = 50, puertos_por_tarjeta: int = 16):
+        self.client = client
+        self.health = health or DeviceHealth(f"{client.host} (snmp)")
+        self.max_repetitions = max_repetitions
+        self.puertos_por_tarjeta = puertos_por_tarjeta
+
+    def _walk(self, columns: List[OID], tarjeta: str, puerto: Optional[str] = None) -> Dict[OID, Dict[OID, object]]:
+        """Recorre las columnas para una tarjeta completa o un solo puerto"""
+        self.health.check()
+        if puerto is None:
+            start, stop = if_index(tarjeta, 0), if_index(int(tarjeta) + 1, 0)
+        else:
+            start, stop = if_index(tarjeta, puerto), if_index(tarjeta, int(puerto) + 1)
+        try:
+            filas = self.client.walk_columns(columns, start=(start,), stop=(stop,),
+                                             max_repetitions=self.max_repetitions)
+        except SnmpTimeout as e:
+            self.health.record_failure(e, probe=self._probe)
+            raise
+        self.health.record_success()
+        return filas
+
+    def _probe(self):
+        """Sondeo half-open del circuit breaker (sysUpTime)"""
+        self.client.get(['1.3.6.1.2.1.1.3.0'])
+
+    @staticmethod
+    def _ubicacion(tarjeta: str, index: OID) -> Tuple[str, str]:
+        """(puerto, ont_id) a partir del índice (ifIndex, ONT ID)"""
+        return str((index[0] - if_index(tarjeta, 0)) // 256), str(index[1])
+
+    def onts_tarjeta(self, tarjeta: str, puerto: Optional[str] = None) -> Dict[str, Dict[str, dict]]:
+        """Puerto -> {ont_id: datos} con las mismas claves que ONTService._parse_ont_data"""
+        resultado: Dict[str, Dict[str, dict]] = {}
+        for index, fila in sorted(self._walk(COLUMNAS_ONT, tarjeta, puerto).items()):
+            if len(index) != 2 or ONT_RUN_STATUS not in fila:
+                continue
+            p, ont_id = self._ubicacion(tarjeta, index)
+            sn = fila.get(ONT_SN, b'')
+            descripcion = fila.get(ONT_DESCRIPCION, b'').decode('utf-8', errors='replace')
+            causa = fila.get(ONT_LAST_DOWN_CAUSE)
+            ont = {
+                'id': ont_id,
+                'tarjeta': tarjeta,
+                'puerto': p,
+                'estado': 'online' if fila[ONT_RUN_STATUS] == 1 else 'offline',
+                'last_down_cause': CAUSAS_CAIDA.get(causa, str(causa)) if isinstance(causa, int) and causa > 0 else '',
+                'last_down_time': _fecha(fila.get(ONT_LAST_DOWN_TIME)),
+                # El CLI une las palabras de la descripción con '_'
+                'descripcion': '_'.join(descripcion.split()),
+                'sn': sn.hex().upper() if isinstance(sn, bytes) else ''
+            }
+            ont_rx = _potencia(fila.get(OPT_RX))
+            if ont_rx is not None:
+                distancia = fila.get(ONT_DISTANCIA)
+                temperatura = fila.get(OPT_TEMPERATURA)
+                ont.update({
+                    'ont_rx': ont_rx,
+                    'olt_rx': _potencia(fila.get(OPT_OLT_RX), offset=10000),
+                    'temperature': temperatura if isinstance(temperatura, int) and temperatura != VALOR_INVALIDO else None,
+                    'distance': distancia if isinstance(distancia, int) and distancia >= 0 else None
+                })
+            resultado.setdefault(p, {})[ont_id] = ont
+        return resultado
+
+    def onts_puerto(self, tarjeta: str, puerto: str) -> Dict[str, dict]:
+        """{ont_id: datos} de un puerto"""
+        return self.onts_tarjeta(tarjeta, puerto).get(str(int(puerto)), {})
+
+    def puertos_tarjeta(self, tarjeta: str) -> List[dict]:
+        """Totales de ONTs y ONTs online por puerto (como "display board 0/N | include port")"""
+        conteos = {str(p): [0, 0] for p in range(self.puertos_por_tarjeta)}
+        for index, fila in self._walk([ONT_RUN_STATUS], tarjeta).items():
+            if len(index) != 2:
+                continue
+            p, _ = self._ubicacion(tarjeta, index)
+            conteo = conteos.setdefault(p, [0, 0])
+            conteo[0] += 1
+            conteo[1] += fila.get(ONT_RUN_STATUS) == 1
+        return [{'puerto': p, 'puerto_completo': f"0/{tarjeta}/{p}", 'total_onts': total, 'online_onts': online}
+                for p, (total, online) in sorted(conteos.items(), key=lambda c: int(c[0]))]
@@ -0,0 +1,200 @@
+"""
+Captura y reproducción de sesiones CLI con el OLT.
+
+Con Config.CAPTURE_FILE cada comando enviado por ConnectionService se guarda con su
+respuesta en un JSONL comprimido con gzip (un registro por línea). Con Config.REPLAY_FILE
+las sesiones SSH se reemplazan por ReplayConnection, que responde con lo capturado, así
+los parsers, los servicios y la aplicación completa se pueden ejecutar y medir sin OLT.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from itertools import count
+from typing import Dict, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONFIG = "config"
+_INTERFACE = re.compile(r'^interface\s+gpon\s+(\S+)$')
+
+
+def _contexto(actual: str, linea: str) -> str:
+    """Contexto CLI después de enviar `linea` (misma convención que ConnectionService)"""
+    linea = linea.strip()
+    match = _INTERFACE.match(linea)
+    if match:
+        return f"interface-gpon-{match.group(1)}"
+    if linea == 'quit' and actual.startswith('interface'):
+        return CONFIG
+    return actual
+
+
+class ReplayMissError(Exception):
+    """El transcript no tiene respuesta para el comando pedido"""
+
+
+class TranscriptRecorder:
+    """Escribe pares comando/respuesta en un JSONL comprimido (seguro entre hilos)"""
+
+    def __init__(self, path: str):
+        # Un archivo por proceso si la ruta incluye {pid} (varios workers capturando a la vez)
+        self.path = path.format(pid=os.getpid())
+        self._lock = threading.Lock()
+        self._sessions = count(1)
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        logger.info(f"Capturando comandos CLI en {self.path}")
+
+    def new_session(self) -> int:
+        return next(self._sessions)
+
+    def record(self, session: int, context: str, command: str, output: str, elapsed: float, **kwargs):
+        """
+        Agrega un registro como un miembro gzip independiente: el archivo sigue siendo un
+        gzip válido aunque el proceso termine sin cerrarlo
+        """
+        linea = json.dumps({
+            'ts': round(time.time(), 3),
+            'session': session,
+            'context': context,
+            'command': command,
+            'output': output,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            **kwargs
+        }, ensure_ascii=False)
+        data = gzip.compress((linea + '\n').encode('utf-8'))
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingConnection:
+    """Envuelve una conexión netmiko y registra cada send_command en un TranscriptRecorder"""
+
+    def __init__(self, connection, recorder: TranscriptRecorder):
+        self._connection = connection
+        self._recorder = recorder
+        self._session = recorder.new_session()
+        self._context = CONFIG
+
+    def send_command(self, command: str, *args, **kwargs) -> str:
+        t0 = time.perf_counter()
+        try:
+            output = self._connection.send_command(command, *args, **kwargs)
+        except Exception as e:
+            self._recorder.record(self._session, self._context, command, '', time.perf_counter() - t0,
+                                  error=f"{type(e).__name__}: {e}")
+            raise
+        self._recorder.record(self._session, self._context, command, output, time.perf_counter() - t0)
+        return output
+
+    def write_channel(self, data: str):
+        self._context = _contexto(self._context, data)
+        return self._connection.write_channel(data)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class Transcript:
+    """Respuestas capturadas indexadas por (contexto, comando)"""
+
+    def __init__(self):
+        self._por_contexto: Dict[Tuple[str, str], list] = {}
+        self._por_comando: Dict[str, list] = {}
+        self.registros = 0
+
+    @classmethod
+    def load(cls, path: str) -> "Transcript":
+        transcript = cls()
+        for registro in cls.iter_records(path):
+            if registro.get('error'):
+                continue
+            transcript.add(registro['context'], registro['command'], registro['output'],
+                           registro.get('elapsed_ms', 0) / 1000)
+        logger.info(f"Transcript {path}: {transcript.registros} respuestas, "
+                    f"{len(transcript._por_comando)} comandos distintos")
+        return transcript
+
+    @staticmethod
+    def iter_records(path: str) -> Iterator[dict]:
+        """Registros de un archivo capturado (admite varios miembros gzip concatenados)"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            numero = 0
+            while True:
+                try:
+                    linea = f.readline()
+                except (EOFError, gzip.BadGzipFile):
+                    # Último registro truncado si el proceso terminó mientras escribía
+                    logger.warning(f"{path}: registro final incompleto, se omite")
+                    return
+                if not linea:
+                    return
+                numero += 1
+                if not linea.strip():
+                    continue
+                try:
+                    yield json.loads(linea)
+                except ValueError:
+                    logger.warning(f"{path}:{numero}: registro ilegible, se omite")
+
+    def add(self, context: str, command: str, output: str, elapsed: float = 0.0):
+        respuesta = (output, elapsed)
+        self._por_contexto.setdefault((context, command), []).append(respuesta)
+        self._por_comando.setdefault(command, []).append(respuesta)
+        self.registros += 1
+
+    def respuestas(self, context: str, command: str) -> list:
+        """Respuestas capturadas para el comando en ese contexto (o en cualquiera si no hay)"""
+        respuestas = self._por_contexto.get((context, command)) or self._por_comando.get(command)
+        if not respuestas:
+            raise ReplayMissError(f"Sin respuesta capturada para '{command}' en {context}")
+        return respuestas
+
+
+class ReplayConnection:
+    """
+    Reemplazo de la conexión netmiko que responde con un Transcript. Si un comando se
+    capturó varias veces las respuestas se entregan en orden y luego se repite la
+    última. Con latency_factor > 0 se espera la latencia capturada multiplicada por ese
+    factor (1.0 = tiempo real, 2.0 = el doble de lenta).
+    """
+
+    def __init__(self, transcript: Transcript, latency_factor: float = 0.0):
+        self.transcript = transcript
+        self.latency_factor = latency_factor
+        self._context = CONFIG
+        self._cursores: Dict[Tuple[str, str], deque] = {}
+
+    def send_command(self, command: str, *args, **kwargs) -> str:
+        key = (self._context, command)
+        pendientes = self._cursores.get(key)
+        if pendientes is None:
+            pendientes = self._cursores[key] = deque(self.transcript.respuestas(*key))
+        output, elapsed = pendientes.popleft() if len(pendientes) > 1 else pendientes[0]
+        if self.latency_factor > 0 and elapsed:
+            time.sleep(elapsed * self.latency_factor)
+        return output
+
+    def write_channel(self, data: str):
+        self._context = _contexto(self._context, data)
+
+    def read_until_pattern(self, *args, **kwargs) -> str:
+        return "#"
+
+    def is_alive(self) -> bool:
+        return True
+
+    def disconnect(self):
+        pass
@@ -0,0 +1,12 @@
+"""
+Punto de entrada WSGI para servidores de producción:
+
+    gunicorn -c gunicorn.conf.py wsgi:app      (Linux)
+    python serve.py                            (Windows, waitress)
+"""
+from app import create_app
+from services.log_pipeline import configurar_logging
+
+configurar_logging()
+
+app = create_app()